@@ -0,0 +1,185 @@
+"""FAISS index type chosen by corpus size: flat, HNSW, then IVF-PQ.
+
+The vector store started as FAISS.from_texts(...), an IndexFlatL2: every query
+scans every vector. That is exact and fast enough for a few thousand chunks,
+but it grows linearly. With VECTOR_INDEX=auto (default) the index type follows
+the number of vectors:
+
+- below ANN_FLAT_MAX: flat, exact search
+- below ANN_IVFPQ_MIN: HNSW graph (ANN_HNSW_M links per node); queries visit
+  ANN_EF_SEARCH candidates
+- above: IVF with product quantization. Queries scan ANN_NPROBE of the nlist
+  clusters on ANN_PQ_M-byte codes, and with ANN_REFINE (default) the best
+  ANN_REFINE_K x k candidates are re-ranked on 8-bit scalar-quantized vectors.
+  That is dimension + ANN_PQ_M bytes per vector instead of 4 x dimension.
+  PQ codes alone lose too much recall on embeddings to be used without it.
+
+vector_index.py calls rebuild_kind() when it compacts. The index is rebuilt
+from the stored vectors as the new type when a threshold is crossed (with
+hysteresis: shrinking only goes back a tier below half the threshold), when
+IVF-PQ needs retraining because the corpus has grown enough for 4x the
+clusters, or when more than ANN_MAX_DELETED_RATIO of the rows are deleted.
+Otherwise new rows are added to the existing index.
+
+VECTOR_INDEX=flat|hnsw|ivfpq forces one type. python benchmark_ann.py reports
+recall@10 and latency for each configuration.
+"""
+
+import math
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "auto").lower()
+ANN_FLAT_MAX = int(os.getenv("ANN_FLAT_MAX", 20000))
+ANN_IVFPQ_MIN = int(os.getenv("ANN_IVFPQ_MIN", 1000000))
+ANN_HNSW_M = int(os.getenv("ANN_HNSW_M", 32))
+ANN_EF_CONSTRUCTION = int(os.getenv("ANN_EF_CONSTRUCTION", 200))
+ANN_EF_SEARCH = int(os.getenv("ANN_EF_SEARCH", 64))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", 16))
+ANN_PQ_M = int(os.getenv("ANN_PQ_M", 48))
+ANN_PQ_BITS = int(os.getenv("ANN_PQ_BITS", 8))
+ANN_REFINE = os.getenv("ANN_REFINE", "true").lower() == "true"
+ANN_REFINE_K = int(os.getenv("ANN_REFINE_K", 4))
+ANN_TRAIN_SAMPLE = int(os.getenv("ANN_TRAIN_SAMPLE", 100000))
+ANN_MAX_DELETED_RATIO = float(os.getenv("ANN_MAX_DELETED_RATIO", 0.2))
+
+KINDS = ("flat", "hnsw", "ivfpq")
+
+# Vectors are added to a new index in batches of this many rows
+ADD_BATCH = 65536
+
+# Below this many vectors a forced ivfpq index stays flat
+IVFPQ_MIN_TRAIN = 10000
+
+# An IVF index is retrained when the corpus needs this many times its clusters
+NLIST_GROWTH = 4
+
+
+def kind_of(index: Any) -> str:
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, (faiss.IndexIVF, faiss.IndexRefine)):
+        return "ivfpq"
+    return "flat"
+
+
+def _ivf(index: Any) -> Any:
+    """The IVF-PQ index inside a (possibly refined) ivfpq index"""
+    return faiss.downcast_index(faiss.extract_index_ivf(index))
+
+
+def target_kind(count: int, current: Optional[str] = None) -> str:
+    """Index type for a corpus of count vectors, given the current type"""
+    if VECTOR_INDEX in KINDS:
+        # Product quantizers need a few thousand vectors to train on
+        return "flat" if VECTOR_INDEX == "ivfpq" and count < IVFPQ_MIN_TRAIN else VECTOR_INDEX
+    kind = "flat" if count < ANN_FLAT_MAX else "hnsw" if count < ANN_IVFPQ_MIN else "ivfpq"
+    if current in KINDS and KINDS.index(current) > KINDS.index(kind):
+        # Stay on the larger type until the corpus is well below its threshold
+        threshold = ANN_IVFPQ_MIN if current == "ivfpq" else ANN_FLAT_MAX
+        if count >= threshold // 2:
+            return current
+    return kind
+
+
+def nlist_for(count: int) -> int:
+    """IVF clusters for count vectors: about 4 x sqrt(count), a power of two, at least 64"""
+    return max(64, 2 ** round(math.log2(max(4 * math.sqrt(max(count, 1)), 1))))
+
+
+def pq_subquantizers(dimension: int, wanted: Optional[int] = None) -> int:
+    """The largest m <= wanted (ANN_PQ_M) that divides the dimension"""
+    for m in range(min(wanted or ANN_PQ_M, dimension), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def new_index(kind: str, dimension: int, count: int, training: Optional[np.ndarray] = None) -> Any:
+    """An empty index of the given type, trained on the training vectors if it needs training"""
+    if kind == "flat":
+        return faiss.IndexFlatL2(dimension)
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, ANN_HNSW_M)
+        index.hnsw.efConstruction = ANN_EF_CONSTRUCTION
+        index.hnsw.efSearch = ANN_EF_SEARCH
+        return index
+    if kind == "ivfpq":
+        ivf = faiss.IndexIVFPQ(faiss.IndexFlatL2(dimension), dimension, nlist_for(count),
+                               pq_subquantizers(dimension), ANN_PQ_BITS)
+        ivf.nprobe = ANN_NPROBE
+        index = faiss.IndexRefine(ivf, faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit)) \
+            if ANN_REFINE else ivf
+        index.train(np.ascontiguousarray(training, dtype=np.float32))
+        if not ANN_REFINE:
+            ivf.make_direct_map()  # Rows can be read back for the next rebuild
+        return index
+    raise ValueError(f"Unknown VECTOR_INDEX {kind!r} (expected auto or one of {', '.join(KINDS)})")
+
+
+def _search_params(index: Any, k: int, ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> Any:
+    kind = kind_of(index)
+    if kind == "hnsw":
+        return faiss.SearchParametersHNSW(efSearch=max(ef_search or ANN_EF_SEARCH, k))
+    if kind == "ivfpq":
+        nlist = _ivf(index).nlist
+        ivf_params = faiss.SearchParametersIVF(nprobe=min(nprobe or ANN_NPROBE, nlist))
+        if isinstance(index, faiss.IndexRefine):
+            return faiss.IndexRefineSearchParameters(k_factor=ANN_REFINE_K, base_index_params=ivf_params)
+        return ivf_params
+    return None
+
+
+def search(index: Any, queries: np.ndarray, k: int, ef_search: Optional[int] = None,
+           nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """(distances, positions); efSearch / nprobe default to ANN_EF_SEARCH / ANN_NPROBE and are passed per call"""
+    params = _search_params(index, k, ef_search, nprobe)
+    if params is None:
+        return index.search(queries, k)
+    return index.search(queries, k, params=params)
+
+
+def build_index(kind: str, vectors: np.ndarray) -> Any:
+    """An index of the given kind over vectors (an array or a read-only memmap), added in batches"""
+    training = None
+    if kind == "ivfpq":
+        sample = min(len(vectors), max(ANN_TRAIN_SAMPLE, 40 * nlist_for(len(vectors))))
+        chosen = np.sort(np.random.default_rng(0).choice(len(vectors), size=sample, replace=False))
+        training = np.asarray(vectors[chosen], dtype=np.float32)
+    index = new_index(kind, vectors.shape[1], len(vectors), training)
+    for start in range(0, len(vectors), ADD_BATCH):
+        index.add(np.ascontiguousarray(vectors[start:start + ADD_BATCH], dtype=np.float32))
+    return index
+
+
+def rebuild_kind(index: Any, live: int, rows: int) -> Optional[str]:
+    """Index type to rebuild as from scratch, or None if index (rows rows, live of them not deleted) can be kept"""
+    current = kind_of(index)
+    kind = target_kind(live, current)
+    if kind != current:
+        return kind
+    if kind == "ivfpq" and nlist_for(live) >= NLIST_GROWTH * _ivf(index).nlist:
+        return kind
+    if rows and rows - live > ANN_MAX_DELETED_RATIO * rows:
+        return kind
+    return None
+
+
+def describe(index: Any) -> Dict[str, Any]:
+    kind = kind_of(index)
+    report: Dict[str, Any] = {
+        "type": kind,
+        "mode": VECTOR_INDEX,
+        "dimension": index.d,
+        "next_type_at": ANN_FLAT_MAX if kind == "flat" else ANN_IVFPQ_MIN if kind == "hnsw" else None
+    }
+    if kind == "hnsw":
+        report.update(m=ANN_HNSW_M, ef_search=ANN_EF_SEARCH)
+    elif kind == "ivfpq":
+        ivf = _ivf(index)
+        report.update(nlist=ivf.nlist, nprobe=ANN_NPROBE, pq_m=ivf.pq.M, pq_bits=ivf.pq.nbits,
+                      refine_k=ANN_REFINE_K if isinstance(index, faiss.IndexRefine) else None)
+    return report
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Recall and latency of each vector index configuration in ann_index.py.
+
+Builds a flat, an HNSW and an IVF-PQ index over the same vectors with
+ann_index.build_index(), as compaction does, and searches them with a range of efSearch / nprobe
+values. For each configuration it reports build time, index size, recall@10
+against the exact flat search, and single-query latency (p50 / p95), the
+shape of a chat request.
+
+Vectors come from a .npy file of embeddings (--vectors, e.g. saved from
+EmbeddingEngine.embed_documents) or are generated. Sentence embeddings have a
+low intrinsic dimension, so the synthetic vectors are topic clusters in a
+32-dimensional subspace plus noise, normalized to unit length. Queries are
+held-out vectors from the same distribution.
+
+Usage:
+    python benchmark_ann.py
+    python benchmark_ann.py --size 1000000 --ef 32,64,128 --nprobe 8,16,32
+    python benchmark_ann.py --vectors chunks.npy
+"""
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+import ann_index
+
+RECALL_K = 10
+
+
+def synthetic_vectors(count: int, dimension: int, seed: int = 5) -> np.ndarray:
+    """Unit vectors clustered around topics in a 32-dim subspace, plus isotropic noise"""
+    rng = np.random.default_rng(seed)
+    basis = rng.normal(size=(32, dimension))
+    centers = 1.5 * rng.normal(size=(max(count // 200, 16), 32))
+    vectors = np.empty((count, dimension), dtype=np.float32)
+    for start in range(0, count, 100000):
+        size = min(100000, count - start)
+        latent = centers[rng.integers(0, len(centers), size)] + 0.7 * rng.normal(size=(size, 32))
+        batch = latent @ basis + 0.5 * rng.normal(size=(size, dimension))
+        vectors[start:start + size] = batch / np.linalg.norm(batch, axis=1, keepdims=True)
+    return vectors
+
+
+def build(kind: str, vectors: np.ndarray):
+    started = time.perf_counter()
+    index = ann_index.build_index(kind, vectors)
+    return index, time.perf_counter() - started
+
+
+def measure(index, queries: np.ndarray, truth: np.ndarray, **params):
+    latencies, found = [], []
+    for query in queries:
+        started = time.perf_counter()
+        _, positions = ann_index.search(index, query[None, :], RECALL_K, **params)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found.append(positions[0])
+    recall = float(np.mean([len(set(a) & set(b)) / RECALL_K for a, b in zip(truth, found)]))
+    return recall, float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark flat / HNSW / IVF-PQ recall@10 and latency")
+    parser.add_argument("--vectors", help="Embeddings as a .npy file (default: synthetic)")
+    parser.add_argument("--size", type=int, default=200000, help="Number of synthetic vectors")
+    parser.add_argument("--dimension", type=int, default=384, help="Synthetic vector dimension")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--ef", default="16,32,64,128,256", help="HNSW efSearch values")
+    parser.add_argument("--nprobe", default="1,4,16,64", help="IVF-PQ nprobe values")
+    args = parser.parse_args()
+
+    if args.vectors:
+        data = np.load(args.vectors).astype(np.float32)
+    else:
+        data = synthetic_vectors(args.size + args.queries, args.dimension)
+    queries, vectors = data[:args.queries], np.ascontiguousarray(data[args.queries:])
+    print(f"📐 {len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, "
+          f"{faiss.omp_get_max_threads()} threads")
+
+    flat, flat_seconds = build("flat", vectors)
+    _, truth = flat.search(queries, RECALL_K)
+
+    print(f"\n{'index':8s} {'param':>12s} {'build s':>8s} {'size MB':>8s} {'recall@10':>9s} {'p50 ms':>8s} "
+          f"{'p95 ms':>8s}")
+
+    def row(kind, label, index, seconds, **params):
+        size = faiss.serialize_index(index).nbytes / 1e6
+        recall, p50, p95 = measure(index, queries, truth, **params)
+        print(f"{kind:8s} {label:>12s} {seconds:8.1f} {size:8.1f} {recall:9.3f} {p50:8.3f} {p95:8.3f}")
+
+    row("flat", "exact", flat, flat_seconds)
+    del flat
+
+    hnsw, seconds = build("hnsw", vectors)
+    for ef in [int(value) for value in args.ef.split(",")]:
+        row("hnsw", f"efSearch={ef}", hnsw, seconds, ef_search=ef)
+    del hnsw
+
+    ivfpq, seconds = build("ivfpq", vectors)
+    for nprobe in [int(value) for value in args.nprobe.split(",")]:
+        row("ivfpq", f"nprobe={nprobe}", ivfpq, seconds, nprobe=nprobe)
+    ivf = ann_index._ivf(ivfpq)
+    refine = f", re-ranking {ann_index.ANN_REFINE_K} x k on 8-bit vectors" if ann_index.ANN_REFINE else ""
+    print(f"\nIVF-PQ: nlist={ivf.nlist}, m={ivf.pq.M}, {ivf.pq.nbits} bits{refine}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Compare the CSR BM25 index with rank_bm25 as hybrid_search used it.
+
+Builds both over the same synthetic corpus of --docs chunks (Zipf-distributed
+words, so there are a few very common terms and a long tail) and reports
+build time, memory held by the index (tracemalloc) and per-query latency for
+top-10 retrieval:
+
+- rank_bm25: BM25Okapi.get_scores over the list-of-lists token corpus, then
+  sorted(range(len(scores))) over every document
+- bm25_index: SegmentedBM25Index.search (CSR row gather + np.argpartition)
+
+The baseline is skipped when rank_bm25 is not installed, or above --baseline-max
+documents, where it takes minutes to build.
+
+Usage:
+    python benchmark_bm25.py
+    python benchmark_bm25.py --docs 1000000 --queries 200
+"""
+
+import argparse
+import gc
+import itertools
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from bm25_index import SegmentedBM25Index
+
+VOCABULARY_SIZE = 50000
+WORDS_PER_CHUNK = 90  # About a 600-character chunk
+
+
+def synthetic_corpus(docs: int, seed: int = 11):
+    rng = random.Random(seed)
+    vocabulary = [f"w{rank}" for rank in range(VOCABULARY_SIZE)]
+    cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(VOCABULARY_SIZE)))
+    texts = []
+    for _ in range(docs):
+        texts.append(" ".join(rng.choices(vocabulary, cum_weights=cumulative, k=WORDS_PER_CHUNK)))
+    queries = [" ".join(rng.choices(vocabulary[20:5000], k=rng.randint(2, 6))) for _ in range(1000)]
+    return texts, queries
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = build()
+    elapsed = time.perf_counter() - started
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return index, elapsed, held / 1024 / 1024
+
+
+def time_queries(search, queries):
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        search(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BM25 build, memory and top-10 query latency")
+    parser.add_argument("--docs", type=int, default=100000, help="Chunks in the synthetic corpus")
+    parser.add_argument("--queries", type=int, default=100, help="Queries to time")
+    parser.add_argument("--baseline-max", type=int, default=200000, help="Largest corpus to run rank_bm25 on")
+    args = parser.parse_args()
+
+    print(f"📄 Generating {args.docs} chunks of {WORDS_PER_CHUNK} words...")
+    texts, queries = synthetic_corpus(args.docs)
+    queries = queries[:args.queries]
+    ids = [f"chunk-{i}" for i in range(len(texts))]
+
+    print(f"\n{'index':12s} {'build s':>8s} {'memory MB':>10s} {'p50 ms':>8s} {'p95 ms':>8s}")
+    if args.docs <= args.baseline_max:
+        try:
+            from rank_bm25 import BM25Okapi
+
+            def build_baseline():
+                corpus = [text.lower().split() for text in texts]
+                return corpus, BM25Okapi(corpus)
+
+            (corpus, baseline), build_s, memory = measure(build_baseline)
+
+            def baseline_search(query):
+                scores = baseline.get_scores(query.lower().split())
+                return sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:10]
+
+            p50, p95 = time_queries(baseline_search, queries)
+            print(f"{'rank_bm25':12s} {build_s:8.1f} {memory:10.0f} {p50:8.2f} {p95:8.2f}")
+            del corpus, baseline
+        except ImportError:
+            print("⚠️ rank_bm25 not installed - skipping baseline")
+
+    with tempfile.TemporaryDirectory() as directory:
+        def build_index():
+            index = SegmentedBM25Index(directory)
+            index.rebuild(dict(zip(ids, texts)))
+            return index
+
+        index, build_s, memory = measure(build_index)
+        p50, p95 = time_queries(lambda query: index.search(query, 10), queries)
+        print(f"{'bm25_index':12s} {build_s:8.1f} {memory:10.0f} {p50:8.2f} {p95:8.2f}")
+        print(f"\n🔢 {index.segment_count} segment(s), {len(index.vocabulary)} terms, "
+              f"{index.nbytes / 1024 / 1024:.0f} MB of postings arrays")
+
+
+if __name__ == "__main__":
+    main()
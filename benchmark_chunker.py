@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Compare the structure-aware chunker with the old recursive character splitter.
+
+Chunks multi-MB texts with both and reports throughput and how well chunks
+line up with the document structure:
+
+- marker leaks: chunks containing a "--- Page N ---" marker (page text mixed)
+- split headings: chunks that start in one section and run into the next
+- split rows: table rows (" | " lines) cut in the middle
+
+Without arguments a synthetic document (pages, nested headings, paragraphs
+and tables) of --size MB is generated; otherwise the given .txt/.md files
+are used, e.g. text saved from extract_text_from_pdf.
+
+Usage:
+    python benchmark_chunker.py
+    python benchmark_chunker.py --size 8 --repeat 5
+    python benchmark_chunker.py extracted/*.txt
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+
+from chunker import CHUNK_OVERLAP, CHUNK_SIZE, chunk_text
+
+PAGE_MARKER = re.compile(r"--- Page \d+ ---")
+HEADING_LINE = re.compile(r"^#{1,6} ", re.MULTILINE)
+
+WORDS = ("study model learning data network gradient memory index vector query answer student exam topic "
+         "chapter method result example theory practice review summary concept problem solution").split()
+
+
+def synthetic_document(size_mb: float, seed: int = 7) -> str:
+    """Pages of headed sections with paragraphs and small tables, like extracted PDFs and web pages"""
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    parts, length, page = [], 0, 0
+
+    def sentence():
+        words = [rng.choice(WORDS) for _ in range(rng.randint(6, 18))]
+        return " ".join(words).capitalize() + "."
+
+    while length < target:
+        page += 1
+        blocks = [f"--- Page {page} ---"]
+        for section in range(rng.randint(1, 3)):
+            blocks.append(f"{'#' * rng.randint(1, 3)} {' '.join(rng.choice(WORDS) for _ in range(3)).title()}")
+            for _ in range(rng.randint(1, 4)):
+                blocks.append(" ".join(sentence() for _ in range(rng.randint(2, 9))))
+            if rng.random() < 0.3:
+                rows = [" | ".join(rng.choice(WORDS) for _ in range(4)) for _ in range(rng.randint(3, 12))]
+                blocks.append("\n".join(rows))
+        page_text = "\n\n".join(blocks)
+        parts.append(page_text)
+        length += len(page_text) + 2
+    return "\n\n".join(parts)
+
+
+def baseline_splitter():
+    """The splitter every ingestion path used before chunker.py"""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+    return splitter.split_text
+
+
+def available_chunkers():
+    chunkers = {}
+    try:
+        chunkers["RecursiveCharacterTextSplitter"] = baseline_splitter()
+    except ImportError:
+        print("⚠️ langchain-text-splitters not installed - skipping baseline")
+    chunkers["chunker.chunk_text"] = lambda text: [chunk.text for chunk in chunk_text(text)]
+    return chunkers
+
+
+def table_rows(text: str):
+    return {line.strip() for line in text.splitlines() if line.count(" | ") >= 2}
+
+
+def structure_report(chunks, rows):
+    marker_leaks = sum(1 for chunk in chunks if PAGE_MARKER.search(chunk))
+    # A heading anywhere but the start of a chunk means the chunk spans two sections
+    split_headings = sum(1 for chunk in chunks if any(match.start() > 0 for match in HEADING_LINE.finditer(chunk)
+                                                      if chunk[:match.start()].strip().replace("#", "").strip()))
+    split_rows = 0
+    for chunk in chunks:
+        lines = chunk.splitlines()
+        for line in (lines[0], lines[-1]) if lines else ():
+            stripped = line.strip()
+            if " | " in stripped and stripped not in rows:
+                split_rows += 1
+    return marker_leaks, split_headings, split_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark text chunking throughput and structure preservation")
+    parser.add_argument("files", nargs="*", help="Text files to chunk (default: synthetic document)")
+    parser.add_argument("--size", type=float, default=4, help="Synthetic document size in MB")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions per chunker")
+    args = parser.parse_args()
+
+    if args.files:
+        texts = []
+        for path in args.files:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                texts.append(f.read())
+    else:
+        texts = [synthetic_document(args.size)]
+
+    total_mb = sum(len(text) for text in texts) / 1024 / 1024
+    if not total_mb:
+        print("❗ Nothing to chunk")
+        sys.exit(1)
+    rows = set().union(*(table_rows(text) for text in texts))
+    print(f"📄 {len(texts)} text(s), {total_mb:.2f} MB, chunk_size={CHUNK_SIZE}, overlap={CHUNK_OVERLAP}")
+
+    print(f"\n{'chunker':32s} {'MB/s':>7s} {'chunks':>8s} {'avg':>6s} {'markers':>8s} {'headings':>9s} {'rows':>6s}")
+    for label, split in available_chunkers().items():
+        best = None
+        chunks = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            chunks = [chunk for text in texts for chunk in split(text)]
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+
+        markers, headings, split_rows = structure_report(chunks, rows)
+        average = sum(len(chunk) for chunk in chunks) / max(len(chunks), 1)
+        print(f"{label:32s} {total_mb / best:7.2f} {len(chunks):8d} {average:6.0f} {markers:8d} {headings:9d} {split_rows:6d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Embedding time for repeated content with and without the embedding cache.
+
+Chunks the given text files (or a synthetic document) with chunker.py and
+embeds the chunks in EMBED_BATCH_SIZE batches, the way ingestion does:
+
+1. cold: empty cache, every chunk goes to the model
+2. re-upload: the same content again (another user, or after the hourly wipe)
+3. edited: half of the chunks changed
+
+The cache lives in a temporary directory, so data/embedding_cache is not
+touched. Needs sentence-transformers, like the app.
+
+Usage:
+    python benchmark_embedding_cache.py
+    python benchmark_embedding_cache.py extracted/*.txt
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmark_chunker import synthetic_document
+from chunker import chunk_text
+from embedding_cache import CachedEmbeddings
+from model_registry import EMBEDDING_MODEL_NAME, MODEL_CACHE_DIR
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 32))
+
+
+def embed_all(embeddings, texts):
+    started = time.perf_counter()
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        embeddings.embed_documents(texts[start:start + EMBED_BATCH_SIZE])
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion embedding time on repeated content")
+    parser.add_argument("files", nargs="*", help="Text files to chunk (default: synthetic document)")
+    parser.add_argument("--size", type=float, default=0.5, help="Synthetic document size in MB")
+    args = parser.parse_args()
+
+    if args.files:
+        text = ""
+        for path in args.files:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                text += f.read() + "\n\n"
+    else:
+        text = synthetic_document(args.size)
+    chunks = [chunk.text for chunk in chunk_text(text)]
+    edited = [chunk + " (revised)" if i % 2 else chunk for i, chunk in enumerate(chunks)]
+    print(f"📄 {len(chunks)} chunks")
+
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME, cache_folder=MODEL_CACHE_DIR)
+    model.embed_documents(["warm up"])
+
+    with tempfile.TemporaryDirectory() as directory:
+        embeddings = CachedEmbeddings(model, EMBEDDING_MODEL_NAME, directory=directory)
+        print(f"\n{'pass':12s} {'seconds':>8s} {'chunks/s':>9s} {'hit rate':>9s}")
+        for label, texts in (("cold", chunks), ("re-upload", chunks), ("edited", edited)):
+            before_hits = embeddings.stats["document_hits"]
+            elapsed = embed_all(embeddings, texts)
+            hit_rate = (embeddings.stats["document_hits"] - before_hits) / len(texts)
+            print(f"{label:12s} {elapsed:8.2f} {len(texts) / elapsed:9.0f} {hit_rate:9.0%}")
+
+        uncached = embed_all(model, chunks)
+        print(f"{'no cache':12s} {uncached:8.2f} {len(chunks) / uncached:9.0f} {'-':>9s}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Embedding throughput per backend, and retrieval recall against the float model.
+
+Chunks the given text files (or a synthetic document) with chunker.py and
+embeds them:
+
+1. baseline: the float model called in EMBED_BATCH_SIZE slices in document
+   order, the way ingestion used HuggingFaceEmbeddings
+2. one row per --backends entry, through EmbeddingEngine (--workers
+   processes for large calls)
+
+For every backend, --queries chunks are used as queries (their first sentence)
+and the top-10 chunks by L2 distance are compared with the top-10 of the float
+model: recall@10 is the overlap. The script exits with status 1 when a backend
+falls below --min-recall, so it can gate a switch of EMBEDDING_BACKEND.
+
+Backends other than torch need their runtime installed (onnx: optimum[onnxruntime]).
+
+Usage:
+    python benchmark_embeddings.py
+    python benchmark_embeddings.py --backends torch,torch-int8,onnx-int8 --workers 4
+    python benchmark_embeddings.py extracted/*.txt --min-recall 0.97
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from benchmark_chunker import synthetic_document
+from chunker import chunk_text
+from embedding_engine import EMBEDDING_BATCH_SIZE, EmbeddingEngine, load_model
+from model_registry import EMBEDDING_MODEL_NAME, MODEL_CACHE_DIR
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 32))
+RECALL_K = 10
+
+
+def top_k(documents: np.ndarray, queries: np.ndarray, k: int = RECALL_K) -> np.ndarray:
+    """Indices of the k nearest documents (L2, as the FAISS index) for each query"""
+    distances = (queries ** 2).sum(1)[:, None] - 2 * queries @ documents.T + (documents ** 2).sum(1)[None, :]
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def recall(reference: np.ndarray, candidate: np.ndarray) -> float:
+    return float(np.mean([len(set(a) & set(b)) / len(a) for a, b in zip(reference, candidate)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends: chunks/s and recall@10")
+    parser.add_argument("files", nargs="*", help="Text files to chunk (default: synthetic document)")
+    parser.add_argument("--size", type=float, default=0.5, help="Synthetic document size in MB")
+    parser.add_argument("--backends", default="torch,torch-int8", help="Comma-separated EMBEDDING_BACKEND values")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for the engine")
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE, help="Engine batch size")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries for the recall check")
+    parser.add_argument("--min-recall", type=float, default=0.95, help="Fail below this recall@10")
+    args = parser.parse_args()
+
+    if args.files:
+        text = ""
+        for path in args.files:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                text += f.read() + "\n\n"
+    else:
+        text = synthetic_document(args.size)
+    chunks = [chunk.text for chunk in chunk_text(text)]
+    rng = random.Random(3)
+    queries = [chunk.split(". ")[0][:200] for chunk in rng.sample(chunks, min(args.queries, len(chunks)))]
+    print(f"📄 {len(chunks)} chunks, {len(queries)} queries, {os.cpu_count()} CPUs")
+
+    model = load_model(EMBEDDING_MODEL_NAME, "torch", MODEL_CACHE_DIR)
+    model.encode(["warm up"], show_progress_bar=False)
+    started = time.perf_counter()
+    baseline = np.concatenate([
+        model.encode(chunks[start:start + EMBED_BATCH_SIZE], show_progress_bar=False, convert_to_numpy=True)
+        for start in range(0, len(chunks), EMBED_BATCH_SIZE)
+    ])
+    baseline_seconds = time.perf_counter() - started
+    reference = top_k(baseline, model.encode(queries, show_progress_bar=False, convert_to_numpy=True))
+    del model
+
+    print(f"\n{'backend':14s} {'workers':>7s} {'seconds':>8s} {'chunks/s':>9s} {'speedup':>8s} {'cosine':>7s} "
+          f"{'recall@10':>9s}")
+    print(f"{'baseline':14s} {1:7d} {baseline_seconds:8.2f} {len(chunks) / baseline_seconds:9.0f} {1:8.2f}x "
+          f"{1:7.4f} {1:9.3f}")
+
+    failed = []
+    for backend in [name.strip() for name in args.backends.split(",") if name.strip()]:
+        try:
+            engine = EmbeddingEngine(EMBEDDING_MODEL_NAME, cache_folder=MODEL_CACHE_DIR, backend=backend,
+                                     batch_size=args.batch_size, workers=args.workers, shard_min=1)
+        except Exception as e:
+            print(f"{backend:14s} skipped: {e}")
+            continue
+        engine.embed_documents(["warm up"] * args.workers)  # Starts the pool and loads the worker models
+        started = time.perf_counter()
+        vectors = np.asarray(engine.embed_documents(chunks), dtype=np.float32)
+        seconds = time.perf_counter() - started
+        engine.shutdown()
+
+        query_vectors = np.asarray([engine.embed_query(query) for query in queries], dtype=np.float32)
+        cosine = float(np.mean((vectors * baseline).sum(1) /
+                               (np.linalg.norm(vectors, axis=1) * np.linalg.norm(baseline, axis=1))))
+        score = recall(reference, top_k(vectors, query_vectors))
+        if score < args.min_recall:
+            failed.append(backend)
+        print(f"{backend:14s} {args.workers:7d} {seconds:8.2f} {len(chunks) / seconds:9.0f} "
+              f"{baseline_seconds / seconds:8.2f}x {cosine:7.4f} {score:9.3f}")
+
+    if failed:
+        print(f"\n❌ recall@{RECALL_K} below {args.min_recall} for: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"\n✅ All backends keep recall@{RECALL_K} >= {args.min_recall}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Compare html_extract engines with the old BeautifulSoup extractor.
+
+Runs every available extractor over a directory of saved .html pages and
+reports throughput and extraction quality. Without a directory it uses the
+committed fixtures in benchmark_corpus/html (docs, blog, forum and legacy
+table-layout pages, an XHTML page with an XML declaration and an empty page),
+so results can be reproduced on any checkout. When a page has a hand-checked
+reference next to it (page.html + page.txt), token precision/recall/F1
+against the reference are reported; otherwise quality is approximated by
+
+- structure coverage: share of words from headings, list items, table cells
+  and <pre> blocks inside the page's main content that made it into the output
+- boilerplate leakage: share of words from nav/header/footer/aside that
+  leaked into the output
+
+Usage:
+    python benchmark_html_extract.py
+    python benchmark_html_extract.py corpus_dir
+    python benchmark_html_extract.py corpus_dir --fetch urls.txt   # save pages first
+    python benchmark_html_extract.py corpus_dir --repeat 5
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+
+from html_extract import ENGINES, extract_html
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_corpus", "html")
+
+
+def baseline_extract(html: str) -> str:
+    """The previous extract_text_from_url_simple logic"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in ["script", "style", "nav", "footer", "iframe"]:
+        for element in soup.find_all(tag):
+            element.decompose()
+    title = soup.title.string if soup.title else "No Title"
+    body_text = "\n".join(p.get_text(strip=True) for p in soup.find_all("p"))
+    return f"{title}\n{body_text}"
+
+
+def available_extractors():
+    extractors = {}
+    try:
+        import bs4  # noqa: F401
+        extractors["baseline (bs4 html.parser)"] = baseline_extract
+    except ImportError:
+        print("⚠️ beautifulsoup4 not installed - skipping baseline")
+
+    for engine in ENGINES:
+        try:
+            ENGINES[engine]("<html><body><p>probe</p></body></html>")
+        except ImportError:
+            print(f"⚠️ Engine '{engine}' not installed - skipping")
+            continue
+        extractors[f"html_extract ({engine})"] = lambda html, engine=engine: extract_html(html, engine=engine).text
+    return extractors
+
+
+def fetch_corpus(urls_file: str, corpus_dir: str):
+    from http_cache import fetch
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    with open(urls_file, "r", encoding="utf-8") as f:
+        urls = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    for url in urls:
+        try:
+            response = fetch(url)
+            response.raise_for_status()
+        except Exception as e:
+            print(f"❌ {url}: {e}")
+            continue
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+        with open(os.path.join(corpus_dir, f"{name}.html"), "w", encoding="utf-8") as f:
+            f.write(response.text)
+        print(f"✅ Saved {url} -> {name}.html")
+
+
+def load_corpus(corpus_dir: str):
+    pages = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if not name.endswith((".html", ".htm")):
+            continue
+        path = os.path.join(corpus_dir, name)
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            html = f.read()
+        reference = None
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(reference_path):
+            with open(reference_path, "r", encoding="utf-8") as f:
+                reference = f.read()
+        pages.append((name, html, reference))
+    return pages
+
+
+def _words(text: str):
+    return [word.lower() for word in WORD_PATTERN.findall(text)]
+
+
+def _bag(words):
+    counts = {}
+    for word in words:
+        counts[word] = counts.get(word, 0) + 1
+    return counts
+
+
+def token_prf(output: str, reference: str):
+    produced, expected = _bag(_words(output)), _bag(_words(reference))
+    overlap = sum(min(count, expected.get(word, 0)) for word, count in produced.items())
+    precision = overlap / max(sum(produced.values()), 1)
+    recall = overlap / max(sum(expected.values()), 1)
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+def structure_and_boilerplate_words(html: str):
+    """Words that should be kept (structured content) and words that should not (page chrome)"""
+    from html_extract import _find_body, _node_text, _parse_stdlib, _tag
+
+    body = _find_body(_parse_stdlib(html))
+    structured, chrome = set(), set()
+    for node in body.iter():
+        tag = _tag(node)
+        if tag in ("nav", "header", "footer", "aside"):
+            chrome.update(_words(_node_text(node)))
+    for node in body.iter():
+        tag = _tag(node)
+        if tag in ("h1", "h2", "h3", "h4", "li", "td", "th", "pre"):
+            structured.update(_words(_node_text(node)))
+    return structured - chrome, chrome - structured
+
+
+def coverage(words, output_words) -> float:
+    return len(words & output_words) / len(words) if words else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML main-content extraction")
+    parser.add_argument("corpus_dir", nargs="?", default=DEFAULT_CORPUS,
+                        help="Directory of saved .html pages (optional .txt references); default: the committed fixtures")
+    parser.add_argument("--fetch", help="File of URLs to download into corpus_dir first")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions per extractor")
+    args = parser.parse_args()
+
+    if args.fetch:
+        fetch_corpus(args.fetch, args.corpus_dir)
+
+    pages = load_corpus(args.corpus_dir)
+    if not pages:
+        print(f"❗ No .html pages in {args.corpus_dir}")
+        sys.exit(1)
+
+    total_bytes = sum(len(html.encode("utf-8")) for _, html, _ in pages)
+    print(f"📄 {len(pages)} pages, {total_bytes / 1024 / 1024:.2f} MB")
+
+    expectations = [structure_and_boilerplate_words(html) for _, html, _ in pages]
+    with_reference = [index for index, (_, _, reference) in enumerate(pages) if reference]
+
+    print(f"\n{'extractor':32s} {'pages/s':>8s} {'MB/s':>7s} {'chars':>8s} {'struct':>7s} {'leak':>6s} {'F1':>6s}")
+    for label, extract in available_extractors().items():
+        outputs = []
+        best = None
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            outputs = [extract(html) for _, html, _ in pages]
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+
+        output_words = [set(_words(text)) for text in outputs]
+        structure = sum(coverage(kept, words) for (kept, _), words in zip(expectations, output_words)) / len(pages)
+        leakage = sum(coverage(chrome, words) if chrome else 0.0
+                      for (_, chrome), words in zip(expectations, output_words)) / len(pages)
+        f1 = "-"
+        if with_reference:
+            scores = [token_prf(outputs[index], pages[index][2])[2] for index in with_reference]
+            f1 = f"{sum(scores) / len(scores):.3f}"
+
+        print(f"{label:32s} {len(pages) / best:8.1f} {total_bytes / 1024 / 1024 / best:7.2f} "
+              f"{sum(len(text) for text in outputs) / len(pages):8.0f} {structure:7.1%} {leakage:6.1%} {f1:>6s}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,653 @@
+"""Incremental BM25 keyword index made of immutable segments.
+
+The keyword side of hybrid search used to be rebuilt from scratch after every
+upload: every chunk in the corpus was re-tokenized into a new BM25Okapi (and a
+second BM25Retriever) while vector_store_lock was held, so ingesting a file
+cost O(corpus) and got slower with each upload. Instead, like a Lucene index:
+
+- add() tokenizes only the new chunks into a small segment; existing segments
+  are never rewritten.
+- delete() marks documents as deleted (tombstones) in their segment; they are
+  skipped at query time and dropped when the segment is merged.
+- Corpus statistics (document count, total length, document frequency per
+  term) are updated by each add and merge instead of being recomputed. As in
+  Lucene, deleted documents still count towards them until a merge drops them.
+- A background thread merges the smallest segments once there are more than
+  BM25_MAX_SEGMENTS, and rewrites segments whose deleted share passes
+  BM25_MERGE_DELETED_RATIO. Postings are merged as-is, with no re-tokenizing.
+- commit() writes segments that are not on disk yet to BM25_INDEX_DIR as one
+  file each, appends new terms to the vocabulary file, and replaces a small
+  manifest (generation, vocabulary size, segment list and tombstones).
+
+All app workers share a shard's directory. As in vector_index.py, commits,
+merges and loads take an flock on it, and a worker that finds a manifest
+written by another one reloads it and re-applies its own uncommitted
+segments (re-encoded into the loaded vocabulary) and deletes. Only committed
+segments are merged, and a merge is committed right away.
+
+Terms are encoded once into an append-only integer vocabulary, and a segment
+stores its postings as a CSR term-document matrix of int32 arrays (term ids,
+row offsets, doc indices, term frequencies) instead of Python dicts and
+string lists. A query gathers the rows of its terms, scores them with numpy
+and takes the top k with np.argpartition rather than scoring and sorting every
+document in Python. benchmark_bm25.py compares it with rank_bm25.
+
+Documents are identified by their vector index chunk id, so vector and BM25
+hits refer to the same chunk. Each tenant shard (tenant_shards.py) has one.
+"""
+
+import json
+import os
+import re
+import threading
+import uuid
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from embedding_cache import FileLock
+
+BM25_INDEX_DIR = os.getenv("BM25_INDEX_DIR", "data/bm25_index")
+BM25_MAX_SEGMENTS = int(os.getenv("BM25_MAX_SEGMENTS", 8))
+BM25_MERGE_FACTOR = int(os.getenv("BM25_MERGE_FACTOR", 4))
+BM25_MERGE_DELETED_RATIO = float(os.getenv("BM25_MERGE_DELETED_RATIO", 0.3))
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+MANIFEST_NAME = "manifest.json"
+VOCABULARY_NAME = "vocabulary.txt"
+TOKEN_PATTERN = re.compile(r"\w+")
+
+_EMPTY_DOCS = np.empty(0, dtype=np.int32)
+_EMPTY_SCORES = np.empty(0, dtype=np.float32)
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class Vocabulary:
+    """Append-only term -> int32 id mapping shared by all segments"""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.terms: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def encode(self, tokens: List[str]) -> np.ndarray:
+        """Ids of tokens, adding unseen terms"""
+        ids = self.ids
+        with self._lock:
+            for token in tokens:
+                if token not in ids:
+                    ids[token] = len(self.terms)
+                    self.terms.append(token)
+            return np.fromiter((ids[token] for token in tokens), dtype=np.int32, count=len(tokens))
+
+    def lookup(self, tokens: List[str]) -> List[int]:
+        """Ids of known tokens; unknown ones cannot match anything and are left out"""
+        return [self.ids[token] for token in tokens if token in self.ids]
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first"""
+    if scores.size > k:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(scores.size)
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class Segment:
+    """CSR postings for a fixed set of documents; only the tombstone mask changes after creation"""
+
+    def __init__(self, doc_ids: np.ndarray, lengths: np.ndarray, term_ids: np.ndarray, indptr: np.ndarray,
+                 doc_indices: np.ndarray, tfs: np.ndarray, name: Optional[str] = None):
+        self.name = name or uuid.uuid4().hex
+        self.doc_ids = doc_ids  # Bytes array of docstore ids
+        self.lengths = lengths  # int32 tokens per document
+        self.term_ids = term_ids  # int32, sorted: row i of the matrix is term term_ids[i]
+        self.indptr = indptr  # int64 row offsets into doc_indices / tfs
+        self.doc_indices = doc_indices  # int32 local document index per posting
+        self.tfs = tfs  # int32 term frequency per posting
+        self.total_length = int(lengths.sum())
+        self.deleted = np.zeros(len(doc_ids), dtype=bool)
+        self.deleted_count = 0
+        self.saved = False
+
+    @classmethod
+    def from_postings(cls, doc_ids: np.ndarray, lengths: np.ndarray, terms: np.ndarray, docs: np.ndarray,
+                      tfs: np.ndarray) -> "Segment":
+        """Build the CSR arrays from unordered (term, doc, tf) triples"""
+        order = np.lexsort((docs, terms))
+        terms, docs, tfs = terms[order], docs[order], tfs[order]
+        term_ids, starts = np.unique(terms, return_index=True)
+        indptr = np.append(starts, terms.size).astype(np.int64)
+        return cls(doc_ids, lengths.astype(np.int32), term_ids.astype(np.int32), indptr,
+                   docs.astype(np.int32), tfs.astype(np.int32))
+
+    @classmethod
+    def build(cls, ids: List[str], texts: List[str], vocabulary: Vocabulary) -> "Segment":
+        token_lists = [tokenize(text) for text in texts]
+        lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int32, count=len(texts))
+        tokens = vocabulary.encode([token for tokens in token_lists for token in tokens])
+        docs = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+
+        # One (term, doc) key per token; counting equal keys gives term frequencies
+        keys, tfs = np.unique(tokens.astype(np.int64) * max(len(texts), 1) + docs, return_counts=True)
+        doc_ids = np.array([doc_id.encode() for doc_id in ids], dtype=bytes)
+        return cls.from_postings(doc_ids, lengths, keys // max(len(texts), 1), keys % max(len(texts), 1), tfs)
+
+    @property
+    def live_count(self) -> int:
+        return len(self.doc_ids) - self.deleted_count
+
+    @property
+    def deleted_ratio(self) -> float:
+        return self.deleted_count / len(self.doc_ids) if len(self.doc_ids) else 0.0
+
+    def document_frequencies(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def mark_deleted(self, ids: np.ndarray) -> int:
+        hits = np.isin(self.doc_ids, ids) & ~self.deleted
+        count = int(hits.sum())
+        if count:
+            self.deleted |= hits
+            self.deleted_count += count
+        return count
+
+    def live_ids(self) -> List[str]:
+        return [doc_id.decode() for doc_id in self.doc_ids[~self.deleted]]
+
+    def score(self, terms: np.ndarray, weights: np.ndarray, k1: float, b: float,
+              average_length: float) -> Tuple[np.ndarray, np.ndarray]:
+        """(local doc indices, BM25 scores) of live documents containing any of the terms"""
+        rows = np.searchsorted(self.term_ids, terms)
+        rows_clipped = np.minimum(rows, max(self.term_ids.size - 1, 0))
+        found = (rows < self.term_ids.size) & (self.term_ids[rows_clipped] == terms) if self.term_ids.size else \
+            np.zeros(terms.size, dtype=bool)
+
+        doc_parts, score_parts = [], []
+        for row, weight in zip(rows[found], weights[found]):
+            start, end = self.indptr[row], self.indptr[row + 1]
+            docs = self.doc_indices[start:end]
+            tf = self.tfs[start:end].astype(np.float32)
+            norm = k1 * (1 - b + b * self.lengths[docs] / average_length)
+            doc_parts.append(docs)
+            score_parts.append(weight * tf * (k1 + 1) / (tf + norm))
+
+        if not doc_parts:
+            return _EMPTY_DOCS, _EMPTY_SCORES
+        if len(doc_parts) == 1:
+            docs, scores = doc_parts[0], score_parts[0]
+        else:
+            # A document matching several terms appears once per term: sum its contributions
+            docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(score_parts)).astype(np.float32)
+        if self.deleted_count:
+            live = ~self.deleted[docs]
+            docs, scores = docs[live], scores[live]
+        return docs, scores
+
+    def translate(self, source: Vocabulary, target: Vocabulary) -> "Segment":
+        """The same documents with term ids of another vocabulary (terms it lacks are added)"""
+        mapping = target.encode([source.terms[term_id] for term_id in self.term_ids])
+        segment = Segment.from_postings(self.doc_ids, self.lengths, np.repeat(mapping, np.diff(self.indptr)),
+                                        self.doc_indices, self.tfs)
+        segment.deleted = self.deleted.copy()
+        segment.deleted_count = self.deleted_count
+        return segment
+
+    def save(self, directory: str):
+        path = os.path.join(directory, f"{self.name}.npz")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, doc_ids=self.doc_ids, lengths=self.lengths, term_ids=self.term_ids, indptr=self.indptr,
+                     doc_indices=self.doc_indices, tfs=self.tfs)
+        os.replace(tmp_path, path)
+        self.saved = True
+
+    @classmethod
+    def load(cls, directory: str, name: str) -> "Segment":
+        with np.load(os.path.join(directory, f"{name}.npz"), allow_pickle=False) as data:
+            segment = cls(data["doc_ids"], data["lengths"], data["term_ids"], data["indptr"],
+                          data["doc_indices"], data["tfs"], name=name)
+        segment.saved = True
+        return segment
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (self.doc_ids, self.lengths, self.term_ids, self.indptr,
+                                              self.doc_indices, self.tfs, self.deleted))
+
+
+def merge_segments(segments: List[Tuple[Segment, np.ndarray]]) -> Segment:
+    """One segment with the live documents of (segment, deleted mask) pairs; postings are remapped, not re-tokenized"""
+    doc_ids, lengths, terms, docs, tfs = [], [], [], [], []
+    offset = 0
+    for segment, deleted in segments:
+        live = ~deleted
+        remap = np.full(len(segment.doc_ids), -1, dtype=np.int64)
+        remap[live] = np.arange(offset, offset + int(live.sum()))
+        offset += int(live.sum())
+        doc_ids.append(segment.doc_ids[live])
+        lengths.append(segment.lengths[live])
+
+        new_docs = remap[segment.doc_indices]
+        keep = new_docs >= 0
+        terms.append(np.repeat(segment.term_ids, np.diff(segment.indptr))[keep])
+        docs.append(new_docs[keep])
+        tfs.append(segment.tfs[keep])
+    return Segment.from_postings(np.concatenate(doc_ids), np.concatenate(lengths), np.concatenate(terms),
+                                 np.concatenate(docs), np.concatenate(tfs))
+
+
+class SegmentedBM25Index:
+    """BM25 over append-only segments with tombstone deletes and background merging"""
+
+    def __init__(self, directory: str = BM25_INDEX_DIR, k1: float = BM25_K1, b: float = BM25_B):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._commit_lock = threading.Lock()
+        self._file_lock: Optional[FileLock] = None
+        self._reset()
+        self._merge_wanted = threading.Event()
+        self._merger: Optional[threading.Thread] = None
+        self._closed = False
+        self.stats = {"segments_added": 0, "merges": 0, "deleted": 0, "reloads": 0}
+
+    def _reset(self):
+        self.vocabulary = Vocabulary()
+        self._segments: List[Segment] = []
+        self._doc_count = 0  # Including tombstoned documents, like the rest of the statistics
+        self._total_length = 0
+        self._df = np.zeros(0, dtype=np.int64)  # Indexed by term id
+        self._pending_deletes: List[str] = []  # Deleted since the last commit
+        self._generation: Optional[int] = None  # Of the manifest the committed state was read from or written as
+        self._saved_terms = 0  # Vocabulary terms in the vocabulary file
+        self._vocabulary_bytes = 0  # Length of those terms in the file
+
+    # Statistics
+
+    @property
+    def doc_count(self) -> int:
+        """Searchable (not deleted) documents"""
+        with self._lock:
+            return sum(segment.live_count for segment in self._segments)
+
+    @property
+    def segment_count(self) -> int:
+        return len(self._segments)
+
+    @property
+    def corpus_size(self) -> int:
+        """Documents counted in the BM25 statistics (tombstoned ones included until merged)"""
+        return self._doc_count
+
+    def document_frequencies(self, terms: Iterable[str]) -> Dict[str, int]:
+        """Documents containing each term, for terms the index has seen"""
+        with self._lock:
+            df = self._df
+            return {term: int(df[term_id]) for term, term_id in
+                    ((term, self.vocabulary.ids.get(term)) for term in terms)
+                    if term_id is not None and term_id < df.size}
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the segment arrays (the vocabulary dict comes on top)"""
+        with self._lock:
+            return sum(segment.nbytes for segment in self._segments) + self._df.nbytes
+
+    def _account(self, segment: Segment, sign: int):
+        self._doc_count += sign * len(segment.doc_ids)
+        self._total_length += sign * segment.total_length
+        if self._df.size < len(self.vocabulary):
+            grown = np.zeros(max(len(self.vocabulary), self._df.size * 2), dtype=np.int64)
+            grown[:self._df.size] = self._df
+            self._df = grown
+        self._df[segment.term_ids] += sign * segment.document_frequencies()
+
+    def _install(self, segments: List[Segment]):
+        """Replace the segments and recompute the statistics (call with _lock held)"""
+        self._segments = []
+        self._doc_count = 0
+        self._total_length = 0
+        self._df = np.zeros(len(self.vocabulary), dtype=np.int64)
+        for segment in segments:
+            self._segments.append(segment)
+            self._account(segment, +1)
+
+    # Updates
+
+    def add(self, ids: List[str], texts: List[str]):
+        """Index new documents as one segment; only these texts are tokenized"""
+        if not ids:
+            return
+        vocabulary = self.vocabulary
+        segment = Segment.build(ids, texts, vocabulary)
+        with self._lock:
+            if vocabulary is not self.vocabulary:
+                segment = segment.translate(vocabulary, self.vocabulary)  # Reloaded while tokenizing
+            self._segments.append(segment)
+            self._account(segment, +1)
+            self.stats["segments_added"] += 1
+        self._request_merge()
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """Tombstone documents; returns how many were found"""
+        ids = list(ids)
+        encoded = np.array([doc_id.encode() for doc_id in ids], dtype=bytes)
+        if not encoded.size:
+            return 0
+        with self._lock:
+            removed = sum(segment.mark_deleted(encoded) for segment in self._segments)
+            if removed:
+                self._pending_deletes.extend(ids)
+                self.stats["deleted"] += removed
+        if removed:
+            self._request_merge()
+        return removed
+
+    def rebuild(self, documents: Dict[str, str]):
+        """Replace the whole index, on disk as well, with one segment of {doc id: text}"""
+        with self._commit_lock, self._lock_directory():
+            self._rebuild_locked(documents, self._read_manifest())
+
+    def _rebuild_locked(self, documents: Dict[str, str], disk: Optional[dict]):
+        with self._lock:
+            self._reset()
+            # Written as the next generation over whatever is on disk, with a new vocabulary file
+            self._generation = self._disk_generation(disk)
+        self.add(list(documents.keys()), list(documents.values()))
+        self._commit_locked(disk)
+
+    def refresh(self, documents: Dict[str, str]):
+        """Catch up with what other workers committed, then match {doc id: text} (the shard's live chunks).
+
+        Chunks committed to the vector index but not (yet) to this index are
+        added, and ones deleted from it are tombstoned; both are kept until
+        the next commit. Without a usable index on disk, it is rebuilt.
+        """
+        with self._commit_lock, self._lock_directory():
+            disk = self._read_manifest()
+            if disk is None:
+                with self._lock:
+                    empty = not self._segments
+                if empty:
+                    self._rebuild_locked(documents, disk)
+                    if documents:
+                        print(f"✅ BM25 index built with {len(documents)} documents")
+                    return
+            elif self._disk_generation(disk) != self._generation:
+                try:
+                    self._sync_locked(disk)
+                except Exception as e:
+                    print(f"⚠️ Could not load BM25 index: {e}")
+                    self._rebuild_locked(documents, disk)
+                    print(f"✅ BM25 index rebuilt with {len(documents)} documents")
+                    return
+
+        with self._lock:
+            live = {doc_id for segment in self._segments for doc_id in segment.live_ids()}
+        missing = [doc_id for doc_id in documents if doc_id not in live]
+        extra = [doc_id for doc_id in live if doc_id not in documents]
+        if missing:
+            self.add(missing, [documents[doc_id] for doc_id in missing])
+        if extra:
+            self.delete(extra)
+
+    def close(self):
+        """Commit anything pending and stop the merge thread (the index is not used afterwards)"""
+        self.commit()
+        self._closed = True
+        self._merge_wanted.set()
+
+    # Merging
+
+    def _merge_candidates(self) -> List[Segment]:
+        with self._lock:
+            segments = [segment for segment in self._segments if segment.saved]
+        rewrite = [segment for segment in segments if segment.deleted_ratio > BM25_MERGE_DELETED_RATIO]
+        if rewrite:
+            return rewrite
+        if len(segments) > BM25_MAX_SEGMENTS:
+            return sorted(segments, key=lambda segment: segment.live_count)[:BM25_MERGE_FACTOR]
+        return []
+
+    def _request_merge(self):
+        self._merge_wanted.set()
+        if self._closed:
+            return
+        if self._merger is None or not self._merger.is_alive():
+            self._merger = threading.Thread(target=self._merge_loop, name="bm25-merger", daemon=True)
+            self._merger.start()
+
+    def _merge_loop(self):
+        while not self._closed:
+            self._merge_wanted.wait()
+            self._merge_wanted.clear()
+            if self._closed:
+                break
+            try:
+                while self.maybe_merge():
+                    pass
+            except Exception as e:
+                print(f"⚠️ BM25 segment merge failed: {e}")
+
+    def maybe_merge(self) -> bool:
+        """Merge and commit one set of committed segments if the policy asks for it; returns whether it did"""
+        candidates = self._merge_candidates()
+        if not candidates:
+            return False
+        with self._commit_lock, self._lock_directory():
+            disk = self._read_manifest()
+            with self._lock:
+                if disk is None or self._disk_generation(disk) != self._generation:
+                    return False  # Stale until the next commit or refresh
+                if any(segment not in self._segments for segment in candidates):
+                    return False  # Reloaded or merged meanwhile
+                deleted_before = [segment.deleted.copy() for segment in candidates]
+            merged = merge_segments(list(zip(candidates, deleted_before)))
+            merged.save(self.directory)
+
+            with self._lock:
+                # Deletes that landed while merging are carried over to the new segment
+                late = [segment.doc_ids[segment.deleted & ~before]
+                        for segment, before in zip(candidates, deleted_before)]
+                late = np.concatenate(late) if late else np.empty(0, dtype=bytes)
+                if late.size:
+                    merged.mark_deleted(late)
+                for segment in candidates:
+                    self._account(segment, -1)
+                if len(merged.doc_ids):
+                    self._account(merged, +1)
+                position = self._segments.index(candidates[0])
+                self._segments = [segment for segment in self._segments if segment not in candidates]
+                if len(merged.doc_ids):
+                    self._segments.insert(min(position, len(self._segments)), merged)
+                committed = [segment for segment in self._segments if segment.saved]
+                self.stats["merges"] += 1
+            # Only the merge is committed: the vocabulary file and uncommitted segments stay as they are
+            self._write_manifest(committed, self._saved_terms, self._disk_generation(disk) + 1)
+        print(f"🔧 Merged {len(candidates)} BM25 segments into one with {merged.live_count} documents")
+        return True
+
+    # Search
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Top k (doc id, score) for a query; deleted documents are skipped"""
+        tokens = tokenize(query)
+        if not tokens or k <= 0:
+            return []
+        with self._lock:
+            query_terms = Counter(self.vocabulary.lookup(tokens))
+            if not query_terms:
+                return []
+            terms = np.fromiter(query_terms.keys(), dtype=np.int32, count=len(query_terms))
+            segments = list(self._segments)
+            doc_count = self._doc_count
+            average_length = self._total_length / doc_count if doc_count else 0.0
+            df = np.zeros(terms.size, dtype=np.int64)
+            known = terms < self._df.size  # Terms of a segment still being added have no statistics yet
+            df[known] = self._df[terms[known]]
+        if not doc_count or not average_length:
+            return []
+
+        counts = np.fromiter(query_terms.values(), dtype=np.float32, count=len(query_terms))
+        weights = (np.log(1 + (doc_count - df + 0.5) / (df + 0.5)) * counts).astype(np.float32)
+
+        candidate_ids, candidate_scores = [], []
+        for segment in segments:
+            docs, scores = segment.score(terms, weights, self.k1, self.b, average_length)
+            if docs.size:
+                top = _top_k(scores, k)
+                candidate_ids.append(segment.doc_ids[docs[top]])
+                candidate_scores.append(scores[top])
+        if not candidate_ids:
+            return []
+
+        ids = np.concatenate(candidate_ids)
+        scores = np.concatenate(candidate_scores)
+        top = _top_k(scores, k)
+        return [(ids[position].decode(), float(scores[position])) for position in top]
+
+    # Persistence
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _lock_directory(self) -> FileLock:
+        os.makedirs(self.directory, exist_ok=True)
+        if self._file_lock is None:
+            self._file_lock = FileLock(self._path(".lock"))
+        return self._file_lock
+
+    @staticmethod
+    def _disk_generation(manifest: Optional[dict]) -> Optional[int]:
+        return manifest.get("generation", 0) if manifest is not None else None
+
+    def _read_manifest(self) -> Optional[dict]:
+        try:
+            with open(self._path(MANIFEST_NAME), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, segments: List[Segment], vocabulary_size: int, generation: int):
+        """Replace the manifest and delete segment files it no longer lists"""
+        manifest = {
+            "generation": generation,
+            "vocabulary_size": vocabulary_size,
+            "segments": [{"name": segment.name, "deleted": np.flatnonzero(segment.deleted).tolist()}
+                         for segment in segments]
+        }
+        tmp_path = self._path(f"{MANIFEST_NAME}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._path(MANIFEST_NAME))
+        self._generation = generation
+
+        names = {f"{segment.name}.npz" for segment in segments}
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith((".npz", ".seg")) and file_name not in names:
+                os.remove(self._path(file_name))
+
+    def _read_vocabulary(self, size: int) -> Tuple[Vocabulary, int]:
+        """The first size terms of the vocabulary file and their length in bytes"""
+        vocabulary = Vocabulary()
+        length = 0
+        with open(self._path(VOCABULARY_NAME), "rb") as f:
+            for line in f:
+                if len(vocabulary) == size:
+                    break  # Terms appended by a commit that did not finish
+                term = line.rstrip(b"\n").decode("utf-8")
+                vocabulary.ids[term] = len(vocabulary.terms)
+                vocabulary.terms.append(term)
+                length += len(line)
+        if len(vocabulary) < size:
+            raise ValueError(f"vocabulary file has {len(vocabulary)} of {size} terms")
+        return vocabulary, length
+
+    def _sync_locked(self, disk: dict):
+        """Load the committed state and re-apply this worker's uncommitted segments and deletes on top"""
+        vocabulary, vocabulary_bytes = self._read_vocabulary(disk["vocabulary_size"])
+        saved_terms = len(vocabulary)  # Translating uncommitted segments adds terms after these
+        committed = []
+        for entry in disk["segments"]:
+            segment = Segment.load(self.directory, entry["name"])
+            segment.deleted[entry["deleted"]] = True
+            segment.deleted_count = len(entry["deleted"])
+            committed.append(segment)
+
+        with self._lock:
+            pending = [segment.translate(self.vocabulary, vocabulary)
+                       for segment in self._segments if not segment.saved]
+            if self._pending_deletes:
+                deletes = np.array([doc_id.encode() for doc_id in self._pending_deletes], dtype=bytes)
+                for segment in committed:
+                    segment.mark_deleted(deletes)
+            self.vocabulary = vocabulary
+            self._install(committed + pending)
+            self._generation = self._disk_generation(disk)
+            self._saved_terms = saved_terms
+            self._vocabulary_bytes = vocabulary_bytes
+            self.stats["reloads"] += 1
+        print(f"✅ BM25 index loaded: {self.doc_count} documents in {len(self._segments)} segments")
+
+    def load(self) -> bool:
+        """Load the committed segments (keeping uncommitted changes); False if there is no usable index on disk"""
+        with self._commit_lock, self._lock_directory():
+            disk = self._read_manifest()
+            if disk is None:
+                return False
+            try:
+                self._sync_locked(disk)
+            except Exception as e:
+                print(f"⚠️ Could not load BM25 index: {e}")
+                return False
+        return True
+
+    def commit(self):
+        """Write new segments, new vocabulary terms and the manifest (segment list and tombstones)"""
+        with self._commit_lock, self._lock_directory():
+            self._commit_locked(self._read_manifest())
+
+    def _commit_locked(self, disk: Optional[dict]):
+        foreign = self._disk_generation(disk) != self._generation
+        if foreign:
+            # Another worker committed since this one loaded: build on its state
+            self._sync_locked(disk)
+        with self._lock:
+            pending = [segment for segment in self._segments if not segment.saved]
+            if not pending and not self._pending_deletes:
+                return
+            if foreign and pending:
+                # Chunks this worker only added to catch up with the vector index may have been committed meanwhile
+                committed = [segment.doc_ids[~segment.deleted] for segment in self._segments if segment.saved]
+                if committed:
+                    committed_ids = np.concatenate(committed)
+                    for segment in pending:
+                        segment.mark_deleted(committed_ids)
+            segments = list(self._segments)
+            vocabulary = self.vocabulary
+            vocabulary_size = len(vocabulary)
+            self._pending_deletes = []
+
+        # The vocabulary only grows: append the terms added since the last commit
+        with open(self._path(VOCABULARY_NAME), "ab") as f:
+            f.truncate(self._vocabulary_bytes)  # Drop terms appended by a commit that did not finish
+            data = "".join(f"{term}\n" for term in vocabulary.terms[self._saved_terms:vocabulary_size]).encode("utf-8")
+            f.write(data)
+        self._saved_terms = vocabulary_size
+        self._vocabulary_bytes += len(data)
+
+        for segment in pending:
+            segment.save(self.directory)
+        self._write_manifest(segments, vocabulary_size, (self._disk_generation(disk) or 0) + 1)
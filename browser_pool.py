@@ -0,0 +1,251 @@
+"""Pool of warm headless Chromium contexts for JavaScript-rendered pages.
+
+One browser is launched per pool and kept alive; a fixed number of browser
+contexts are created up front and handed out through an asyncio queue, which
+also caps concurrency. Images, fonts and media are blocked so pages load
+faster, every navigation has a timeout, and a context is recycled after
+BROWSER_PAGES_PER_CONTEXT pages to shed accumulated cache and memory.
+
+A render always gives its slot back, even when creating or closing a context
+fails (the slot is then refilled on next use), and a browser that crashed or
+disconnected is relaunched. Waiting for a free context is limited to
+BROWSER_ACQUIRE_TIMEOUT_S and a whole render to BROWSER_RENDER_TIMEOUT_S, so
+a stuck browser fails renders instead of hanging them.
+
+The pool runs on its own event loop thread so it can be used both from async
+routes (await render_url(...)) and from sync extraction code running in worker
+threads (render_url_sync(...)).
+
+Smoke test against a local static server:
+    python browser_pool.py path/to/static/site
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from typing import Optional
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", 3))
+BROWSER_PAGE_TIMEOUT_MS = int(os.getenv("BROWSER_PAGE_TIMEOUT_MS", 15000))
+BROWSER_PAGES_PER_CONTEXT = int(os.getenv("BROWSER_PAGES_PER_CONTEXT", 50))
+BROWSER_ACQUIRE_TIMEOUT_S = float(os.getenv("BROWSER_ACQUIRE_TIMEOUT_S", 30))
+BROWSER_RENDER_TIMEOUT_S = float(os.getenv("BROWSER_RENDER_TIMEOUT_S", 60))
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+
+
+class BrowserPool:
+    """Fixed-size pool of warm Playwright browser contexts"""
+
+    def __init__(self, size: int = BROWSER_POOL_SIZE, page_timeout_ms: int = BROWSER_PAGE_TIMEOUT_MS,
+                 pages_per_context: int = BROWSER_PAGES_PER_CONTEXT,
+                 blocked_resource_types=BLOCKED_RESOURCE_TYPES):
+        self.size = size
+        self.page_timeout_ms = page_timeout_ms
+        self.pages_per_context = pages_per_context
+        self.blocked_resource_types = set(blocked_resource_types)
+        self._playwright = None
+        self._browser = None
+        self._contexts: Optional[asyncio.Queue] = None  # One entry per slot: a context, or None to create one
+        self._launch_lock: Optional[asyncio.Lock] = None
+        self._pages_served = {}
+        self.stats = {"pages": 0, "failures": 0, "recycled": 0, "relaunches": 0}
+
+    async def start(self):
+        from playwright.async_api import async_playwright
+
+        self._playwright = await async_playwright().start()
+        self._launch_lock = asyncio.Lock()
+        await self._ensure_browser()
+        self._contexts = asyncio.Queue()
+        for _ in range(self.size):
+            await self._contexts.put(await self._new_context())
+        print(f"✅ Browser pool started with {self.size} contexts")
+
+    async def _ensure_browser(self):
+        """Launch the browser, or relaunch it after a crash or disconnect"""
+        async with self._launch_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+            if self._browser is not None:
+                print("⚠️ Browser disconnected, relaunching")
+                self.stats["relaunches"] += 1
+                try:
+                    await self._browser.close()
+                except Exception:
+                    pass
+                self._pages_served.clear()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+
+    async def stop(self):
+        if self._contexts is not None:
+            while not self._contexts.empty():
+                context = self._contexts.get_nowait()
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._browser = None
+        self._playwright = None
+
+    async def _new_context(self):
+        context = await self._browser.new_context(java_script_enabled=True)
+        context.set_default_navigation_timeout(self.page_timeout_ms)
+        context.set_default_timeout(self.page_timeout_ms)
+        await context.route("**/*", self._block_heavy_resources)
+        self._pages_served[id(context)] = 0
+        return context
+
+    async def _block_heavy_resources(self, route):
+        if route.request.resource_type in self.blocked_resource_types:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _acquire(self):
+        """A usable context from the pool; waiting on the queue is the concurrency cap (at most `size` pages)"""
+        try:
+            context = await asyncio.wait_for(self._contexts.get(), BROWSER_ACQUIRE_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"No browser context free within {BROWSER_ACQUIRE_TIMEOUT_S:g}s") from None
+        try:
+            await self._ensure_browser()
+            if context is not None and context.browser is not self._browser:
+                context = None  # Belonged to a browser that was relaunched
+            if context is None:
+                context = await self._new_context()
+            return context
+        except BaseException:
+            self._contexts.put_nowait(None)  # Keep the slot; the next render creates the context
+            raise
+
+    def _release(self, context):
+        """Give the slot back: the context, or None to have it replaced when it is due for recycling or broken"""
+        served = self._pages_served.get(id(context), 0)
+        if served >= self.pages_per_context or not self._browser.is_connected():
+            self._pages_served.pop(id(context), None)
+            if served >= self.pages_per_context:
+                self.stats["recycled"] += 1
+            asyncio.ensure_future(self._close_quietly(context))
+            context = None
+        self._contexts.put_nowait(context)
+
+    @staticmethod
+    async def _close_quietly(context):
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+    async def render(self, url: str, wait_until: str = "domcontentloaded") -> str:
+        """Load the URL in a pooled context and return the rendered HTML"""
+        context = await self._acquire()
+        page = None
+        try:
+            page = await context.new_page()
+            await page.goto(url, wait_until=wait_until, timeout=self.page_timeout_ms)
+            html = await page.content()
+            self.stats["pages"] += 1
+            return html
+        except Exception:
+            self.stats["failures"] += 1
+            raise
+        finally:
+            if page is not None:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+            self._pages_served[id(context)] = self._pages_served.get(id(context), 0) + 1
+            self._release(context)
+
+
+# Shared pool running on a dedicated event loop thread
+
+_loop = None
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Start the background loop and the pool on first use"""
+    global _loop, _pool
+    with _pool_lock:
+        if _pool is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="browser-pool", daemon=True).start()
+            pool = BrowserPool()
+            try:
+                asyncio.run_coroutine_threadsafe(pool.start(), loop).result(timeout=BROWSER_RENDER_TIMEOUT_S)
+            except BaseException:
+                # Close whatever did start and end the loop thread; the next render tries again
+                try:
+                    asyncio.run_coroutine_threadsafe(pool.stop(), loop).result(timeout=BROWSER_RENDER_TIMEOUT_S)
+                except BaseException:
+                    pass
+                loop.call_soon_threadsafe(loop.stop)
+                raise
+            _loop, _pool = loop, pool
+        return _pool, _loop
+
+
+async def render_url(url: str) -> str:
+    """Render a URL from async code without blocking the caller's event loop"""
+    pool, loop = await asyncio.to_thread(_get_pool)
+    future = asyncio.run_coroutine_threadsafe(pool.render(url), loop)
+    # Timing out cancels the render on the pool's loop, which gives its context back
+    return await asyncio.wait_for(asyncio.wrap_future(future), BROWSER_RENDER_TIMEOUT_S)
+
+
+def render_url_sync(url: str) -> str:
+    """Render a URL from sync code (e.g. extraction worker threads)"""
+    pool, loop = _get_pool()
+    future = asyncio.run_coroutine_threadsafe(pool.render(url), loop)
+    try:
+        return future.result(timeout=BROWSER_RENDER_TIMEOUT_S)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise TimeoutError(f"Rendering {url} took longer than {BROWSER_RENDER_TIMEOUT_S:g}s") from None
+
+
+def shutdown_browser_pool():
+    """Close the shared browser and stop its loop"""
+    global _loop, _pool
+    with _pool_lock:
+        if _pool is not None:
+            asyncio.run_coroutine_threadsafe(_pool.stop(), _loop).result()
+            _loop.call_soon_threadsafe(_loop.stop)
+        _pool = None
+        _loop = None
+
+
+if __name__ == "__main__":
+    import functools
+    import sys
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+    site_dir = sys.argv[1] if len(sys.argv) > 1 else "templates"
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=site_dir)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    pages = sorted(name for name in os.listdir(site_dir) if name.endswith(".html"))
+    print(f"🌐 Serving {site_dir} on http://127.0.0.1:{port} ({len(pages)} pages)")
+
+    for round_num in range(2):
+        started = time.perf_counter()
+        for name in pages:
+            html = render_url_sync(f"http://127.0.0.1:{port}/{name}")
+            print(f"  {name}: {len(html)} chars")
+        print(f"Round {round_num + 1}: {time.perf_counter() - started:.2f}s")
+
+    print(f"Stats: {_pool.stats}")
+    shutdown_browser_pool()
+    server.shutdown()
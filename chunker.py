@@ -0,0 +1,196 @@
+"""Structure-aware text chunking.
+
+Extractors already mark structure in the text they produce: markdown "#"
+heading lines (html_extract, office_extract), blank lines between blocks,
+" | "-joined table rows one per line, and "--- Page N ---" markers from
+extract_text_from_pdf. The generic recursive character splitter ignored all
+of it, so page markers ended up mid-chunk and chunks straddled sections.
+
+chunk_text() works on offsets into the original string in one linear pass:
+
+1. one scan per boundary kind records every page marker, heading and
+   paragraph/line break offset (each pattern starts with a literal newline,
+   so the regex engine jumps between newlines instead of trying every
+   position);
+2. page markers and headings are hard boundaries (a chunk never spans two
+   pages or two sections; a heading stays with the text under it);
+3. within a section, chunks are cut at the last paragraph break before
+   CHUNK_SIZE, else the last line break (table rows stay whole), else the
+   last sentence end or space, found with bisect / rfind instead of
+   re-splitting the text;
+4. consecutive chunks of an oversized section overlap by up to CHUNK_OVERLAP
+   characters, starting on a sentence (or else word) boundary.
+
+Every chunk carries its page number and heading path ("Intro > Setup").
+"""
+
+import os
+import re
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
+
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 600))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 100))
+
+# A cut closer than this share of CHUNK_SIZE to the chunk start is not worth taking
+MIN_FILL = 0.25
+
+PAGE_LINE = r"[ \t]*---[ \t]*Page[ \t]+(\d+)[ \t]*---[ \t]*(?=\n|$)"
+HEADING_LINE = r"(#{1,6})[ \t]+([^\n]+)"
+
+# Each boundary is searched after a newline; the first line of the text is checked separately
+PAGE_PATTERN = re.compile("\n" + PAGE_LINE)
+HEADING_PATTERN = re.compile("\n" + HEADING_LINE)
+FIRST_PAGE_PATTERN = re.compile(PAGE_LINE)
+FIRST_HEADING_PATTERN = re.compile(HEADING_LINE)
+PARAGRAPH_PATTERN = re.compile(r"\n[ \t]*\n")
+LINE_PATTERN = re.compile(r"\n")
+
+
+@dataclass
+class Chunk:
+    text: str
+    start: int  # Offsets into the chunked text
+    end: int
+    page: Optional[int] = None
+    section_path: List[str] = field(default_factory=list)
+
+    @property
+    def section(self) -> str:
+        return " > ".join(self.section_path)
+
+
+@dataclass
+class _Boundaries:
+    pages: List[tuple] = field(default_factory=list)  # (marker start, marker end, page number)
+    headings: List[tuple] = field(default_factory=list)  # (start, level, title)
+    paragraphs: List[int] = field(default_factory=list)  # Offsets just after a blank line
+    lines: List[int] = field(default_factory=list)  # Offsets just after a newline
+
+
+def find_boundaries(text: str) -> _Boundaries:
+    """Offsets of every page marker, heading, blank line and newline, each list sorted"""
+    found = _Boundaries()
+
+    first = FIRST_PAGE_PATTERN.match(text)
+    if first:
+        found.pages.append((0, first.end(), int(first.group(1))))
+    found.pages += [(match.start() + 1, match.end(), int(match.group(1))) for match in PAGE_PATTERN.finditer(text)]
+
+    first = FIRST_HEADING_PATTERN.match(text)
+    if first:
+        found.headings.append((0, len(first.group(1)), first.group(2).strip()))
+    found.headings += [(match.start() + 1, len(match.group(1)), match.group(2).strip())
+                       for match in HEADING_PATTERN.finditer(text)]
+
+    found.paragraphs = [match.end() for match in PARAGRAPH_PATTERN.finditer(text)]
+    found.lines = [match.end() for match in LINE_PATTERN.finditer(text)]
+    return found
+
+
+def _last_before(offsets: Sequence[int], low: int, high: int) -> Optional[int]:
+    index = bisect_right(offsets, high) - 1
+    if index >= 0 and offsets[index] > low:
+        return offsets[index]
+    return None
+
+
+def _cut_point(text: str, found: _Boundaries, start: int, limit: int, chunk_size: int) -> int:
+    """Best place to end a chunk that starts at start and may not go past limit"""
+    low = start + int(chunk_size * MIN_FILL)
+    for offsets in (found.paragraphs, found.lines):
+        cut = _last_before(offsets, low, limit)
+        if cut is not None:
+            return cut
+    for separator in (". ", "? ", "! ", "; ", " "):
+        position = text.rfind(separator, low, limit)
+        if position != -1:
+            return position + len(separator)
+    return limit
+
+
+def _has_body(text: str, start: int, end: int) -> bool:
+    """Whether a range holds anything besides heading lines"""
+    return any(line.strip() and not line.lstrip().startswith("#") for line in text[start:end].splitlines())
+
+
+def _segments(text: str, found: _Boundaries):
+    """(start, end, page, last heading index) ranges between hard boundaries; page marker lines are dropped"""
+    hard = [(start, end, "page", page) for start, end, page in found.pages]
+    hard += [(start, start, "heading", index) for index, (start, _, _) in enumerate(found.headings)]
+    hard.sort()
+
+    page, heading_index = None, None
+    position = 0
+    for start, end, kind, value in hard:
+        if kind == "heading" and not _has_body(text, position, start):
+            # Consecutive headings ("# Guide" then "## Install") stay with the body below them
+            heading_index = value
+            continue
+        yield position, start, page, heading_index
+        position = end
+        if kind == "page":
+            page = value
+        else:
+            heading_index = value
+    yield position, len(text), page, heading_index
+
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP,
+               page: Optional[int] = None, section_path: Sequence[str] = ()) -> List[Chunk]:
+    """Split text into chunks that respect page, heading, paragraph and table-row boundaries.
+
+    page / section_path describe where the text itself came from (e.g. one extracted PDF page
+    or one DOCX section) and are used until the text says otherwise.
+    """
+    if not text or not text.strip():
+        return []
+
+    found = find_boundaries(text)
+    chunks: List[Chunk] = []
+    base_path = list(section_path)
+    stack: List[tuple] = []  # (level, title) of the enclosing headings
+    applied = 0  # Headings already pushed onto the stack
+
+    for start, end, segment_page, heading_index in _segments(text, found):
+        if heading_index is not None:
+            while applied <= heading_index:
+                _, level, title = found.headings[applied]
+                while stack and stack[-1][0] >= level:
+                    stack.pop()
+                stack.append((level, title))
+                applied += 1
+        path = base_path + [title for _, title in stack if not base_path or title != base_path[-1]]
+        chunk_page = segment_page if segment_page is not None else page
+
+        position = start
+        while position < end:
+            while position < end and text[position].isspace():
+                position += 1
+            if position >= end:
+                break
+            if end - position <= chunk_size:
+                cut = end
+            else:
+                cut = _cut_point(text, found, position, position + chunk_size, chunk_size)
+
+            piece = text[position:cut].strip()
+            if piece:
+                chunks.append(Chunk(text=piece, start=position, end=cut, page=chunk_page, section_path=list(path)))
+            if cut >= end:
+                break
+
+            # Overlap: restart up to chunk_overlap characters back, on a sentence or else a word boundary
+            next_start = max(cut - chunk_overlap, position + 1)
+            if next_start < cut:
+                sentence = text.find(". ", next_start, cut - 2)
+                if sentence != -1:
+                    next_start = sentence + 2
+                else:
+                    space = text.find(" ", next_start, cut)
+                    newline = text.find("\n", next_start, cut)
+                    candidates = [offset for offset in (space, newline) if offset != -1]
+                    next_start = min(candidates) + 1 if candidates else cut
+            position = next_start
+    return chunks
@@ -65,10 +65,37 @@ async def upload_file_to_cloudinary(file_content: bytes, filename: str, user_id:
         print(f"❌ Cloudinary upload error: {str(e)}")
         raise Exception(f"Failed to upload file: {str(e)}")
 
-def delete_file_from_cloudinary(public_id: str):
+async def upload_content_to_cloudinary(file_content: bytes, public_id: str):
+    """Upload a content blob to Cloudinary and return public URL"""
+    try:
+        # public_id is unique per content record, so deleting one record's blob never removes another's
+        upload_result = cloudinary.uploader.upload(
+            file_content,
+            public_id=public_id,
+            folder="study_ai/content",
+            resource_type="auto",
+            type="upload",
+            access_mode="public",
+            secure=True,
+            overwrite=False
+        )
+        
+        print(f"✅ Content uploaded to Cloudinary: {upload_result['public_id']}")
+        
+        return {
+            "url": upload_result["secure_url"],
+            "public_id": upload_result["public_id"],
+            "resource_type": upload_result.get("resource_type", "image")
+        }
+        
+    except Exception as e:
+        print(f"❌ Cloudinary upload error: {str(e)}")
+        raise Exception(f"Failed to upload file: {str(e)}")
+
+def delete_file_from_cloudinary(public_id: str, resource_type: str = "image"):
     """Delete file from Cloudinary"""
     try:
-        result = cloudinary.uploader.destroy(public_id)
+        result = cloudinary.uploader.destroy(public_id, resource_type=resource_type)
         return result
     except Exception as e:
         print(f"Error deleting from Cloudinary: {e}")
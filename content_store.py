@@ -0,0 +1,180 @@
+"""Content-addressed storage for uploaded files.
+
+Every unique file (by SHA-256) is uploaded to Cloudinary once and extracted
+once. UserDocument and GroupDocument rows point at the shared DocumentContent
+record, which is reference counted so the blob is only deleted when the last
+document using it goes away.
+
+Each record uploads its own blob (public_id is the hash plus a random suffix):
+a record for the same bytes created while the previous one is being released
+never shares, and so never loses, the blob that release deletes.
+"""
+
+import hashlib
+import json
+import uuid
+from typing import Any, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, object_session
+
+from database import DocumentContent, ContentFeature
+from cloudinary_config import upload_content_to_cloudinary, delete_file_from_cloudinary
+
+
+def compute_sha256(file_content: bytes) -> str:
+    """Return the hex SHA-256 digest of the file bytes"""
+    return hashlib.sha256(file_content).hexdigest()
+
+
+def get_file_type(filename: str) -> str:
+    """Return the lowercased file extension used as file_type"""
+    return filename.split('.')[-1].lower() if '.' in filename else 'unknown'
+
+
+def _acquire(db: Session, content_id: int) -> Optional[DocumentContent]:
+    """Increment the reference count of an existing content record; None if its last reference was released meanwhile"""
+    updated = db.query(DocumentContent).filter(
+        DocumentContent.id == content_id,
+        DocumentContent.ref_count > 0
+    ).update(
+        {DocumentContent.ref_count: DocumentContent.ref_count + 1},
+        synchronize_session=False
+    )
+    db.commit()
+    if not updated:
+        return None
+    return db.query(DocumentContent).filter(DocumentContent.id == content_id).first()
+
+
+async def get_or_create_content(db: Session, file_content: bytes, filename: str) -> DocumentContent:
+    """Return the shared content record for these bytes, uploading them only if new.
+
+    The returned record already holds a reference for the caller; pair every
+    call with release_content() when the owning document is deleted.
+    """
+    sha256 = compute_sha256(file_content)
+
+    for _ in range(3):
+        existing = db.query(DocumentContent).filter(DocumentContent.sha256 == sha256).first()
+        if existing:
+            content = _acquire(db, existing.id)
+            if content:
+                print(f"♻️ Reusing stored content {sha256[:12]} for {filename}")
+                return content
+            continue  # Deleted by its last owner meanwhile - store it again
+
+        upload_result = await upload_content_to_cloudinary(file_content, f"{sha256}-{uuid.uuid4().hex[:12]}")
+
+        content = DocumentContent(
+            sha256=sha256,
+            cloudinary_url=upload_result["url"],
+            public_id=upload_result["public_id"],
+            resource_type=upload_result.get("resource_type", "image"),
+            file_type=get_file_type(filename),
+            size_bytes=len(file_content),
+            ref_count=1
+        )
+        db.add(content)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another request stored the same bytes first - share its record instead, and drop our blob
+            db.rollback()
+            delete_file_from_cloudinary(content.public_id, content.resource_type)
+            continue
+
+        db.refresh(content)
+        print(f"✅ Stored new content {sha256[:12]} for {filename}")
+        return content
+
+    raise Exception(f"Could not store content {sha256[:12]} for {filename}")
+
+
+def release_content(db: Session, content_id: Optional[int]) -> None:
+    """Drop one reference; delete the blob and cached results when none remain"""
+    if content_id is None:
+        return
+
+    content = db.query(DocumentContent).filter(DocumentContent.id == content_id).first()
+    if content is None:
+        return
+    sha256, public_id, resource_type = content.sha256, content.public_id, content.resource_type
+
+    # Decrement and conditional delete commit together; the decrement's row lock keeps
+    # _acquire from re-referencing the record in between, and _acquire skips ref_count 0
+    db.query(DocumentContent).filter(DocumentContent.id == content_id).update(
+        {DocumentContent.ref_count: DocumentContent.ref_count - 1},
+        synchronize_session=False
+    )
+    unreferenced = db.query(DocumentContent.id).filter(
+        DocumentContent.id == content_id,
+        DocumentContent.ref_count <= 0
+    )
+    db.query(ContentFeature).filter(ContentFeature.content_id.in_(unreferenced.scalar_subquery())) \
+        .delete(synchronize_session=False)
+    deleted = db.query(DocumentContent).filter(
+        DocumentContent.id == content_id,
+        DocumentContent.ref_count <= 0
+    ).delete(synchronize_session=False)
+    db.commit()
+
+    if deleted:
+        db.expunge(content)
+        print(f"🧹 Deleting unreferenced content {sha256[:12]}")
+        delete_file_from_cloudinary(public_id, resource_type or "image")
+
+
+def get_cached_text(content: Optional[DocumentContent]) -> Optional[str]:
+    """Return previously extracted text for this content, if any"""
+    if content is not None and content.extracted_text:
+        return content.extracted_text
+    return None
+
+
+def store_cached_text(content: Optional[DocumentContent], text: str) -> str:
+    """Remember the extracted text so other documents sharing the content skip extraction"""
+    if content is None or not text or not text.strip():
+        return text
+    content.extracted_text = text
+    db = object_session(content)
+    if db is not None:
+        db.commit()
+    return text
+
+
+def get_cached_feature(db: Session, content_id: Optional[int], feature_type: str) -> Optional[Any]:
+    """Return a generation result already produced for this content"""
+    if content_id is None:
+        return None
+
+    feature = db.query(ContentFeature).filter(
+        ContentFeature.content_id == content_id,
+        ContentFeature.feature_type == feature_type
+    ).first()
+    if not feature:
+        return None
+
+    try:
+        return json.loads(feature.content)
+    except json.JSONDecodeError:
+        return None
+
+
+def store_cached_feature(db: Session, content_id: Optional[int], feature_type: str, result: Any) -> None:
+    """Cache a generation result for every document sharing this content (committed by the caller)"""
+    if content_id is None:
+        return
+
+    existing = db.query(ContentFeature).filter(
+        ContentFeature.content_id == content_id,
+        ContentFeature.feature_type == feature_type
+    ).first()
+    if existing:
+        existing.content = json.dumps(result)
+    else:
+        db.add(ContentFeature(
+            content_id=content_id,
+            feature_type=feature_type,
+            content=json.dumps(result)
+        ))
@@ -0,0 +1,194 @@
+"""Bounded-concurrency async crawler for documentation sites.
+
+Replaces the recursive, one-request-at-a-time extract_clean_text crawl. Each
+crawl has its own frontier queue and visited set (nothing leaks between
+crawls), a depth and page budget, per-host concurrency and politeness delay,
+URL normalisation for the visited set, and content-hash dedupe so mirrored
+pages are only emitted once. URLs are fetched as discovered (normalize_url
+drops trailing slashes, which servers treat as a different path) and links
+are resolved against the final URL after redirects. Pages are yielded as soon as they are parsed so callers can
+chunk and index them while the crawl is still running.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+from urllib.parse import urldefrag, urlparse
+
+import httpx
+
+from html_extract import extract_html
+from http_cache import afetch, aget_fresh, new_async_client, normalize_url
+
+CRAWL_MAX_DEPTH = int(os.getenv("CRAWL_MAX_DEPTH", 1))
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", 50))
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", 8))
+CRAWL_PER_HOST_CONCURRENCY = int(os.getenv("CRAWL_PER_HOST_CONCURRENCY", 4))
+CRAWL_POLITENESS_DELAY = float(os.getenv("CRAWL_POLITENESS_DELAY", 0.25))  # Seconds between requests to one host
+
+SKIPPED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".svg", ".pdf", ".zip", ".gz", ".mp4", ".mp3", ".css", ".js")
+
+
+@dataclass
+class CrawledPage:
+    url: str
+    depth: int
+    title: str
+    text: str
+    links: List[str] = field(default_factory=list)
+
+
+def parse_page(html: str, url: str) -> Tuple[str, str, List[str]]:
+    """Return (title, structured text, absolute links) for a documentation page"""
+    page = extract_html(html, url=url)
+
+    # Keep headings, code and tables; drop deprecation/warning paragraphs
+    blocks = [
+        block for block in page.text.split("\n\n")
+        if block.startswith(("#", "```")) or not re.search(r"(deprecated|warning)", block, re.IGNORECASE)
+    ]
+
+    structured_text = f"[ Section: {url} ]\n\n" + "\n\n".join(blocks)
+    return page.title, structured_text.strip(), page.links
+
+
+class Crawler:
+    """One crawl: frontier, visited set and budgets are per instance"""
+
+    def __init__(self, start_url: str, max_depth: int = CRAWL_MAX_DEPTH, max_pages: int = CRAWL_MAX_PAGES,
+                 concurrency: int = CRAWL_CONCURRENCY, per_host_concurrency: int = CRAWL_PER_HOST_CONCURRENCY,
+                 politeness_delay: float = CRAWL_POLITENESS_DELAY, same_host: bool = True,
+                 client: Optional[httpx.AsyncClient] = None):
+        self.start_url, _ = urldefrag(start_url.strip())
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.politeness_delay = politeness_delay
+        self.same_host = same_host
+        self.start_host = urlparse(normalize_url(self.start_url)).netloc
+        self._client = client
+
+        self.visited: Set[str] = set()
+        self.content_hashes: Set[str] = set()
+        self.pages_fetched = 0
+        self.stats = {"fetched": 0, "emitted": 0, "duplicates": 0, "errors": 0}
+
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._host_locks: Dict[str, asyncio.Lock] = {}
+        self._host_last_request: Dict[str, float] = {}
+
+    def _should_visit(self, key: str, depth: int) -> bool:
+        """key is the normalized URL"""
+        if depth > self.max_depth or key in self.visited:
+            return False
+        parsed = urlparse(key)
+        if parsed.scheme not in ("http", "https"):
+            return False
+        if self.same_host and parsed.netloc != self.start_host:
+            return False
+        return not parsed.path.lower().endswith(SKIPPED_EXTENSIONS)
+
+    async def _wait_politely(self, host: str):
+        """Space out request starts to the same host"""
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            elapsed = time.monotonic() - self._host_last_request.get(host, 0.0)
+            if elapsed < self.politeness_delay:
+                await asyncio.sleep(self.politeness_delay - elapsed)
+            self._host_last_request[host] = time.monotonic()
+
+    async def _fetch(self, client: httpx.AsyncClient, url: str) -> Tuple[Optional[str], str]:
+        """(HTML or None for other content types, final URL after redirects)"""
+        # Fresh cache hits skip the host slots and politeness delay entirely
+        response = await aget_fresh(url)
+        if response is None:
+            host = urlparse(url).netloc
+            slots = self._host_slots.setdefault(host, asyncio.Semaphore(self.per_host_concurrency))
+            async with slots:
+                await self._wait_politely(host)
+                response = await afetch(url, client)
+        response.raise_for_status()
+        if "html" not in response.headers.get("content-type", "text/html"):
+            return None, response.final_url
+        return response.text, response.final_url
+
+    async def _worker(self, client: httpx.AsyncClient, frontier: asyncio.Queue, output: asyncio.Queue):
+        while True:
+            url, depth = await frontier.get()
+            try:
+                if self.pages_fetched >= self.max_pages:
+                    continue
+                self.pages_fetched += 1
+
+                print(f"Extracting: {url} (Depth: {depth})")
+                html, final_url = await self._fetch(client, url)
+                self.stats["fetched"] += 1
+                self.visited.add(normalize_url(final_url))  # Links to the redirect target are not fetched again
+                if html is None:
+                    continue
+
+                # Parsing is CPU-bound - keep it off the event loop
+                title, text, links = await asyncio.to_thread(parse_page, html, final_url)
+
+                content_hash = hashlib.sha1(text.split("\n", 1)[-1].encode("utf-8")).hexdigest()
+                if content_hash in self.content_hashes:
+                    self.stats["duplicates"] += 1
+                else:
+                    self.content_hashes.add(content_hash)
+                    self.stats["emitted"] += 1
+                    await output.put(CrawledPage(url=url, depth=depth, title=title, text=text, links=links))
+
+                for link in links:
+                    link, _ = urldefrag(link)
+                    key = normalize_url(link)
+                    if self._should_visit(key, depth + 1):
+                        self.visited.add(key)
+                        frontier.put_nowait((link, depth + 1))
+
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Error fetching {url}: {e}")
+            finally:
+                frontier.task_done()
+
+    async def crawl(self) -> AsyncIterator[CrawledPage]:
+        """Yield pages as they are fetched and parsed"""
+        client = self._client or new_async_client(self.concurrency)
+        frontier: asyncio.Queue = asyncio.Queue()
+        output: asyncio.Queue = asyncio.Queue()
+
+        self.visited.add(normalize_url(self.start_url))
+        frontier.put_nowait((self.start_url, 0))
+
+        workers = [asyncio.create_task(self._worker(client, frontier, output)) for _ in range(self.concurrency)]
+        done_marker = object()
+
+        async def _finish():
+            await frontier.join()
+            await output.put(done_marker)
+
+        finisher = asyncio.create_task(_finish())
+        try:
+            while True:
+                page = await output.get()
+                if page is done_marker:
+                    break
+                yield page
+        finally:
+            finisher.cancel()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(finisher, *workers, return_exceptions=True)
+            if self._client is None:
+                await client.aclose()
+            print(f"✅ Crawl of {self.start_url} finished: {self.stats}")
+
+
+async def crawl_site(url: str, **kwargs) -> List[CrawledPage]:
+    """Crawl and collect every page"""
+    return [page async for page in Crawler(url, **kwargs).crawl()]
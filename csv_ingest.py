@@ -0,0 +1,110 @@
+"""Streaming CSV ingestion.
+
+The old path loaded the whole file with pd.read_csv and rendered it with
+df.to_string(), so memory grew with the file and the character splitter cut
+rows in half. Here the file is read in batches of CSV_READ_BATCH_ROWS rows
+(every value kept as a string, so pandas does not re-infer types per batch)
+and emitted as row groups: each group repeats the header and a one-line
+schema, holds at most CSV_ROWS_PER_DOCUMENT rows and stays under
+CSV_GROUP_MAX_CHARS so it is indexed as a single chunk. Column types are
+inferred once, from the first batch.
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Iterator, List, Optional, Union
+
+import pandas as pd
+
+CSV_READ_BATCH_ROWS = int(os.getenv("CSV_READ_BATCH_ROWS", 5000))
+CSV_ROWS_PER_DOCUMENT = int(os.getenv("CSV_ROWS_PER_DOCUMENT", 50))
+CSV_GROUP_MAX_CHARS = int(os.getenv("CSV_GROUP_MAX_CHARS", 1500))
+CSV_MAX_CELL_CHARS = 200
+
+INTEGER_PATTERN = re.compile(r"^[+-]?\d+$")
+FLOAT_PATTERN = re.compile(r"^[+-]?(\d+\.\d*|\.\d+|\d+)([eE][+-]?\d+)?$")
+BOOLEAN_VALUES = {"true", "false", "yes", "no", "y", "n", "t", "f"}
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2})?)?")
+
+
+@dataclass
+class RowGroup:
+    text: str
+    first_row: int  # 1-based data row numbers (header excluded)
+    last_row: int
+
+
+def infer_column_types(frame: pd.DataFrame) -> Dict[str, str]:
+    """Classify each column as integer, number, boolean, date or text from a sample batch"""
+    types = {}
+    for column in frame.columns:
+        values = [value.strip() for value in frame[column].tolist() if value and value.strip()]
+        if not values:
+            types[column] = "empty"
+        elif all(INTEGER_PATTERN.match(value) for value in values):
+            types[column] = "integer"
+        elif all(FLOAT_PATTERN.match(value.replace(",", "")) for value in values):
+            types[column] = "number"
+        elif all(value.lower() in BOOLEAN_VALUES for value in values):
+            types[column] = "boolean"
+        elif all(DATE_PATTERN.match(value) for value in values):
+            types[column] = "date"
+        else:
+            types[column] = "text"
+    return types
+
+
+def _clean_cell(value: str) -> str:
+    value = re.sub(r"\s+", " ", value or "").strip()
+    if len(value) > CSV_MAX_CELL_CHARS:
+        value = value[:CSV_MAX_CELL_CHARS] + "…"
+    return value
+
+
+def iter_csv_row_groups(source: Union[str, BinaryIO], name: Optional[str] = None) -> Iterator[RowGroup]:
+    """Yield row groups with the header repeated; memory is bounded by one read batch"""
+    reader = pd.read_csv(
+        source,
+        dtype=str,
+        keep_default_na=False,
+        chunksize=CSV_READ_BATCH_ROWS,
+        encoding_errors="replace",
+        on_bad_lines="skip"
+    )
+
+    name = name or (os.path.basename(source) if isinstance(source, str) else "upload.csv")
+    header = schema = None
+    rows: List[str] = []
+    rows_chars = 0
+    first_row = row_number = 0
+
+    def build_group():
+        return RowGroup(
+            text=f"[ CSV: {name} rows {first_row}-{row_number} ]\n{schema}\n{header}\n" + "\n".join(rows),
+            first_row=first_row,
+            last_row=row_number
+        )
+
+    for batch in reader:
+        if header is None:
+            columns = [_clean_cell(str(column)) for column in batch.columns]
+            types = infer_column_types(batch)
+            header = " | ".join(columns)
+            schema = "Columns: " + ", ".join(f"{column} ({types[original]})"
+                                              for column, original in zip(columns, batch.columns))
+
+        for values in batch.itertuples(index=False, name=None):
+            line = " | ".join(_clean_cell(value) for value in values)
+            full = len(rows) >= CSV_ROWS_PER_DOCUMENT or rows_chars + len(line) > CSV_GROUP_MAX_CHARS
+            if rows and full:
+                yield build_group()
+                rows, rows_chars = [], 0
+            if not rows:
+                first_row = row_number + 1
+            row_number += 1
+            rows.append(line)
+            rows_chars += len(line) + 1
+
+    if rows:
+        yield build_group()
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, ForeignKey, Boolean, UniqueConstraint, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
 from datetime import datetime
@@ -34,11 +34,44 @@ class UserDocument(Base):
     original_filename = Column(String)
     cloudinary_url = Column(String)
     file_type = Column(String)
+    content_id = Column(Integer, ForeignKey("document_contents.id"), nullable=True, index=True)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     user = relationship("User", back_populates="documents")
     features = relationship("GeneratedFeature", back_populates="document")
+    content = relationship("DocumentContent")
+
+# Shared content model - one row per unique file (SHA-256), referenced by user and group documents
+class DocumentContent(Base):
+    __tablename__ = "document_contents"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, index=True, nullable=False)
+    cloudinary_url = Column(String, nullable=False)
+    public_id = Column(String, nullable=False)
+    resource_type = Column(String, default="image")
+    file_type = Column(String)
+    size_bytes = Column(Integer, default=0)
+    extracted_text = Column(Text, nullable=True)  # Cached extraction result
+    ref_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    features = relationship("ContentFeature", back_populates="content_record", cascade="all, delete-orphan")
+
+# Generated features cached per unique content, shared by every document pointing at it
+class ContentFeature(Base):
+    __tablename__ = "content_features"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    content_id = Column(Integer, ForeignKey("document_contents.id"), nullable=False, index=True)
+    feature_type = Column(String, nullable=False)  # flashcards, mcqs, mindmap, etc.
+    content = Column(Text, nullable=False)  # JSON string of generated content
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    content_record = relationship("DocumentContent", back_populates="features")
 
 # Generated features model
 class GeneratedFeature(Base):
@@ -89,11 +122,13 @@ class GroupDocument(Base):
     filename = Column(String, nullable=False)
     cloudinary_url = Column(String, nullable=False)
     file_type = Column(String, nullable=False)
+    content_id = Column(Integer, ForeignKey("document_contents.id"), nullable=True, index=True)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
     group = relationship("StudyGroup", foreign_keys=[group_id])
     uploader = relationship("User", foreign_keys=[uploaded_by])
+    content = relationship("DocumentContent")
     features = relationship("GroupFeature", back_populates="document", cascade="all, delete-orphan")
 
 class GroupFeature(Base):
@@ -110,9 +145,80 @@ class GroupFeature(Base):
     document = relationship("GroupDocument", back_populates="features")
     creator = relationship("User", foreign_keys=[created_by])
 
+# Durable ingestion jobs for document Q&A (uploads and URL crawls), shared by every app worker
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(String(36), primary_key=True)  # UUID, returned to the client as job_id
+    kind = Column(String, nullable=False)  # "file" or "url"
+    source = Column(Text, nullable=False)  # Saved upload path or URL
+    name = Column(String, nullable=False, index=True)  # Filename / URL shown to the user
+    tenant = Column(String, nullable=True, index=True)  # Index shard: "user:{id}" or "group:{id}" (tenant_shards.py)
+    status = Column(String, default="queued", nullable=False, index=True)  # queued, running, completed, failed, cancelled
+    priority = Column(Integer, default=0, nullable=False)  # Higher runs first
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=3, nullable=False)
+    next_run_at = Column(DateTime, default=datetime.utcnow, index=True)
+    locked_by = Column(String, nullable=True)  # Worker holding the job
+    locked_at = Column(DateTime, nullable=True)  # Heartbeat; stale leases are re-queued
+    progress_done = Column(Integer, default=0, nullable=False)
+    progress_total = Column(Integer, nullable=True)
+    cancel_requested = Column(Boolean, default=False, nullable=False)
+    error = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)  # JSON string
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+# Sources (files / URLs) indexed into a tenant shard, with their size and last access (see retention.py)
+class IndexedDocument(Base):
+    __tablename__ = "indexed_documents"
+    __table_args__ = (UniqueConstraint("tenant", "source"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant = Column(String, nullable=False, index=True)  # "user:{id}" or "group:{id}" (tenant_shards.py)
+    source = Column(String, nullable=False)  # Filename / URL, the "source" metadata of its chunks
+    chunks = Column(Integer, default=0, nullable=False)
+    size_bytes = Column(Integer, default=0, nullable=False)  # Chunk text plus float32 vectors
+    indexed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+# Short-lived log of pushed events (see event_bus.py); lets other app workers and reconnecting clients catch up
+class AppEvent(Base):
+    __tablename__ = "app_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # Sent to clients as the SSE event id
+    topic = Column(String, nullable=False, index=True)  # "user:{id}", "group:{id}" or "job:{job_id}"
+    event_type = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON string
+    origin = Column(String, nullable=False)  # Publishing process; it has already delivered the event locally
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+# Columns added after the first release - create_all() does not alter existing tables
+ADDED_COLUMNS = {
+    "user_documents": {"content_id": "INTEGER REFERENCES document_contents(id)"},
+    "group_documents": {"content_id": "INTEGER REFERENCES document_contents(id)"},
+    "ingestion_jobs": {"tenant": "VARCHAR"},
+}
+
+def add_missing_columns():
+    """Add columns introduced after a table was first created"""
+    inspector = inspect(engine)
+    existing_tables = inspector.get_table_names()
+    with engine.begin() as conn:
+        for table, columns in ADDED_COLUMNS.items():
+            if table not in existing_tables:
+                continue
+            present = {col["name"] for col in inspector.get_columns(table)}
+            for name, ddl in columns.items():
+                if name not in present:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+                    print(f"✅ Added column {table}.{name}")
+
 # Create all tables
 try:
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
     print("✅ Database tables created successfully")
 except Exception as e:
     print(f"❌ Error creating database tables: {e}")
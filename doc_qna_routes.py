@@ -1,4 +1,4 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, FileResponse, HTMLResponse
 from fastapi.staticfiles import StaticFiles
@@ -7,25 +7,46 @@ import os
 import shutil
 import re
 from typing import List, Optional, Dict, Any
-import threading
 import requests
 from bs4 import BeautifulSoup
 import tempfile
 import time
 from dotenv import load_dotenv
 import google.generativeai as genai
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain_community.document_loaders import PyMuPDFLoader, CSVLoader, WebBaseLoader
 from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.retrievers import BM25Retriever
-from rank_bm25 import BM25Okapi
 from datetime import datetime
 import traceback
 import json
+import uuid
+import asyncio
 import concurrent.futures
+from collections import ChainMap
+import numpy as np
+
+from model_registry import registry, get_model, WARM_ON_STARTUP
+from ingest_pipeline import Pipeline, batched
+from chunker import chunk_text
+from retrieval_fusion import CONTEXT_TOKEN_BUDGET, DEFAULT_WEIGHTS, build_context, fuse, select_documents
+from query_expansion import EXPANSION_WEIGHT, start_expansion
+from embedding_cache import CachedEmbeddings
+from tenant_shards import group_tenant, tenant_shards, user_tenant
+import retention
+from auth import require_auth
+from database import get_db, GroupMembership, User
+from sqlalchemy.orm import Session
+from job_queue import (
+    PermanentJobError,
+    register_handler,
+    enqueue_job,
+    get_job,
+    find_latest_job,
+    list_jobs,
+    cancel_job,
+    start_job_workers
+)
+from event_bus import encode_event, event_stream_response
+from extract_sandbox import ExtractionError, iter_sandboxed_sections
 
 # Import extraction functions
 from function_for_DOC_QNA import (
@@ -48,66 +69,34 @@ if not gemini_api_key:
 
 genai.configure(api_key=gemini_api_key)
 
-# Initialize LLM
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", google_api_key=gemini_api_key)
-
-# Create cache directory
-cache_dir = os.path.join(os.path.dirname(__file__), "model_cache")
-os.makedirs(cache_dir, exist_ok=True)
-
-# Initialize embeddings
-embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2",
-    cache_folder=cache_dir
-)
+# LLM and embeddings are built lazily by model_registry on first use
 
-# Global variables
-all_documents = []
-tokenized_corpus = []
-bm25_index = None
-vector_store = None
-bm25_retriever = None
+# Chunks live in per-tenant shards (tenant_shards.py): a vector index and a BM25 index per user and study group
 
 # Create data directory
 os.makedirs("data", exist_ok=True)
-VECTOR_DB_PATH = "data/vector_db"
 
-# Thread lock for vector store access
-vector_store_lock = threading.Lock()
+# Chunks are embedded and indexed in batches of this size while extraction continues
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 32))
 
-# Store file processing status
-processing_status = {}
+# Per-stage counters of recent ingestions, keyed by (tenant, filename / URL)
+ingest_stats = {}
+MAX_INGEST_STATS = 100
 
 class URLInput(BaseModel):
     url: str
+    priority: int = 0
+    group_id: Optional[int] = None
 
 class ChatInput(BaseModel):
     question: str
 
-def clear_vector_store():
-    """Clears FAISS and BM25 index every 1 hour."""
-    global all_documents, bm25_index, vector_store, bm25_retriever
-
-    while True:
-        print("🕒 Waiting 1 hour before clearing vector database...")
-        time.sleep(3600)  # Wait for 1 hour
-        
-        with vector_store_lock:
-            print("🧹 Clearing vector database...")
-            if os.path.exists(VECTOR_DB_PATH):
-                shutil.rmtree(VECTOR_DB_PATH)
-            os.makedirs(VECTOR_DB_PATH, exist_ok=True)
-
-            # Reset global variables
-            all_documents = []
-            bm25_index = None
-            vector_store = None
-            bm25_retriever = None
-
-            print("✅ Vector database successfully cleared!")
-
-# Run cleanup in the background
-threading.Thread(target=clear_vector_store, daemon=True).start()
+def start_background_tasks():
+    """Start document retention, the job workers and background model warm-up (called on app startup)"""
+    retention.start_retention()
+    start_job_workers()
+    if WARM_ON_STARTUP:
+        registry.warm_up()
 
 def generate_response_with_gemini(query: str, context: str) -> str:
     """Generate response using Gemini with context"""
@@ -123,217 +112,262 @@ def generate_response_with_gemini(query: str, context: str) -> str:
         Answer:
         """
         
-        response = llm.invoke(prompt)
+        response = get_model("llm").invoke(prompt)
         return response.content if hasattr(response, 'content') else str(response)
     except Exception as e:
         print(f"Error generating response: {e}")
         return f"I encountered an error while generating a response. Context available: {len(context)} characters."
 
+def split_into_documents(text: str, metadata: Optional[Dict[str, Any]] = None) -> List[Document]:
+    """Structure-aware chunks of a text, with page number and section path in the metadata"""
+    metadata = metadata or {}
+    base_path = [metadata["section"]] if metadata.get("section") else []
+    documents = []
+    for chunk in chunk_text(text, page=metadata.get("page"), section_path=base_path):
+        chunk_metadata = dict(metadata)
+        if chunk.page is not None:
+            chunk_metadata["page"] = chunk.page
+        if chunk.section_path:
+            chunk_metadata["section"] = chunk.section
+        documents.append(Document(page_content=chunk.text, metadata=chunk_metadata))
+    return documents
+
 def process_extracted_text(text: str) -> List[Document]:
     """Process extracted text into document chunks"""
     try:
         if not text or not text.strip():
             return []
         
-        # Create document
-        doc = Document(page_content=text.strip())
-        
-        # Split text
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=600,
-            chunk_overlap=100,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-        
-        chunks = text_splitter.split_documents([doc])
-        return chunks
+        return split_into_documents(text.strip())
     except Exception as e:
         print(f"Error processing text: {e}")
         return []
 
-def get_vector_store():
-    """Load or create FAISS vector store safely."""
-    global all_documents, bm25_index, vector_store
-
-    if not os.path.exists(VECTOR_DB_PATH):
-        vector_store = FAISS.from_texts(["Placeholder document"], embeddings)
-        return vector_store
-
-    try:
-        vector_store = FAISS.load_local(VECTOR_DB_PATH, embeddings, allow_dangerous_deserialization=True)
-        if not all_documents:
-            all_documents = list(vector_store.docstore._dict.values())
-        update_bm25_index()
-        return vector_store
-    except Exception as e:
-        print(f"Error loading vector store: {e}")
-        vector_store = FAISS.from_texts(["Placeholder document"], embeddings)
-        return vector_store
-
-def update_bm25_index():
-    """Update the BM25 index with FAISS documents."""
-    global bm25_index, tokenized_corpus, all_documents
-
-    if not all_documents:
-        return
-
-    try:
-        tokenized_corpus = [doc.page_content.lower().split() for doc in all_documents]
-        bm25_index = BM25Okapi(tokenized_corpus)
-        print(f"✅ BM25 index updated with {len(all_documents)} documents")
-    except Exception as e:
-        print(f"Error updating BM25 index: {e}")
-
-def extract_text_from_source(file_path=None, url=None):
-    """Extract text using functions from function_for_DOC_QNA.py"""
-    try:
-        if file_path:
-            text = extract_text_auto(file_path=file_path)
-        elif url:
-            text = extract_clean_text(url)
-        else:
-            raise ValueError("Either file_path or url must be provided")
-
-        doc = Document(
-            page_content=text,
-            metadata={"source": file_path or url}
-        )
-
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=600,
-            chunk_overlap=100,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-        
-        return text_splitter.split_documents([doc])
-        
-    except Exception as e:
-        raise ValueError(f"Error extracting text: {e}")
-
-def add_to_vector_store(documents, source_id):
-    """Add documents to FAISS and update BM25 index."""
-    global all_documents, bm25_index, vector_store, bm25_retriever
-
-    if not documents:
-        print("❗ No documents to add to FAISS.")
-        return 0
-
-    with vector_store_lock:
-        if vector_store is None:
-            vector_store = get_vector_store()
-
+def _require_membership(db: Session, user: User, group_id: int):
+    membership = db.query(GroupMembership).filter(
+        GroupMembership.user_id == user.id,
+        GroupMembership.group_id == group_id
+    ).first()
+    if not membership:
+        raise HTTPException(status_code=403, detail="Not a member of this group")
+
+def upload_tenant(db: Session, user: User, group_id: Optional[int]) -> str:
+    """Shard an upload is indexed into: the study group's (members only) or the user's own"""
+    if group_id is None:
+        return user_tenant(user.id)
+    _require_membership(db, user, group_id)
+    return group_tenant(group_id)
+
+def search_tenants(db: Session, user: User, group_id: Optional[int]) -> List[str]:
+    """Shards a question searches: one study group's (members only), or the user's own and all their groups'"""
+    if group_id is not None:
+        _require_membership(db, user, group_id)
+        return [group_tenant(group_id)]
+    memberships = db.query(GroupMembership).filter(GroupMembership.user_id == user.id).all()
+    return [user_tenant(user.id)] + [group_tenant(membership.group_id) for membership in memberships]
+
+def caller_job(db: Session, user: User, job_id: str) -> Dict[str, Any]:
+    """A job of one of the caller's shards; 404 for other tenants' jobs as for unknown ones"""
+    job = get_job(job_id)
+    if job is None or job["tenant"] not in search_tenants(db, user, None):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+def index_embedded_batch(shard, documents, vectors, source_id):
+    """Add already-embedded chunks to the shard's vector and BM25 indexes and return their ids; both are persisted once per source."""
+    texts = [doc.page_content for doc in documents]
+    with shard.lock:
         for doc in documents:
-            if not hasattr(doc, 'metadata'):
-                doc.metadata = {}
             doc.metadata["source"] = source_id
             doc.metadata["timestamp"] = time.time()
 
-        try:
-            vector_store.add_documents(documents)
-            vector_store.save_local(VECTOR_DB_PATH)
-
-            all_documents = list(vector_store.docstore._dict.values())
-            update_bm25_index()
-
-            try:
-                if all_documents:
-                    bm25_retriever = BM25Retriever.from_documents(all_documents)
-                    bm25_retriever.k = 5
-                    print(f"✅ BM25 retriever initialized with {len(all_documents)} documents")
-            except Exception as e:
-                print(f"⚠️ BM25 retriever initialization failed: {e}")
-                bm25_retriever = None
-
-            print(f"✅ {len(documents)} documents added to FAISS.")
-            print(f"📂 FAISS now contains {len(all_documents)} documents.")
-
-            return len(documents)
-            
-        except Exception as e:
-            print(f"Error adding documents to vector store: {e}")
-            return 0
-
-def hybrid_search(query, all_splits, vector_store, top_n=10):
-    """Enhanced hybrid search."""
-    global bm25_index, tokenized_corpus
+        ids = shard.vectors.add(documents, vectors)
+
+    # Only this batch is tokenized, into a new segment, outside the shard lock
+    shard.keywords.add(ids, texts)
+    return ids
+
+def remove_from_index(shard, ids):
+    """Undo a partially indexed source so a retried job does not index it twice"""
+    shard.delete(ids)
+
+def commit_index(shard):
+    """Commit the shard's new vector and BM25 segments after a source has been indexed."""
+    with shard.lock:
+        shard.commit()
+    print(f"📂 Shard {shard.tenant} now contains {len(shard.documents)} documents "
+          f"({shard.keywords.segment_count} BM25 segments).")
+
+def indexed_size(documents, vectors):
+    """Storage a batch counts towards its tenant's budget: chunk text plus float32 vectors"""
+    return sum(len(doc.page_content) for doc in documents) + 4 * sum(len(vector) for vector in vectors)
+
+def chunk_sections(sections):
+    """Chunk stage: split each extracted page/section, keeping its metadata"""
+    for section in sections:
+        text = section["text"].strip()
+        if not text:
+            continue
+        if section["chunked"]:
+            yield Document(page_content=text, metadata=dict(section["metadata"]))
+        else:
+            yield from split_into_documents(text, section["metadata"])
+
+def embed_chunks(chunks):
+    """Embed stage: one model call per batch of chunks"""
+    embeddings = get_model("embeddings")
+    for batch in batched(chunks, EMBED_BATCH_SIZE):
+        yield batch, embeddings.embed_documents([doc.page_content for doc in batch])
+
+def run_ingestion(tenant, source_id, sections, on_start=None):
+    """Stream sections through the pipeline into the tenant's shard; returns the number of chunks indexed.
+
+    Indexing is all-or-nothing: if a stage fails or the pipeline is cancelled, the chunks
+    already added for this source are removed again before the error is re-raised.
+    """
+    with tenant_shards.use([tenant]) as (shard,):
+        return _run_pipeline(shard, source_id, sections, on_start)
+
+def _run_pipeline(shard, source_id, sections, on_start):
+    indexed_ids = []
+    indexed_bytes = 0
+
+    def index_batches(batches):
+        nonlocal indexed_bytes
+        for documents, vectors in batches:
+            indexed_ids.extend(index_embedded_batch(shard, documents, vectors, source_id))
+            indexed_bytes += indexed_size(documents, vectors)
+            yield len(documents)
+
+    pipeline = Pipeline(
+        source_id,
+        sections,
+        [("chunk", chunk_sections), ("embed", embed_chunks), ("index", index_batches)],
+        source_name="extract"
+    )
+    ingest_stats[(shard.tenant, source_id)] = pipeline.stats
+    while len(ingest_stats) > MAX_INGEST_STATS:
+        ingest_stats.pop(next(iter(ingest_stats)))
+
+    if on_start is not None:
+        on_start(pipeline)
 
-    if not all_splits or not vector_store:
+    try:
+        pipeline.run()
+    except BaseException:
+        remove_from_index(shard, indexed_ids)
+        raise
+    if indexed_ids:
+        commit_index(shard)
+        retention.record_indexed(shard.tenant, source_id, len(indexed_ids), indexed_bytes)
+    print(f"📊 Ingestion stats for {source_id}: {pipeline.stats.as_dict()['stages']}")
+    return len(indexed_ids)
+
+# Each retriever contributes this many candidates per wanted result before fusion
+FUSION_CANDIDATES_PER_RESULT = 3
+
+def vector_search(shards, query, k):
+    """(chunk id, similarity) of the k nearest chunks across the shards; negated L2 distance so that higher is better"""
+    embedding = np.array(get_model("embeddings").embed_query(query), dtype=np.float32)
+    # Distances come from the same embedding model in every shard, so the hits can be merged directly
+    hits = [hit for shard in shards if shard.documents for hit in shard.vectors.search(embedding, k)]
+    return [(doc_id, -distance) for doc_id, distance in sorted(hits, key=lambda hit: hit[1])[:k]]
+
+def hybrid_search(query, shards, top_n=10):
+    """Vector and BM25 retrieval on the raw query, plus an optional expanded BM25 query (query_expansion),
+    over the given tenant shards, fused by chunk id (retrieval_fusion); returns up to top_n distinct documents."""
+    if not any(shard.documents for shard in shards):
         return []
 
     print(f"🔍 Retrieved documents for query: {query}")
 
     try:
-        expanded_query = llm.invoke(f"Expand this search query while maintaining its core meaning: '{query}'")
-        expanded_query = expanded_query.content if hasattr(expanded_query, "content") else str(expanded_query)
+        # An LLM expansion (QUERY_EXPANSION=llm) runs in the background meanwhile; nothing waits for it up front
+        expansion = start_expansion(query)
+        docstore = ChainMap(*(shard.documents for shard in shards))
+        candidates = top_n * FUSION_CANDIDATES_PER_RESULT
+        ranked = {}
+        weights = dict(DEFAULT_WEIGHTS)
 
-        results = []
-        
         # Get vector results
         try:
-            vector_results = vector_store.similarity_search_with_score(expanded_query, k=top_n)
-            results.extend([doc for doc, score in vector_results])
+            ranked["vector"] = vector_search(shards, query, candidates)
         except Exception as e:
             print(f"Vector search failed: {e}")
 
-        # Get BM25 results if available
-        if bm25_index and tokenized_corpus:
+        # BM25 scores depend on each shard's own corpus statistics, so every shard contributes its own lists
+        for shard in shards:
+            if not shard.keywords.doc_count:
+                continue
+            keywords = shard.keywords
             try:
-                query_tokens = expanded_query.lower().split()
-                scores = bm25_index.get_scores(query_tokens)
-                top_indices = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:top_n]
-                bm25_results = [all_splits[i] for i in top_indices if i < len(all_splits)]
-                results.extend(bm25_results)
+                bm25_hits = keywords.search(query, candidates)
+                ranked[f"bm25:{shard.tenant}"] = bm25_hits
+                weights[f"bm25:{shard.tenant}"] = DEFAULT_WEIGHTS["bm25"]
+                extra_terms = expansion.terms(
+                    bm25_hits, lambda doc_id: docstore[doc_id].page_content if doc_id in docstore else None,
+                    keywords
+                )
+                if extra_terms:
+                    print(f"🔎 Query expansion ({shard.tenant}): {extra_terms}")
+                    ranked[f"expansion:{shard.tenant}"] = keywords.search(f"{query} {extra_terms}", candidates)
+                    weights[f"expansion:{shard.tenant}"] = EXPANSION_WEIGHT
             except Exception as e:
                 print(f"BM25 search failed: {e}")
 
-        print(f"📊 Found {len(results)} relevant documents")
-        return results[:top_n]
+        fused = fuse(ranked, weights)
+        results = select_documents(fused, docstore, top_n)
+        print(f"📊 Fused {sum(len(hits) for hits in ranked.values())} hits from {len(shards)} shards into "
+              f"{len(fused)} chunks, {len(results)} distinct documents")
+        return results
         
     except Exception as e:
         print(f"Hybrid search error: {e}")
         return []
 
-def process_file(file_path, filename):
-    """Extract text and update vector store in a background thread."""
-    global processing_status, all_documents
-    try:
-        print(f"📂 Processing file: {filename}")
-        processing_status[filename] = "processing"
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future = executor.submit(extract_text_from_source, file_path=file_path)
-            try:
-                docs = future.result(timeout=60)
-            except concurrent.futures.TimeoutError:
-                print(f"❗ Timeout while extracting text from {filename}")
-                processing_status[filename] = "failed"
-                return
-
-        if not docs:
-            print(f"❗ No valid text extracted from {filename}")
-            processing_status[filename] = "failed"
-            return
-        
-        processed_docs = process_extracted_text(docs[0].page_content)
-        
-        if not processed_docs:
-            print(f"❗ No valid content chunks were generated from {filename}")
-            processing_status[filename] = "failed"
-            return
-        
-        doc_count = add_to_vector_store(processed_docs, source_id=filename)
-        print(f"✅ File {filename} processed successfully. {doc_count} documents added.")
+# Ingestion jobs (run by the job_queue worker pool)
 
-        processing_status[filename] = "completed"
+def _run_ingestion_job(context, sections, totals=None):
+    def attach(pipeline):
+        context.on_cancel(pipeline.cancel)
+        context.track_progress(lambda: (pipeline.stats.stages[0].items_out, (totals or {}).get("sections")))
 
-    except Exception as e:
-        print(f"❗ Error processing {filename}: {e}")
-        processing_status[filename] = "failed"
+    if not context.tenant:
+        raise PermanentJobError("Job was queued without a tenant; upload the document again")
+    try:
+        doc_count = run_ingestion(context.tenant, context.name, sections, on_start=attach)
+    except ExtractionError as e:
+        # Timeouts, memory kills and crashes would only repeat on a retry
+        raise PermanentJobError(str(e)) from e
+    if not doc_count:
+        raise PermanentJobError(f"No valid content chunks were generated from {context.name}")
+    print(f"✅ {context.name} processed successfully. {doc_count} documents added.")
+    return {"chunks": doc_count}
+
+def run_file_job(context):
+    """Extract, chunk, embed and index an uploaded file."""
+    print(f"📂 Processing file: {context.name}")
+    totals = {}  # PDF page count, reported by the extraction worker
+    sections = iter_sandboxed_sections("file", context.source, context.is_cancelled,
+                                       on_total=lambda total: totals.update(sections=total))
+    return _run_ingestion_job(context, sections, totals)
+
+def run_url_job(context):
+    """Crawl a site and index pages as they arrive instead of after the whole crawl."""
+    print(f"🌐 Crawling URL: {context.source}")
+    return _run_ingestion_job(context, iter_sandboxed_sections("url", context.source, context.is_cancelled))
+
+register_handler("file", run_file_job)
+register_handler("url", run_url_job)
 
 # Document Q&A routes
 def create_doc_qna_routes(app: FastAPI):
     """Add document Q&A routes to the main FastAPI app"""
     
+    @app.on_event("startup")
+    async def start_doc_qna_background_tasks():
+        start_background_tasks()
+    
     @app.get("/doc-chat", response_class=HTMLResponse)
     async def get_doc_chat_page():
         """Serve the document chat page"""
@@ -347,24 +381,30 @@ def create_doc_qna_routes(app: FastAPI):
             raise HTTPException(status_code=500, detail=str(e))
 
     @app.post("/upload")
-    async def upload_file(file: UploadFile = File(...)):
+    async def upload_file(
+        file: UploadFile = File(...),
+        priority: int = Form(0),
+        group_id: Optional[int] = Form(None),
+        current_user: User = Depends(require_auth),
+        db: Session = Depends(get_db)
+    ):
+        tenant = upload_tenant(db, current_user, group_id)
         try:
             os.makedirs("uploads", exist_ok=True)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            file_path = f"uploads/{timestamp}_{file.filename}"
+            file_path = f"uploads/{uuid.uuid4().hex}_{os.path.basename(file.filename)}"
 
             with open(file_path, "wb") as buffer:
                 shutil.copyfileobj(file.file, buffer)
 
-            print(f"📂 File {file.filename} saved. Now extracting text...")
-            processing_status[file.filename] = "processing"
-
-            threading.Thread(target=process_file, args=(file_path, file.filename), daemon=True).start()
+            # The job row is durable: the file is processed even if this worker restarts
+            job = enqueue_job("file", file_path, file.filename, priority=priority, tenant=tenant)
+            print(f"📂 File {file.filename} saved. Queued as job {job['job_id']}")
 
             return JSONResponse({
                 "status": "success",
                 "message": "File uploaded successfully and is being processed.",
-                "filename": file.filename
+                "filename": file.filename,
+                "job_id": job["job_id"]
             })
 
         except Exception as e:
@@ -372,37 +412,32 @@ def create_doc_qna_routes(app: FastAPI):
             raise HTTPException(500, detail=str(e))
 
     @app.post("/upload-url")
-    async def upload_url(url_input: URLInput):
+    async def upload_url(
+        url_input: URLInput,
+        current_user: User = Depends(require_auth),
+        db: Session = Depends(get_db)
+    ):
         """Process URL and add to knowledge base"""
+        tenant = upload_tenant(db, current_user, url_input.group_id)
         try:
             url = url_input.url.strip()
             print(f"🌐 Processing URL: {url}")
             
-            # Process the URL
-            docs = extract_text_from_source(url=url)
-            
-            if not docs:
+            if not url.startswith(('http://', 'https://')):
                 return JSONResponse({
                     "status": "error",
-                    "message": "No content could be extracted from the URL"
+                    "message": "Invalid URL format."
                 })
             
-            processed_docs = process_extracted_text(docs[0].page_content)
+            # Crawled by a job worker; pages are indexed as they arrive
+            job = enqueue_job("url", url, url, priority=url_input.priority, tenant=tenant)
             
-            if processed_docs:
-                doc_count = add_to_vector_store(processed_docs, source_id=url)
-                print(f"Added {doc_count} chunks to vector store for {url}")
-                
-                return JSONResponse({
-                    "status": "success",
-                    "message": f"URL content processed successfully! Added {doc_count} chunks to knowledge base.",
-                    "url": url
-                })
-            else:
-                return JSONResponse({
-                    "status": "error",
-                    "message": "Failed to create document chunks from URL content"
-                })
+            return JSONResponse({
+                "status": "success",
+                "message": "URL accepted and is being crawled.",
+                "url": url,
+                "job_id": job["job_id"]
+            })
                 
         except Exception as e:
             print(f"❗ Error processing URL: {e}")
@@ -412,62 +447,165 @@ def create_doc_qna_routes(app: FastAPI):
             })
 
     @app.get("/processing-status")
-    async def get_processing_status(filename: str):
-        """Check if a file has finished processing."""
-        status = processing_status.get(filename, "unknown")
-        
+    async def get_processing_status(
+        filename: str,
+        current_user: User = Depends(require_auth),
+        db: Session = Depends(get_db)
+    ):
+        """Check if a file has finished processing (status of its most recent job in the caller's shards)."""
+        job = find_latest_job(filename, search_tenants(db, current_user, None))
+        if job is None:
+            return JSONResponse({"status": "unknown"})
+
+        status = {"queued": "processing", "running": "processing", "completed": "completed"}.get(job["status"], "failed")
+        response = {"status": status, "job_id": job["job_id"], "progress": job["progress"]}
         if status == "failed":
-            return JSONResponse({"status": "failed", "message": "File processing failed."})
+            response["message"] = job["error"] or "File processing failed."
+        return JSONResponse(response)
+
+    @app.get("/jobs")
+    async def get_jobs(
+        status: Optional[str] = None,
+        limit: int = 50,
+        current_user: User = Depends(require_auth),
+        db: Session = Depends(get_db)
+    ):
+        """Recent ingestion jobs of the caller's shards, newest first"""
+        tenants = search_tenants(db, current_user, None)
+        return JSONResponse({"jobs": list_jobs(status, min(limit, 500), tenants)})
+
+    @app.get("/jobs/{job_id}")
+    async def get_job_status(job_id: str, current_user: User = Depends(require_auth), db: Session = Depends(get_db)):
+        return JSONResponse(caller_job(db, current_user, job_id))
+
+    @app.get("/job-events")
+    async def stream_job_events(
+        ids: str,
+        request: Request,
+        current_user: User = Depends(require_auth),
+        db: Session = Depends(get_db)
+    ):
+        """Server-Sent Events with progress of the given jobs of the caller's shards (comma-separated ids); replaces status polling"""
+        job_ids = [job_id for job_id in ids.split(",") if job_id][:50]
+        if not job_ids:
+            raise HTTPException(status_code=400, detail="No job ids given")
+
+        # Current state first, so nothing that happened before the client connected is missed
+        tenants = search_tenants(db, current_user, None)
+        snapshot = []
+        for job_id in list(job_ids):
+            job = await asyncio.to_thread(get_job, job_id)
+            if job is None or job["tenant"] not in tenants:
+                job_ids.remove(job_id)
+                continue
+            snapshot.append(encode_event("job", dict(job, topic=f"job:{job_id}")))
+        if not job_ids:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+        return event_stream_response(
+            [f"job:{job_id}" for job_id in job_ids],
+            snapshot,
+            request.headers.get("last-event-id")
+        )
 
-        return JSONResponse({"status": status})
+    @app.post("/jobs/{job_id}/cancel")
+    async def cancel_ingestion_job(job_id: str, current_user: User = Depends(require_auth), db: Session = Depends(get_db)):
+        caller_job(db, current_user, job_id)
+        job = cancel_job(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return JSONResponse(job)
+
+    @app.get("/ingest-stats")
+    async def get_ingest_stats(
+        source: Optional[str] = None,
+        current_user: User = Depends(require_auth),
+        db: Session = Depends(get_db)
+    ):
+        """Per-stage throughput counters of the caller's recent ingestions (or of one filename/URL)."""
+        tenants = search_tenants(db, current_user, None)
+        mine = {name: stats for (tenant, name), stats in list(ingest_stats.items()) if tenant in tenants}
+        if source is not None:
+            stats = mine.get(source)
+            if stats is None:
+                raise HTTPException(status_code=404, detail="No ingestion found for this source")
+            return JSONResponse(stats.as_dict())
+        return JSONResponse({name: stats.as_dict() for name, stats in mine.items()})
+
+    @app.get("/embedding-cache")
+    async def get_embedding_cache_stats():
+        """Hit rates of the chunk and query embedding caches, and embedding throughput."""
+        if not registry.is_ready("embeddings"):
+            return JSONResponse({"loaded": False})
+        embeddings = get_model("embeddings")
+        if not isinstance(embeddings, CachedEmbeddings):
+            engine = embeddings.report() if hasattr(embeddings, "report") else None
+            return JSONResponse({"loaded": True, "enabled": False, "engine": engine})
+        return JSONResponse(dict(embeddings.report(), loaded=True, enabled=True))
+
+    @app.get("/vector-index")
+    async def get_vector_index_stats(current_user: User = Depends(require_auth), db: Session = Depends(get_db)):
+        """Shard memory budget, and the caller's loaded shards with the type, size and segments of their vector indexes."""
+        tenants = search_tenants(db, current_user, None)
+        indexes = {}
+        for tenant in tenants:
+            shard = tenant_shards.peek(tenant)
+            if shard is not None:
+                indexes[tenant] = shard.vectors.describe()
+        return JSONResponse(dict(tenant_shards.describe(tenants), indexes=indexes))
+
+    @app.get("/retention")
+    async def get_retention(current_user: User = Depends(require_auth), db: Session = Depends(get_db)):
+        """Retention limits and eviction counters, and the caller's indexed documents with their expiry."""
+        tenants = search_tenants(db, current_user, None)
+        return JSONResponse(await asyncio.to_thread(retention.describe, tenants))
 
     @app.post("/chat/{message}")
-    async def chat_with_ai(message: str):
-        """Chat endpoint for document Q&A"""
-        global all_documents, vector_store
+    async def chat_with_ai(
+        message: str,
+        group_id: Optional[int] = None,
+        current_user: User = Depends(require_auth),
+        db: Session = Depends(get_db)
+    ):
+        """Chat endpoint for document Q&A over the caller's shards (or one study group's with group_id)"""
+        tenants = search_tenants(db, current_user, group_id)
         
         try:
             print(f"📩 Received query: {message}")
-            
-            # Handle case when no documents are available
-            if not all_documents:
-                response = "Hello! I can help you analyze documents, images, audio files, and web content. Upload some files or add URLs to get started!"
-                return JSONResponse({"response": response})
-            
-            # Regular chat with document search
-            try:
-                print("✅ Running hybrid search for query:", message)
-                
-                if vector_store is None:
-                    vector_store = get_vector_store()
-                
-                # Perform hybrid search
-                results = hybrid_search(message, all_documents, vector_store, top_n=5)
-                
-                if not results:
-                    print("⚠️ No search results found")
-                    response = "I couldn't find specific information about that query in your uploaded documents. Try uploading more relevant content or rephrasing your question."
+
+            # Loaded on first use, then served from the LRU; picks up documents committed by other workers
+            with tenant_shards.use(tenants) as shards:
+                # Handle case when no documents are available
+                if not any(shard.documents for shard in shards):
+                    response = "Hello! I can help you analyze documents, images, audio files, and web content. Upload some files or add URLs to get started!"
                     return JSONResponse({"response": response})
-                
-                print(f"🔍 Retrieved {len(results)} total documents for query: {message}")
-                
-                # Create context from results
-                context = ""
-                for i, doc in enumerate(results[:3]):
-                    if hasattr(doc, 'page_content'):
-                        context += f"Document {i+1}:\n{doc.page_content}\n\n"
-                    else:
-                        context += f"Document {i+1}:\n{str(doc)}\n\n"
-                
-                # Generate response using Gemini
-                response_text = generate_response_with_gemini(message, context)
-                return JSONResponse({"response": response_text})
-                    
-            except Exception as e:
-                print(f"❌ Search error: {e}")
-                response = "I encountered a search error. Please try uploading a document first or try a different question."
+
+                # Regular chat with document search
+                try:
+                    print("✅ Running hybrid search for query:", message)
+
+                    # Perform hybrid search
+                    results = hybrid_search(message, shards, top_n=8)
+                except Exception as e:
+                    print(f"❌ Search error: {e}")
+                    response = "I encountered a search error. Please try uploading a document first or try a different question."
+                    return JSONResponse({"response": response})
+
+            if not results:
+                print("⚠️ No search results found")
+                response = "I couldn't find specific information about that query in your uploaded documents. Try uploading more relevant content or rephrasing your question."
                 return JSONResponse({"response": response})
             
+            print(f"🔍 Retrieved {len(results)} total documents for query: {message}")
+            retention.touch(tenants, {doc.metadata.get("source") for doc in results if doc.metadata.get("source")})
+            
+            # Create context from the best results that fit the prompt budget
+            context = build_context(results, CONTEXT_TOKEN_BUDGET)
+            
+            # Generate response using Gemini
+            response_text = generate_response_with_gemini(message, context)
+            return JSONResponse({"response": response_text})
+            
         except Exception as e:
             print(f"❗ Chat error: {e}")
             traceback.print_exc()
@@ -0,0 +1,284 @@
+"""Persistent cache of chunk embeddings plus an in-memory LRU for queries.
+
+The same chunk text was embedded again every time it was indexed: the same PDF
+uploaded by another user, a file re-uploaded after the hourly vector store
+wipe, a crawl of pages that were already indexed. Each chat message was also
+re-embedded, even when the question was repeated.
+
+CachedEmbeddings wraps the embeddings model (the registry's "embeddings"
+entry) and keys every text by a 64-bit hash of (model name, text with
+whitespace normalized):
+
+- Chunk vectors go to EMBEDDING_CACHE_DIR/<model>/vectors.bin, a memory-mapped
+  float16 (EMBEDDING_CACHE_DTYPE) array that grows in place. The key of row i
+  is entry i of keys.bin, an append-only uint64 file. Vectors are written
+  before their key, so a crash never leaves a key pointing at an unwritten
+  row.
+- The hash index is a sorted uint64 array searched with np.searchsorted for a
+  whole batch at once, plus a small dict of keys added since the last re-sort.
+  Together they take about 16 bytes per cached chunk.
+- Appends take an flock on the directory, so gunicorn workers can share the
+  cache. Rows appended by other processes are picked up when the keys file
+  grows.
+- Query vectors are kept in an LRU of EMBEDDING_QUERY_CACHE_SIZE entries.
+
+Only texts that miss are sent to the model, in one call per batch. Hit rates
+are in CachedEmbeddings.stats (GET /embedding-cache). Compare ingestion of
+repeated content with python benchmark_embedding_cache.py.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within this process
+    fcntl = None
+
+EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "true").lower() == "true"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "data/embedding_cache")
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")
+EMBEDDING_QUERY_CACHE_SIZE = int(os.getenv("EMBEDDING_QUERY_CACHE_SIZE", 1024))
+
+# Keys added since the last re-sort are looked up in a dict; past this many they are merged in
+RECENT_KEYS_LIMIT = 4096
+INITIAL_ROWS = 1024
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def text_key(model_name: str, text: str) -> int:
+    normalized = WHITESPACE.sub(" ", text).strip()
+    digest = hashlib.blake2b(f"{model_name}\0{normalized}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class FileLock:
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.Lock()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        self._file = open(self.path, "a+")
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        self._thread_lock.release()
+
+
+class EmbeddingStore:
+    """Append-only memory-mapped vectors addressed by 64-bit text keys"""
+
+    def __init__(self, directory: str, dimension: int, dtype: str = EMBEDDING_CACHE_DTYPE):
+        self.directory = directory
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        os.makedirs(directory, exist_ok=True)
+        self._keys_path = os.path.join(directory, "keys.bin")
+        self._vectors_path = os.path.join(directory, "vectors.bin")
+        self._file_lock = FileLock(os.path.join(directory, ".lock"))
+        self._lock = threading.RLock()
+        self._sorted_keys = np.empty(0, dtype=np.uint64)
+        self._sorted_rows = np.empty(0, dtype=np.int64)
+        self._recent: Dict[int, int] = {}
+        self._count = 0
+        self._vectors: Optional[np.memmap] = None
+        self._check_meta()
+        self._load_keys()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _check_meta(self):
+        meta_path = os.path.join(self.directory, "meta.txt")
+        meta = f"{self.dimension} {self.dtype.name}"
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                if f.read().strip() == meta:
+                    return
+            print(f"⚠️ Embedding cache in {self.directory} has another shape or dtype - starting over")
+            for path in (self._keys_path, self._vectors_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        with open(meta_path, "w") as f:
+            f.write(meta)
+
+    def _load_keys(self):
+        """Index every key in keys.bin (at startup, and when another process appended rows)"""
+        if not os.path.exists(self._keys_path):
+            return
+        keys = np.fromfile(self._keys_path, dtype=np.uint64)
+        with self._lock:
+            order = np.argsort(keys, kind="stable")
+            self._sorted_keys = keys[order]
+            self._sorted_rows = order.astype(np.int64)
+            self._recent = {}
+            self._count = keys.size
+            self._vectors = None  # Reopened at the new size on next access
+
+    def _map(self, rows: int) -> np.memmap:
+        """The vectors file mapped with room for at least rows rows"""
+        if self._vectors is not None and self._vectors.shape[0] >= rows:
+            return self._vectors
+        row_bytes = self.dimension * self.dtype.itemsize
+        current = os.path.getsize(self._vectors_path) // row_bytes if os.path.exists(self._vectors_path) else 0
+        capacity = max(current, INITIAL_ROWS)
+        while capacity < rows:
+            capacity *= 2
+        if capacity > current:
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        self._vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r+", shape=(capacity, self.dimension))
+        return self._vectors
+
+    def lookup(self, keys: Sequence[int]) -> List[Optional[np.ndarray]]:
+        """float32 vectors for the keys that are cached, None for the others"""
+        if not keys:
+            return []
+        if os.path.exists(self._keys_path) and os.path.getsize(self._keys_path) // 8 > self._count:
+            self._load_keys()  # Another process added rows
+
+        query = np.array(keys, dtype=np.uint64)
+        with self._lock:
+            rows = np.full(query.size, -1, dtype=np.int64)
+            if self._sorted_keys.size:
+                positions = np.searchsorted(self._sorted_keys, query)
+                inside = positions < self._sorted_keys.size
+                found = np.zeros(query.size, dtype=bool)
+                found[inside] = self._sorted_keys[positions[inside]] == query[inside]
+                rows[found] = self._sorted_rows[positions[found]]
+            for i, key in enumerate(keys):
+                if rows[i] < 0 and key in self._recent:
+                    rows[i] = self._recent[key]
+            if not (rows >= 0).any():
+                return [None] * len(keys)
+            vectors = self._map(self._count)
+            return [vectors[row].astype(np.float32) if row >= 0 else None for row in rows]
+
+    def add(self, keys: Sequence[int], vectors: Sequence[Sequence[float]]) -> np.ndarray:
+        """Store the vectors; returns them as stored (rounded to dtype), as float32 like lookup()"""
+        values = np.asarray(vectors, dtype=np.float32)
+        if not keys:
+            return values
+        stored = values.astype(self.dtype)
+        with self._lock, self._file_lock:
+            # Rows are positions in keys.bin, which other processes may have extended
+            start = os.path.getsize(self._keys_path) // 8 if os.path.exists(self._keys_path) else 0
+            if start != self._count:
+                self._load_keys()
+            mapped = self._map(start + len(keys))
+            mapped[start:start + len(keys)] = stored
+            mapped.flush()
+            with open(self._keys_path, "ab") as f:
+                f.write(np.array(keys, dtype=np.uint64).tobytes())
+            for offset, key in enumerate(keys):
+                self._recent[key] = start + offset
+            self._count = start + len(keys)
+            if len(self._recent) > RECENT_KEYS_LIMIT:
+                self._merge_recent()
+        return stored.astype(np.float32)
+
+    def _merge_recent(self):
+        keys = np.fromiter(self._recent.keys(), dtype=np.uint64, count=len(self._recent))
+        rows = np.fromiter(self._recent.values(), dtype=np.int64, count=len(self._recent))
+        all_keys = np.concatenate([self._sorted_keys, keys])
+        all_rows = np.concatenate([self._sorted_rows, rows])
+        order = np.argsort(all_keys, kind="stable")
+        self._sorted_keys, self._sorted_rows = all_keys[order], all_rows[order]
+        self._recent = {}
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper: persistent cache for documents, LRU for queries"""
+
+    def __init__(self, base: Any, model_name: str, directory: str = EMBEDDING_CACHE_DIR,
+                 query_cache_size: int = EMBEDDING_QUERY_CACHE_SIZE):
+        self.base = base
+        self.model_name = model_name
+        self.directory = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+        self.query_cache_size = query_cache_size
+        self._store: Optional[EmbeddingStore] = None
+        self._store_lock = threading.Lock()
+        self._queries: "OrderedDict[int, List[float]]" = OrderedDict()
+        self._queries_lock = threading.Lock()
+        self.stats = {"document_hits": 0, "document_misses": 0, "query_hits": 0, "query_misses": 0}
+        self._open_existing()
+
+    def _open_existing(self):
+        """Open the cache left by earlier runs; a new one is created on the first miss"""
+        try:
+            with open(os.path.join(self.directory, "meta.txt"), "r") as f:
+                dimension, dtype = f.read().split()
+            self._store = EmbeddingStore(self.directory, int(dimension), dtype)
+            print(f"✅ Embedding cache: {len(self._store)} vectors in {self.directory}")
+        except (OSError, ValueError):
+            self._store = None
+
+    def _get_store(self, dimension: int) -> EmbeddingStore:
+        with self._store_lock:
+            if self._store is None or self._store.dimension != dimension:
+                self._store = EmbeddingStore(self.directory, dimension)
+            return self._store
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_key(self.model_name, text) for text in texts]
+        store = self._store
+        cached = store.lookup(keys) if store is not None else [None] * len(texts)
+
+        # Texts repeated within the batch are embedded once
+        missing: Dict[int, int] = {}
+        for i, vector in enumerate(cached):
+            if vector is None and keys[i] not in missing:
+                missing[keys[i]] = i
+        hits = sum(1 for vector in cached if vector is not None)
+        self.stats["document_hits"] += hits
+        self.stats["document_misses"] += len(texts) - hits
+
+        if missing:
+            fresh = self.base.embed_documents([texts[i] for i in missing.values()])
+            store = self._get_store(len(fresh[0]))
+            # Misses return the stored (rounded) vectors too, so a text embeds the same on every upload
+            by_key = dict(zip(missing.keys(), store.add(list(missing.keys()), fresh)))
+            return [(by_key[key] if vector is None else vector).tolist() for key, vector in zip(keys, cached)]
+        return [vector.tolist() for vector in cached]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = text_key(self.model_name, text)
+        with self._queries_lock:
+            vector = self._queries.get(key)
+            if vector is not None:
+                self._queries.move_to_end(key)
+                self.stats["query_hits"] += 1
+                return vector
+        self.stats["query_misses"] += 1
+        vector = self.base.embed_query(text)
+        with self._queries_lock:
+            self._queries[key] = vector
+            while len(self._queries) > self.query_cache_size:
+                self._queries.popitem(last=False)
+        return vector
+
+    def report(self) -> Dict[str, Any]:
+        documents = self.stats["document_hits"] + self.stats["document_misses"]
+        queries = self.stats["query_hits"] + self.stats["query_misses"]
+        return dict(
+            self.stats,
+            document_hit_rate=round(self.stats["document_hits"] / documents, 4) if documents else None,
+            query_hit_rate=round(self.stats["query_hits"] / queries, 4) if queries else None,
+            cached_vectors=len(self._store) if self._store is not None else 0,
+            directory=self.directory,
+            engine=self.base.report() if hasattr(self.base, "report") else None
+        )
@@ -0,0 +1,188 @@
+"""Embedding engine for ingestion and queries.
+
+Embeddings came from HuggingFaceEmbeddings with default settings, called
+inline from the ingestion thread. EmbeddingEngine runs the same
+sentence-transformers model with a few changes:
+
+- Each call is encoded in EMBEDDING_BATCH_SIZE batches (SentenceTransformer
+  already sorts texts by length within a call, so batches pad little either way).
+- EMBEDDING_BACKEND selects the runtime:
+    torch       the float model, as before (default)
+    torch-int8  torch dynamic int8 quantization of the Linear layers
+    onnx        ONNX Runtime export (needs optimum[onnxruntime])
+    onnx-int8   the int8 ONNX file shipped with the model (EMBEDDING_ONNX_FILE)
+- With EMBEDDING_WORKERS > 1, calls of at least EMBEDDING_SHARD_MIN texts are
+  split into shards and run on a spawned process pool. Shards take every
+  EMBEDDING_WORKERS-th text by length, so each gets a similar mix of short and
+  long texts and the workers finish together. Each worker holds one model and
+  cpu_count / EMBEDDING_WORKERS torch threads.
+- Throughput (chunks/s) is recorded in EmbeddingEngine.stats (updated under a
+  lock, since several ingestion threads embed at once) and logged for large calls.
+
+python benchmark_embeddings.py measures chunks/s per backend and checks that
+recall@10 against the float model stays above a threshold.
+"""
+
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", 1))
+EMBEDDING_SHARD_MIN = int(os.getenv("EMBEDDING_SHARD_MIN", 128))
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# Calls at least this large are logged with their throughput
+LOG_MIN_TEXTS = 256
+
+
+def load_model(model_name: str, backend: str, cache_folder: Optional[str] = None, threads: Optional[int] = None):
+    """A SentenceTransformer for the given backend (int8 backends run on CPU only)"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r} (expected one of {', '.join(BACKENDS)})")
+    if threads:
+        torch.set_num_threads(threads)
+
+    if backend == "onnx":
+        return SentenceTransformer(model_name, cache_folder=cache_folder, backend="onnx")
+    if backend == "onnx-int8":
+        return SentenceTransformer(model_name, device="cpu", cache_folder=cache_folder, backend="onnx",
+                                   model_kwargs={"file_name": EMBEDDING_ONNX_FILE})
+
+    # The float model keeps using a GPU when there is one, as HuggingFaceEmbeddings did
+    model = SentenceTransformer(model_name, device="cpu" if backend == "torch-int8" else None,
+                                cache_folder=cache_folder)
+    if backend == "torch-int8":
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    model.eval()
+    return model
+
+
+def encode_texts(model, texts: List[str], batch_size: int) -> List[List[float]]:
+    """Encode texts in input order"""
+    return model.encode(texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True).tolist()
+
+
+# Per-process model, created by the pool initializer
+_worker_model = None
+
+
+def _init_worker(model_name: str, backend: str, cache_folder: Optional[str], threads: int):
+    global _worker_model
+    _worker_model = load_model(model_name, backend, cache_folder, threads)
+
+
+def _encode_shard(texts: List[str], batch_size: int) -> List[List[float]]:
+    return encode_texts(_worker_model, texts, batch_size)
+
+
+class EmbeddingEngine(Embeddings):
+    """Batched, optionally quantized and sharded sentence-transformers embeddings"""
+
+    def __init__(self, model_name: str, cache_folder: Optional[str] = None, backend: str = EMBEDDING_BACKEND,
+                 batch_size: int = EMBEDDING_BATCH_SIZE, workers: int = EMBEDDING_WORKERS,
+                 shard_min: int = EMBEDDING_SHARD_MIN):
+        self.model_name = model_name
+        self.cache_folder = cache_folder
+        self.backend = backend
+        self.batch_size = batch_size
+        self.workers = max(1, workers)
+        self.shard_min = shard_min
+        self.model = load_model(model_name, backend, cache_folder)
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {"calls": 0, "texts": 0, "seconds": 0.0, "sharded_calls": 0}
+
+    @property
+    def model_id(self) -> str:
+        """Identifies the vectors this engine produces (used as the embedding cache key)"""
+        return self.model_name if self.backend == "torch" else f"{self.model_name}:{self.backend}"
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                threads = max(1, (os.cpu_count() or 1) // self.workers)
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_name, self.backend, self.cache_folder, threads)
+                )
+                print(f"✅ Embedding pool started with {self.workers} workers ({threads} threads each)")
+            return self._executor
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _encode_sharded(self, texts: List[str]) -> List[List[float]]:
+        # Dealing texts out by length gives every worker a similar amount of work
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        shards = [order[start::self.workers] for start in range(self.workers) if order[start::self.workers]]
+        executor = self._get_executor()
+        futures = [executor.submit(_encode_shard, [texts[i] for i in shard], self.batch_size) for shard in shards]
+
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for shard, future in zip(shards, futures):
+            for i, vector in zip(shard, future.result()):
+                vectors[i] = vector
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        started = time.perf_counter()
+        texts = [text.replace("\n", " ") for text in texts]  # As HuggingFaceEmbeddings did
+        vectors = None
+        sharded = False
+        if self.workers > 1 and len(texts) >= self.shard_min:
+            try:
+                vectors = self._encode_sharded(texts)
+                sharded = True
+            except BrokenProcessPool:
+                # A worker died (out of memory, killed); the pool is recreated on the next call
+                print("⚠️ Embedding pool broke - embedding this batch in-process")
+                self.shutdown()
+        if vectors is None:
+            vectors = encode_texts(self.model, texts, self.batch_size)
+
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self.stats["calls"] += 1
+            self.stats["texts"] += len(texts)
+            self.stats["seconds"] += elapsed
+            self.stats["sharded_calls"] += int(sharded)
+        if len(texts) >= LOG_MIN_TEXTS:
+            print(f"⚡ Embedded {len(texts)} chunks in {elapsed:.2f}s ({len(texts) / elapsed:.0f} chunks/s, {self.backend})")
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.encode(text.replace("\n", " "), show_progress_bar=False, convert_to_numpy=True).tolist()
+
+    def report(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        seconds = stats["seconds"]
+        return dict(
+            stats,
+            seconds=round(seconds, 3),
+            chunks_per_second=round(stats["texts"] / seconds, 1) if seconds else None,
+            backend=self.backend,
+            workers=self.workers,
+            batch_size=self.batch_size
+        )
@@ -0,0 +1,247 @@
+"""Server push (Server-Sent Events) for ingestion progress and study-group activity.
+
+Pages used to poll: doc-chat asked /processing-status once a second per upload
+and group pages re-fetched their member and document lists. Instead, events
+are published to topics and streamed to subscribers:
+
+- "job:{job_id}"  ingestion job progress and completion (job_queue)
+- "user:{id}"     a user's documents and generated features
+- "group:{id}"    documents, features and members of a study group
+
+Each event is written to the app_events table once and delivered straight
+away to subscribers in the publishing process. Other processes (gunicorn
+workers) pick it up with a single query every EVENTS_POLL_INTERVAL that is
+shared by all of their subscribers, and a reconnecting client resumes from
+its Last-Event-ID with the same table.
+
+Fan-out is cheap for large groups: an event is serialized once and the same
+SSE frame is put on every subscriber's queue. Queues are bounded; a client
+that falls EVENTS_SUBSCRIBER_QUEUE events behind is disconnected and catches
+up through Last-Event-ID when EventSource reconnects.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi.responses import StreamingResponse
+
+from database import AppEvent, SessionLocal
+
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", 1.0))
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", 15))
+EVENTS_SUBSCRIBER_QUEUE = int(os.getenv("EVENTS_SUBSCRIBER_QUEUE", 100))
+EVENTS_RETENTION_SECONDS = int(os.getenv("EVENTS_RETENTION_SECONDS", 600))
+EVENTS_REPLAY_LIMIT = 500
+PRUNE_INTERVAL = 60
+
+ORIGIN = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def encode_event(event_type: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """One SSE frame; built once per event and shared by every subscriber"""
+    frame = f"id: {event_id}\n" if event_id is not None else ""
+    return frame + f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class Subscription:
+    def __init__(self, topics: Set[str]):
+        self.topics = topics
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=EVENTS_SUBSCRIBER_QUEUE)
+        self.last_id = 0
+        self.closed = False
+
+    def push(self, item: Tuple[int, str]):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop the backlog and end the stream; the client resumes from Last-Event-ID
+            self.closed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class EventBus:
+    """Topic -> subscribers registry living on the server's event loop"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._poller: Optional[asyncio.Task] = None
+        self._last_seen_id = 0
+        self._last_prune = 0.0
+        self.stats = {"published": 0, "delivered": 0, "dropped_subscribers": 0}
+
+    @property
+    def subscriber_count(self) -> int:
+        return len({sub for subs in self._subscribers.values() for sub in subs})
+
+    # Publishing (any thread)
+
+    def publish(self, topic: str, event_type: str, data: Dict[str, Any]):
+        """Record an event and push it to this process's subscribers; never raises"""
+        data = dict(data, topic=topic)
+        try:
+            with SessionLocal() as db:
+                event = AppEvent(topic=topic, event_type=event_type, payload=json.dumps(data, default=str), origin=ORIGIN)
+                db.add(event)
+                db.commit()
+                event_id = event.id
+        except Exception as e:
+            print(f"⚠️ Could not publish {event_type} to {topic}: {e}")
+            return
+
+        self.stats["published"] += 1
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        frame = encode_event(event_type, data, event_id)
+        if _on_loop(loop):
+            self._dispatch(topic, event_id, frame)
+        else:
+            loop.call_soon_threadsafe(self._dispatch, topic, event_id, frame)
+
+    def _dispatch(self, topic: str, event_id: int, frame: str):
+        subscribers = self._subscribers.get(topic)
+        if not subscribers:
+            return
+        for sub in list(subscribers):
+            sub.push((event_id, frame))
+            if sub.closed:
+                self.stats["dropped_subscribers"] += 1
+                self.unsubscribe(sub)
+        self.stats["delivered"] += len(subscribers)
+
+    # Subscribing (event loop)
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        self._loop = asyncio.get_running_loop()
+        sub = Subscription(set(topics))
+        for topic in sub.topics:
+            self._subscribers.setdefault(topic, set()).add(sub)
+        if self._poller is None or self._poller.done():
+            self._poller = self._loop.create_task(self._poll_other_processes())
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        sub.closed = True
+        for topic in sub.topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(sub)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    async def stream(self, sub: Subscription, snapshot: Iterable[str] = (), last_event_id: Optional[int] = None):
+        """SSE body: snapshot frames, missed events since last_event_id, then live events"""
+        try:
+            for frame in snapshot:
+                yield frame
+            if last_event_id is not None:
+                sub.last_id = last_event_id
+                for event_id, frame in await asyncio.to_thread(_load_events, sub.topics, last_event_id):
+                    sub.last_id = event_id
+                    yield frame
+            while True:
+                try:
+                    item = await asyncio.wait_for(sub.queue.get(), EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if item is None:
+                    break
+                event_id, frame = item
+                if event_id <= sub.last_id:
+                    continue  # Already sent during the replay
+                sub.last_id = event_id
+                yield frame
+        finally:
+            self.unsubscribe(sub)
+
+    async def _poll_other_processes(self):
+        """Deliver events published by other workers; one query per interval for all subscribers"""
+        try:
+            self._last_seen_id = await asyncio.to_thread(_max_event_id)
+        except Exception as e:
+            print(f"⚠️ Event poller could not start: {e}")
+        while self._subscribers:
+            await asyncio.sleep(EVENTS_POLL_INTERVAL)
+            try:
+                rows = await asyncio.to_thread(_load_events_after, self._last_seen_id)
+                for event_id, topic, origin, frame in rows:
+                    self._last_seen_id = max(self._last_seen_id, event_id)
+                    if origin != ORIGIN:
+                        self._dispatch(topic, event_id, frame)
+                if time.monotonic() - self._last_prune > PRUNE_INTERVAL:
+                    self._last_prune = time.monotonic()
+                    await asyncio.to_thread(_prune_events)
+            except Exception as e:
+                print(f"⚠️ Event poll failed: {e}")
+
+
+def _on_loop(loop: asyncio.AbstractEventLoop) -> bool:
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+def _row_frame(event: AppEvent) -> str:
+    return encode_event(event.event_type, json.loads(event.payload), event.id)
+
+
+def _max_event_id() -> int:
+    with SessionLocal() as db:
+        latest = db.query(AppEvent.id).order_by(AppEvent.id.desc()).first()
+        return latest.id if latest else 0
+
+
+def _load_events_after(after_id: int) -> List[Tuple[int, str, str, str]]:
+    with SessionLocal() as db:
+        events = db.query(AppEvent).filter(AppEvent.id > after_id) \
+            .order_by(AppEvent.id).limit(EVENTS_REPLAY_LIMIT).all()
+        return [(event.id, event.topic, event.origin, _row_frame(event)) for event in events]
+
+
+def _load_events(topics: Set[str], after_id: int) -> List[Tuple[int, str]]:
+    with SessionLocal() as db:
+        events = db.query(AppEvent).filter(AppEvent.topic.in_(topics), AppEvent.id > after_id) \
+            .order_by(AppEvent.id).limit(EVENTS_REPLAY_LIMIT).all()
+        return [(event.id, _row_frame(event)) for event in events]
+
+
+def _prune_events():
+    cutoff = datetime.utcnow() - timedelta(seconds=EVENTS_RETENTION_SECONDS)
+    with SessionLocal() as db:
+        db.query(AppEvent).filter(AppEvent.created_at < cutoff).delete(synchronize_session=False)
+        db.commit()
+
+
+event_bus = EventBus()
+
+
+def publish(topic: str, event_type: str, data: Dict[str, Any]):
+    event_bus.publish(topic, event_type, data)
+
+
+def event_stream_response(topics: Iterable[str], snapshot: Iterable[str] = (),
+                          last_event_id: Optional[str] = None) -> StreamingResponse:
+    """StreamingResponse for an SSE route; call from the route handler (on the event loop)"""
+    try:
+        resume_from = int(last_event_id) if last_event_id else None
+    except ValueError:
+        resume_from = None
+    sub = event_bus.subscribe(topics)
+    return StreamingResponse(
+        event_bus.stream(sub, list(snapshot), resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
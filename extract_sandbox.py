@@ -0,0 +1,289 @@
+"""Sandboxed text extraction in recyclable worker processes.
+
+Parsing untrusted uploads (PDF, scanned pages through OCR, audio, HTML from
+crawled sites) used to run on threads of the app process: a pathological file
+could spin a core or grow memory forever, and a thread cannot be killed.
+Extraction now runs in a small pool of spawned worker processes:
+
+- Sections are streamed back over a pipe as they are extracted, so the
+  ingestion pipeline still chunks and embeds while extraction continues.
+- Every job has a wall-clock limit (EXTRACT_TIMEOUT_SECONDS) and a resident
+  memory cap (EXTRACT_MAX_RSS_MB, sampled from /proc); when either is
+  exceeded the worker is killed, not asked to stop.
+- A worker is replaced after EXTRACT_MAX_JOBS_PER_WORKER jobs to shed memory
+  that parsers leak, and after any crash, timeout or kill.
+
+Failures surface as ExtractionError subclasses; the job queue reports them as
+a failed job instead of retrying a file that will fail the same way again.
+Set EXTRACT_SANDBOX=false to extract in-process (e.g. when debugging).
+
+OCR of scanned pages and images is sent back to the app process and runs on
+the shared OCR pool (ocr_pool.py), in parallel, with one EasyOCR reader per
+pool worker that survives sandbox recycling. The time a job waits for OCR
+does not count against EXTRACT_TIMEOUT_SECONDS.
+
+Audio files skip the sandbox: decoding and transcription already happen in
+ffmpeg and the transcription pool (transcribe_pool.py), and a sandbox worker
+would otherwise start a pool, and load a Whisper model, of its own.
+"""
+
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import ocr_pool
+from transcribe_pool import is_audio_file
+
+EXTRACT_SANDBOX = os.getenv("EXTRACT_SANDBOX", "true").lower() == "true"
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", 2))
+EXTRACT_TIMEOUT_SECONDS = float(os.getenv("EXTRACT_TIMEOUT_SECONDS", 600))
+EXTRACT_MAX_RSS_MB = int(os.getenv("EXTRACT_MAX_RSS_MB", 2048))
+EXTRACT_MAX_JOBS_PER_WORKER = int(os.getenv("EXTRACT_MAX_JOBS_PER_WORKER", 20))
+MONITOR_INTERVAL = 0.5
+
+
+class ExtractionError(Exception):
+    """Extraction failed inside the sandbox (the message is shown as the job error)"""
+
+
+class ExtractionTimeout(ExtractionError):
+    pass
+
+
+class ExtractionMemoryExceeded(ExtractionError):
+    pass
+
+
+class ExtractionCrashed(ExtractionError):
+    pass
+
+
+class ExtractionCancelled(Exception):
+    pass
+
+
+def _sources() -> Dict[str, Callable[[str], Iterator[Dict[str, Any]]]]:
+    from function_for_DOC_QNA import iter_crawled_sections, iter_text_sections
+
+    return {"file": iter_text_sections, "url": iter_crawled_sections}
+
+
+def _count(kind: str, target: str) -> Optional[int]:
+    from function_for_DOC_QNA import count_sections
+
+    return count_sections(target) if kind == "file" else None
+
+
+def _ocr_in_parent(conn, name: str, *args):
+    """OCR delegate of a worker: the parent runs the request on the shared OCR pool and sends the result"""
+    conn.send(("ocr", (name, args)))
+    message, payload = conn.recv()
+    if message == "ocr_error":
+        raise RuntimeError(payload)
+    return payload
+
+
+def _worker_main(conn):
+    """Worker process: run extraction requests until told to stop"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is handled by the parent, which kills us
+    # A nested OCR pool would outlive a kill, and OCR here would run one page at a time
+    ocr_pool.set_ocr_delegate(lambda name, *args: _ocr_in_parent(conn, name, *args))
+    sources = _sources()
+
+    while True:
+        request = conn.recv()
+        if request is None:
+            break
+        kind, target = request
+        try:
+            conn.send(("total", _count(kind, target)))
+            for section in sources[kind](target):
+                conn.send(("section", section))
+            conn.send(("done", None))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+OCR_REQUESTS = ("ocr_pdf_pages", "ocr_image")
+
+
+def _run_ocr(name: str, args) -> tuple:
+    """Run a worker's OCR request on the shared pool; the reply it waits for"""
+    try:
+        if name not in OCR_REQUESTS:
+            raise ValueError(f"Unknown OCR request {name!r}")
+        return "ocr_result", getattr(ocr_pool, name)(*args)
+    except Exception as e:
+        return "ocr_error", f"{type(e).__name__}: {e}"
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident memory of a process in MB (Linux /proc, or psutil when installed)"""
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil
+
+        return psutil.Process(pid).memory_info().rss / 1024 / 1024
+    except Exception:
+        return None
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), name="extract-worker", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+            self.process.join(timeout=5)
+        except (OSError, BrokenPipeError):
+            pass
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class ExtractionSandbox:
+    """Bounded pool of extraction processes with per-job time and memory limits"""
+
+    def __init__(self, size: int = EXTRACT_WORKERS):
+        self.size = size
+        self._context = multiprocessing.get_context("spawn")
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: List[_Worker] = []
+        self._lock = threading.Lock()
+        self.stats = {"jobs": 0, "timeouts": 0, "memory_kills": 0, "crashes": 0, "recycled": 0}
+
+    def _checkout(self) -> _Worker:
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.kill()
+        return _Worker(self._context)
+
+    def _checkin(self, worker: _Worker):
+        worker.jobs += 1
+        if worker.jobs >= EXTRACT_MAX_JOBS_PER_WORKER:
+            self.stats["recycled"] += 1
+            worker.stop()
+            return
+        with self._lock:
+            self._idle.append(worker)
+
+    def iter_sections(self, kind: str, target: str, is_cancelled: Optional[Callable[[], bool]] = None,
+                      on_total: Optional[Callable[[Optional[int]], None]] = None,
+                      timeout: float = EXTRACT_TIMEOUT_SECONDS,
+                      max_rss_mb: int = EXTRACT_MAX_RSS_MB) -> Iterator[Dict[str, Any]]:
+        """Stream the sections of a file ("file") or crawl ("url") extracted in a worker process.
+
+        on_total receives the expected number of sections (PDF pages) when the worker knows it.
+        """
+        self._slots.acquire()
+        worker = None
+        finished = False
+        try:
+            worker = self._checkout()
+            worker.conn.send((kind, target))
+            self.stats["jobs"] += 1
+            deadline = time.monotonic() + timeout
+            next_memory_check = 0.0
+
+            while True:
+                if worker.conn.poll(MONITOR_INTERVAL):
+                    try:
+                        message, payload = worker.conn.recv()
+                    except (EOFError, OSError):
+                        worker.process.join(timeout=1)
+                        self.stats["crashes"] += 1
+                        raise ExtractionCrashed(f"Extraction worker crashed (exit code {worker.process.exitcode})")
+                    if message == "section":
+                        yield payload
+                    elif message == "total":
+                        if on_total is not None:
+                            on_total(payload)
+                    elif message == "ocr":
+                        started = time.monotonic()
+                        worker.conn.send(_run_ocr(*payload))
+                        deadline += time.monotonic() - started
+                    elif message == "done":
+                        finished = True
+                        return
+                    else:
+                        finished = True  # The worker caught the error and is still usable
+                        raise ExtractionError(payload)
+                elif not worker.process.is_alive():
+                    self.stats["crashes"] += 1
+                    raise ExtractionCrashed(f"Extraction worker crashed (exit code {worker.process.exitcode})")
+
+                if is_cancelled is not None and is_cancelled():
+                    raise ExtractionCancelled(target)
+                if time.monotonic() > deadline:
+                    self.stats["timeouts"] += 1
+                    raise ExtractionTimeout(f"Extraction took longer than {timeout:.0f}s")
+                if time.monotonic() >= next_memory_check:
+                    next_memory_check = time.monotonic() + MONITOR_INTERVAL
+                    memory = rss_mb(worker.process.pid)
+                    if memory is not None and memory > max_rss_mb:
+                        self.stats["memory_kills"] += 1
+                        raise ExtractionMemoryExceeded(f"Extraction used {memory:.0f} MB (limit {max_rss_mb} MB)")
+        finally:
+            # Anything but a clean finish (limits, crash, cancel, consumer gone) leaves the worker mid-job
+            if worker is not None:
+                if finished:
+                    self._checkin(worker)
+                else:
+                    worker.kill()
+            self._slots.release()
+
+    def shutdown(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
+
+
+_sandbox = None
+_sandbox_lock = threading.Lock()
+
+
+def get_sandbox() -> ExtractionSandbox:
+    global _sandbox
+    with _sandbox_lock:
+        if _sandbox is None:
+            _sandbox = ExtractionSandbox()
+            print(f"✅ Extraction sandbox ready ({EXTRACT_WORKERS} workers, {EXTRACT_TIMEOUT_SECONDS:.0f}s / "
+                  f"{EXTRACT_MAX_RSS_MB} MB per job)")
+        return _sandbox
+
+
+def _iter_in_process(kind: str, target: str, on_total=None) -> Iterator[Dict[str, Any]]:
+    if on_total is not None:
+        on_total(_count(kind, target))
+    yield from _sources()[kind](target)
+
+
+def iter_sandboxed_sections(kind: str, target: str, is_cancelled: Optional[Callable[[], bool]] = None,
+                            on_total: Optional[Callable[[Optional[int]], None]] = None) -> Iterator[Dict[str, Any]]:
+    """Sections of a file or crawl, extracted in the sandbox (or in-process when it is disabled)"""
+    if not EXTRACT_SANDBOX or (kind == "file" and is_audio_file(target)):
+        return _iter_in_process(kind, target, on_total)
+    return get_sandbox().iter_sections(kind, target, is_cancelled, on_total)
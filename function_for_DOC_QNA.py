@@ -1,23 +1,20 @@
-# import whisper  # Completely remove this line
-from bs4 import BeautifulSoup
 import pdfplumber
 import pandas as pd
-import requests
 import os
-from playwright.sync_api import sync_playwright
-from urllib.parse import urljoin, urlparse
+from browser_pool import render_url_sync
 import re
-import easyocr
-from PIL import Image
-import numpy as np
-
-# Initialize whisper model
-# whisper_model = whisper.load_model("base")  # Comment out
-whisper_model = None
-
-# Initialize EasyOCR reader (only do this once)
-# You can add more languages if needed: ['en', 'fr', 'es', etc.]
-reader = easyocr.Reader(['en'])
+import asyncio
+from crawler import Crawler, crawl_site
+from http_cache import fetch
+from html_extract import extract_html, html_to_text
+from concurrent.futures import ThreadPoolExecutor
+from ocr_pool import ocr_pdf_pages, ocr_image, OCR_BATCH_SIZE
+from csv_ingest import iter_csv_row_groups
+from office_extract import extract_office_document
+from transcribe_pool import AUDIO_EXTENSIONS, audio_windows, iter_transcribed_windows, transcribe_file
+
+# OCR runs in ocr_pool worker processes (one EasyOCR reader per process)
+# Speech-to-text runs in transcribe_pool worker processes (one Whisper model per process)
 
 def extract_text_from_pdf(file_path):
     try:
@@ -25,50 +22,162 @@ def extract_text_from_pdf(file_path):
         if not os.path.isfile(file_path):
             return f"❗ File not found: {file_path}"
 
+        page_texts = {}
+        scanned_pages = []
         with pdfplumber.open(file_path) as pdf:
             for page_num, page in enumerate(pdf.pages):
                 page_text = page.extract_text()
                 if page_text and page_text.strip():
-                    text += f"\n--- Page {page_num + 1} ---\n" + page_text
+                    page_texts[page_num] = page_text
                 else:
-                    print(f"❗ Skipping OCR for page {page_num + 1} (OCR disabled for speed).")
+                    scanned_pages.append(page_num)
+
+        # Pages without a text layer are OCR'd together in the worker pool
+        if scanned_pages:
+            page_texts.update(ocr_pdf_pages(file_path, scanned_pages))
+
+        for page_num in sorted(page_texts):
+            if page_texts[page_num].strip():
+                text += f"\n--- Page {page_num + 1} ---\n" + page_texts[page_num]
 
         return text.strip() if text.strip() else "❗ No text found in PDF."
 
     except Exception as e:
         return f"❗ Error reading PDF: {str(e)}"
 
+def iter_pdf_pages(file_path):
+    """Yield (page_num, text) in page order; scanned pages are OCR'd in batches as they come up"""
+    scanned_pages = []
+
+    def flush_scanned():
+        texts = ocr_pdf_pages(file_path, scanned_pages)
+        pages = [(page_num, texts.get(page_num, "")) for page_num in scanned_pages]
+        scanned_pages.clear()
+        return pages
+
+    with pdfplumber.open(file_path) as pdf:
+        for page_num, page in enumerate(pdf.pages):
+            page_text = page.extract_text()
+            if page_text and page_text.strip():
+                yield from flush_scanned()
+                yield page_num, page_text
+            else:
+                scanned_pages.append(page_num)
+                if len(scanned_pages) >= OCR_BATCH_SIZE:
+                    yield from flush_scanned()
+            page.flush_cache()  # pdfplumber keeps parsed page objects otherwise
+
+    yield from flush_scanned()
+
+def iter_text_sections(file_path):
+    """Yield {"text", "metadata", "chunked"} sections of a file for streaming ingestion.
+
+    "chunked" sections (CSV row groups) are already chunk-sized and are indexed as-is.
+    """
+    ext = os.path.splitext(file_path)[-1].lower()
+
+    if ext == '.pdf':
+        for page_num, page_text in iter_pdf_pages(file_path):
+            if page_text.strip():
+                yield {"text": page_text, "metadata": {"page": page_num + 1}, "chunked": False}
+    elif ext == '.csv':
+        for group in iter_csv_row_groups(file_path):
+            yield {"text": group.text, "metadata": {"first_row": group.first_row, "last_row": group.last_row}, "chunked": True}
+    elif ext in AUDIO_EXTENSIONS:
+        yield from iter_audio_sections(file_path)
+    elif ext in ['.docx', '.pptx', '.epub']:
+        document = extract_office_document(file_path, ext)
+        if not document.sections:
+            yield {"text": document.text, "metadata": {}, "chunked": False}
+        else:
+            if document.sections[0].start > 0:
+                yield {"text": document.text[:document.sections[0].start], "metadata": {}, "chunked": False}
+            for section in document.sections:
+                yield {"text": document.text[section.start:section.end], "metadata": {"section": section.title}, "chunked": False}
+    else:
+        text = extract_text_auto(file_path=file_path)
+        if text and not text.startswith("❗"):
+            yield {"text": text, "metadata": {}, "chunked": False}
+
+def iter_audio_sections(file_path):
+    """Yield one section per transcribed window, in order, while later windows are still transcribing"""
+    for start, end, segments in iter_transcribed_windows(file_path):
+        text = " ".join(segment["text"] for segment in segments)
+        if text.strip():
+            yield {"text": text, "metadata": {"start_seconds": round(start, 1), "end_seconds": round(end, 1)}, "chunked": False}
+
+def iter_crawled_sections(url):
+    """Yield {"text", "metadata", "chunked"} sections for each crawled page, driving the async crawler on its own loop"""
+    loop = asyncio.new_event_loop()
+    pages = Crawler(url).crawl()
+    try:
+        while True:
+            try:
+                page = loop.run_until_complete(pages.__anext__())
+            except StopAsyncIteration:
+                break
+            yield {"text": page.text, "metadata": {"url": page.url}, "chunked": False}
+    finally:
+        loop.run_until_complete(pages.aclose())
+        loop.close()
+
+def count_sections(file_path):
+    """Number of sections iter_text_sections will yield at most (pages of a PDF, windows of a recording), or None if unknown"""
+    ext = os.path.splitext(file_path)[-1].lower()
+    if ext in AUDIO_EXTENSIONS:
+        return len(audio_windows(file_path))
+    if ext != '.pdf':
+        return None
+    try:
+        with pdfplumber.open(file_path) as pdf:
+            return len(pdf.pages)
+    except Exception:
+        return None
+
 def extract_text_from_csv(file_path):
     try:
-        df = pd.read_csv(file_path)
-        text = df.to_string(index=False)
+        # Row groups with the header repeated; the vector store path streams these directly
+        text = "\n\n".join(group.text for group in iter_csv_row_groups(file_path))
         return text.strip() if text.strip() else "❗ No text found in CSV."
     except Exception as e:
         return f"❗ Error reading CSV: {e}"
 
+def extract_text_from_office_file(file_path, ext):
+    try:
+        # Streams the zip's XML parts; memory follows the largest paragraph/slide/table
+        text = extract_office_document(file_path, ext).text
+        return text.strip() if text.strip() else f"❗ No text found in {ext} file."
+    except Exception as e:
+        return f"❗ Error reading {ext} file: {e}"
+
 def extract_text_from_audio(file_path):
     try:
-        result = whisper_model.transcribe(file_path)
-        return result['text'].strip() if result['text'].strip() else "❗ No speech detected in audio."
+        text = transcribe_file(file_path)
+        return text if text else "❗ No speech detected in audio."
     except Exception as e:
         return f"❗ Error processing audio: {e}"
 
 def extract_text_from_image(file_path):
     try:
-        # Read the image with PIL first to ensure it's a valid image
-        img = Image.open(file_path)
-        img_np = np.array(img)
-        
-        # Use EasyOCR to extract text
-        results = reader.readtext(img_np)
-        
-        # Extract all detected text
-        text = "\n".join([result[1] for result in results])
+        # Downscaled, cropped and cached OCR in the worker pool
+        text = ocr_image(file_path)
         
         return text.strip() if text.strip() else "❗ No text found in the image."
     except Exception as e:
         return f"❗ Error processing image: {e}"
 
+NESTED_URL_LIMIT = 5
+
+
+def _extract_nested_url(nested_url):
+    """Return (url, first 500 chars of text, error) for one nested link"""
+    try:
+        nested_response = fetch(nested_url)
+        return nested_url, html_to_text(nested_response.text, url=nested_url)[:500], None
+    except Exception as e:
+        return nested_url, None, e
+
+
 def extract_text_from_url_simple(url):
     try:
         text = ""
@@ -78,39 +187,29 @@ def extract_text_from_url_simple(url):
         if not url.startswith(('http://', 'https://')):
             return "❗ Invalid URL format."
 
-        # Fetch the page
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, timeout=10, headers=headers)
+        # Fetch the page (served from the HTTP cache when still fresh)
+        response = fetch(url)
         response.raise_for_status()
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Remove unwanted elements
-        for tag in ['script', 'style', 'nav', 'footer', 'iframe']:
-            for element in soup.find_all(tag):
-                element.decompose()
-
-        # Extract title and text
-        title = soup.title.string if soup.title else 'No Title'
-        body_text = "\n".join(p.get_text(strip=True) for p in soup.find_all('p'))
+        # Main content with boilerplate removed; headings, lists, tables and code are kept
+        page = extract_html(response.text)
+        title = page.title or 'No Title'
 
-        text += f"\n=== Page Title ===\n{title}\n\n=== Content ===\n{body_text}\n"
+        text += f"\n=== Page Title ===\n{title}\n\n=== Content ===\n{page.text}\n"
 
         # Extract all valid URLs from the page
-        urls = [link.get('href') for link in soup.find_all('a', href=True)
-                if link.get('href').startswith(('http://', 'https://'))]
+        urls = [link for link in page.links if link.startswith(('http://', 'https://'))]
 
-        # Extract from nested URLs (limit to first 5)
+        # Extract from nested URLs (limit to first 5), fetched concurrently over the pooled client
         if urls:
             text += "\n\n=== Nested URLs Content ===\n"
-            for nested_url in urls[:5]:
-                try:
-                    nested_response = requests.get(nested_url, timeout=5, headers=headers)
-                    nested_soup = BeautifulSoup(nested_response.text, 'html.parser')
-                    nested_text = nested_soup.get_text(strip=True)[:500]
+            with ThreadPoolExecutor(max_workers=NESTED_URL_LIMIT) as executor:
+                results = executor.map(_extract_nested_url, urls[:NESTED_URL_LIMIT])
+            for nested_url, nested_text, error in results:
+                if error is None:
                     text += f"\n\n[From {nested_url}]\n{nested_text}\n"
-                except Exception as e:
-                    text += f"\n❗ Could not extract from {nested_url}: {e}\n"
+                else:
+                    text += f"\n❗ Could not extract from {nested_url}: {error}\n"
 
         return text.strip() if text.strip() else "❗ No content extracted from URL."
 
@@ -120,14 +219,9 @@ def extract_text_from_url_simple(url):
 
 def extract_text_from_js_rendered_url(url):
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch()
-            page = browser.new_page()
-            page.goto(url)
-            content = page.content()
-            browser.close()
-            soup = BeautifulSoup(content, 'html.parser')
-            return soup.get_text(strip=True)
+        # Warm pooled browser context instead of launching Chromium per URL
+        content = render_url_sync(url)
+        return html_to_text(content, url=url)
     except Exception as e:
         return f"❗ Error processing JavaScript-rendered URL: {e}"
 
@@ -140,10 +234,15 @@ def extract_text_auto(file_path=None, url=None, js_render=False):
             return extract_text_from_pdf(file_path)
         elif ext == '.csv':
             return extract_text_from_csv(file_path)
-        elif ext in ['.mp3', '.wav', '.m4a']:
+        elif ext in AUDIO_EXTENSIONS:
             return extract_text_from_audio(file_path)
         elif ext in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif']:
             return extract_text_from_image(file_path)
+        elif ext in ['.docx', '.pptx', '.epub']:
+            return extract_text_from_office_file(file_path, ext)
+        elif ext in ['.html', '.htm']:
+            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                return html_to_text(f.read())
         else:
             try:
                 # Try to read as a text file
@@ -162,55 +261,37 @@ def extract_text_auto(file_path=None, url=None, js_render=False):
     else:
         return "❗ Please provide a file path or URL."
 
-# Optional: If you still want the web crawling functionality
-visited_links = set()
+async def aextract_clean_text(url, depth=1, max_depth=2):
+    """extract_clean_text for async callers: awaits the crawl on the caller's event loop"""
+    pages = await crawl_site(url, max_depth=max_depth - depth)
+    return _join_crawled_pages(url, pages)
 
 def extract_clean_text(url, depth=1, max_depth=2):
     """
-    Extracts necessary information from a documentation page, structures it properly,
-    and removes deprecated or warning messages.
-    """
-    global visited_links
-    if url in visited_links or depth > max_depth:
-        return ""
-
-    print(f"Extracting: {url} (Depth: {depth})")
-    visited_links.add(url)
+    Extracts necessary information from a documentation site, structures it properly,
+    and removes deprecated or warning messages. Uses the bounded async crawler;
+    each call has its own visited set.
 
+    Sync entry point: when called from a thread that is already running an event
+    loop, the crawl runs on its own loop in a worker thread (blocking the caller
+    until it finishes); async code should await aextract_clean_text instead.
+    """
+    coroutine = crawl_site(url, max_depth=max_depth - depth)
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        for tag in ["nav", "footer", "aside", "script", "style", "form", "header", "noscript"]:
-            for element in soup.find_all(tag):
-                element.decompose()
-
-        structured_text = f"\n\n[ Section: {url} ]\n\n"  # Section title per link
-        headers = [h.get_text(strip=True) for h in soup.find_all(["h1", "h2", "h3"])]
-        paragraphs = [p.get_text(strip=True) for p in soup.find_all("p") if p.get_text(strip=True)]
-
-        filtered_paragraphs = [p for p in paragraphs if not re.search(r"(deprecated|warning)", p, re.IGNORECASE)]
-
-        if headers:
-            structured_text += "\n".join(headers) + "\n\n"
-        if filtered_paragraphs:
-            structured_text += "\n".join(filtered_paragraphs)
-
-        structured_text += "\n\n" + "=" * 50 + "\n\n"
-
-        for link in soup.find_all("a", href=True):
-            href = link["href"]
-            full_url = urljoin(url, href)
-            if urlparse(full_url).netloc == urlparse(url).netloc and full_url not in visited_links:
-                structured_text += extract_clean_text(full_url, depth + 1, max_depth)
-
-        return structured_text.strip()
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pages = asyncio.run(coroutine)
+    else:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pages = executor.submit(asyncio.run, coroutine).result()
+    return _join_crawled_pages(url, pages)
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching {url}: {e}")
+def _join_crawled_pages(url, pages):
+    if not pages:
         return f"\n[ Error fetching content from {url} ]\n"
 
+    separator = "\n\n" + "=" * 50 + "\n\n"
+    return separator.join(page.text for page in pages).strip()
+
 if __name__ == "__main__":
     __all__ = ['extract_text_from_url_simple', 'extract_text_auto']
@@ -1,10 +1,10 @@
 import google.generativeai as genai
 import PyPDF2
-import docx
 import json
 import re
 import uuid
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Awaitable, Callable, Tuple
+from contextvars import ContextVar
 from io import BytesIO
 import asyncio
 from fastapi import UploadFile
@@ -12,6 +12,9 @@ import pandas as pd
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
+from office_extract import extract_office_document, OFFICE_EXTENSIONS
+from html_extract import html_to_text
+from csv_ingest import iter_csv_row_groups
 
 # Load environment variables from .env file
 load_dotenv()
@@ -39,12 +42,18 @@ async def process_uploaded_file(file: UploadFile) -> str:
         
         if file_extension == 'pdf':
             return extract_text_from_pdf(content)
-        elif file_extension == 'docx':
-            return extract_text_from_docx(content)
+        elif file_extension in OFFICE_EXTENSIONS:
+            return extract_text_from_office(content, file_extension)
         elif file_extension == 'txt':
             return content.decode('utf-8')
         elif file_extension == 'md':
             return content.decode('utf-8')
+        elif file_extension in ('html', 'htm'):
+            return html_to_text(content.decode('utf-8', errors='replace'))
+        elif file_extension == 'csv':
+            return extract_text_from_csv(content)
+        elif file_extension == 'json':
+            return json.dumps(json.loads(content.decode('utf-8')), indent=2, ensure_ascii=False)
         else:
             raise ValueError(f"Unsupported file format: {file_extension}")
     except Exception as e:
@@ -62,16 +71,23 @@ def extract_text_from_pdf(content: bytes) -> str:
         raise Exception(f"Error extracting PDF text: {str(e)}")
 
 def extract_text_from_docx(content: bytes) -> str:
-    """Extract text from DOCX content"""
+    """Extract text from DOCX content (paragraphs, headings and tables)"""
     try:
-        doc = docx.Document(BytesIO(content))
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
+        return extract_office_document(BytesIO(content), 'docx').text
     except Exception as e:
         raise Exception(f"Error extracting DOCX text: {str(e)}")
 
+def extract_text_from_office(content: bytes, file_extension: str) -> str:
+    """Extract text from DOCX, PPTX or EPUB content"""
+    try:
+        return extract_office_document(BytesIO(content), file_extension).text
+    except Exception as e:
+        raise Exception(f"Error extracting {file_extension.upper()} text: {str(e)}")
+
+def extract_text_from_csv(content: bytes) -> str:
+    """Extract CSV content as row groups with the header repeated"""
+    return "\n\n".join(group.text for group in iter_csv_row_groups(BytesIO(content)))
+
 def preprocess_content_for_ai(content: str) -> str:
     """Preprocess content to optimize for AI processing"""
     try:
@@ -535,9 +551,22 @@ def classify_question_importance(question: str, content: str) -> float:
     
     return min(score, 1.0)
 
+# Set by the create_fallback_* functions so callers can tell fallback output from model output
+_fallback_used: ContextVar[bool] = ContextVar("fallback_used", default=False)
+
+async def generate_with_model(generator: Callable[[str], Awaitable[Any]], content: str) -> Tuple[Any, bool]:
+    """Run a generate_* function; returns (result, True if the model produced it rather than a fallback)"""
+    token = _fallback_used.set(False)
+    try:
+        result = await generator(content)
+        return result, not _fallback_used.get()
+    finally:
+        _fallback_used.reset(token)
+
 # Enhanced Fallback Functions
 def create_fallback_flashcards(content: str) -> List[Dict[str, Any]]:
     """Create enhanced flashcards when AI generation fails"""
+    _fallback_used.set(True)
     sentences = [s.strip() for s in content.split('.') if len(s.strip()) > 20][:8]
     flashcards = []
     
@@ -562,6 +591,7 @@ def create_fallback_flashcards(content: str) -> List[Dict[str, Any]]:
 
 def create_fallback_mcqs(content: str) -> List[Dict[str, Any]]:
     """Create enhanced MCQs when AI generation fails"""
+    _fallback_used.set(True)
     words = content.split()[:100]
     key_topics = [word for word in words if len(word) > 5][:5]
     
@@ -596,6 +626,7 @@ def create_fallback_mcqs(content: str) -> List[Dict[str, Any]]:
 
 def create_fallback_mindmap(content: str) -> Dict[str, Any]:
     """Create enhanced mindmap when AI generation fails"""
+    _fallback_used.set(True)
     sentences = [s.strip() for s in content.split('.') if len(s.strip()) > 10][:6]
     
     nodes = []
@@ -617,6 +648,7 @@ def create_fallback_mindmap(content: str) -> Dict[str, Any]:
 
 def create_fallback_learning_path(content: str) -> List[Dict[str, Any]]:
     """Create enhanced learning path when AI generation fails"""
+    _fallback_used.set(True)
     return [
         {
             "step_number": 1,
@@ -662,6 +694,7 @@ def create_fallback_learning_path(content: str) -> List[Dict[str, Any]]:
 
 def create_fallback_sticky_notes(content: str) -> List[Dict[str, Any]]:
     """Create enhanced sticky notes when AI generation fails"""
+    _fallback_used.set(True)
     sentences = [s.strip() for s in content.split('.') if len(s.strip()) > 15][:8]
     notes = []
     categories = ["red", "yellow", "green"]
@@ -693,6 +726,7 @@ def create_fallback_sticky_notes(content: str) -> List[Dict[str, Any]]:
 
 def create_fallback_exam_questions(content: str) -> List[Dict[str, Any]]:
     """Create enhanced exam questions when AI generation fails"""
+    _fallback_used.set(True)
     return [
         {
             "id": "eq_1",
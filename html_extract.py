@@ -0,0 +1,418 @@
+"""Main-content extraction for web pages.
+
+Replaces the BeautifulSoup('html.parser') + find_all('p') pattern used by the
+URL extractors. The page is parsed into an ElementTree-compatible tree by a
+pluggable engine - lxml (C-backed) when it is installed, otherwise a small
+builder on top of the standard library's html.parser - and then:
+
+1. boilerplate is removed (scripts, nav, footers, and elements whose class/id
+   looks like a sidebar, menu, cookie banner, ...),
+2. the main content node is picked (<main>/<article> when present, otherwise
+   readability-style paragraph scoring with a link-density penalty),
+3. the content is rendered block by block, keeping headings as markdown
+   "#" lines and including lists, tables and code blocks.
+
+The heading lines give downstream chunking natural section boundaries.
+Benchmark against the old extractor with benchmark_html_extract.py.
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urljoin
+from xml.etree import ElementTree
+
+HTML_PARSER = os.getenv("HTML_PARSER", "auto")  # auto | lxml | stdlib
+
+BOILERPLATE_TAGS = {
+    "script", "style", "noscript", "nav", "footer", "aside", "header", "form",
+    "iframe", "svg", "button", "template", "select", "canvas", "object", "embed"
+}
+UNLIKELY_PATTERN = re.compile(
+    r"sidebar|menu|navbar|breadcrumb|footer|cookie|consent|banner|share|social|related|advert|promo|popup|modal|comment|subscribe|newsletter|skip-link",
+    re.IGNORECASE
+)
+LIKELY_PATTERN = re.compile(r"article|content|main|body|entry|post|markdown|prose|docs?-", re.IGNORECASE)
+NEVER_REMOVED = {"html", "body", "main", "article"}
+
+HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+PARAGRAPH_TAGS = {"p", "blockquote", "dt", "dd", "figcaption", "caption", "summary", "address"}
+LIST_TAGS = {"ul", "ol"}
+INLINE_TAGS = {
+    "a", "abbr", "b", "bdi", "bdo", "br", "cite", "code", "data", "del", "dfn", "em", "i", "img",
+    "ins", "kbd", "label", "mark", "q", "s", "samp", "small", "span", "strong", "sub", "sup",
+    "time", "tt", "u", "var", "wbr", "font"
+}
+SCORED_TAGS = {"p", "pre", "td", "li", "blockquote"}
+
+MIN_MAIN_NODE_CHARS = 200  # A <main>/<article> shorter than this is probably not the content
+MAX_LIST_LINK_DENSITY = 0.6  # Lists/tables that are mostly links are navigation
+
+
+@dataclass
+class Section:
+    level: int  # 0 for text before the first heading
+    heading: str
+    text: str
+    offset: int  # Character offset of the section in ExtractedPage.text
+
+
+@dataclass
+class ExtractedPage:
+    title: str
+    text: str
+    sections: List[Section] = field(default_factory=list)
+    links: List[str] = field(default_factory=list)
+
+
+# Parser engines: each returns the root element of an ElementTree-style tree
+
+class _TreeBuilderParser(HTMLParser):
+    """html.parser -> ElementTree, tolerant of unclosed and stray tags"""
+
+    VOID_TAGS = {
+        "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+        "param", "source", "track", "wbr"
+    }
+    # Opening one of these implicitly closes an open element of the listed kinds
+    IMPLIED_END = {
+        "p": {"p"}, "li": {"li", "p"}, "dt": {"dt", "dd", "p"}, "dd": {"dt", "dd", "p"},
+        "tr": {"tr", "td", "th"}, "td": {"td", "th"}, "th": {"td", "th"}, "option": {"option"}
+    }
+    BLOCK_TAGS = {
+        "div", "ul", "ol", "table", "pre", "h1", "h2", "h3", "h4", "h5", "h6",
+        "section", "article", "blockquote", "dl", "header", "footer", "nav", "main", "aside"
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.builder = ElementTree.TreeBuilder()
+        self.stack = []
+        self.builder.start("html", {})
+        self.stack.append("html")
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "html":
+            return
+        closes = self.IMPLIED_END.get(tag, set())
+        if tag in self.BLOCK_TAGS:
+            closes = closes | {"p"}
+        while self.stack[-1] in closes:
+            self.builder.end(self.stack.pop())
+
+        self.builder.start(tag, {name: value or "" for name, value in attrs})
+        if tag in self.VOID_TAGS:
+            self.builder.end(tag)
+        else:
+            self.stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.builder.start(tag, {name: value or "" for name, value in attrs})
+        self.builder.end(tag)
+
+    def handle_endtag(self, tag):
+        if tag not in self.stack[1:]:
+            return  # Stray end tag
+        while self.stack:
+            open_tag = self.stack.pop()
+            self.builder.end(open_tag)
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        self.builder.data(data)
+
+    def close_tree(self):
+        self.close()
+        while self.stack:
+            self.builder.end(self.stack.pop())
+        return self.builder.close()
+
+
+def _parse_stdlib(html: str):
+    parser = _TreeBuilderParser()
+    parser.feed(html)
+    return parser.close_tree()
+
+
+XML_DECLARATION = re.compile(r"^\s*<\?xml[^>]*\?>", re.IGNORECASE)
+
+
+def _parse_lxml(html: str):
+    import lxml.etree
+    import lxml.html
+
+    try:
+        # lxml refuses str input that carries an encoding declaration (XHTML pages)
+        root = lxml.html.document_fromstring(XML_DECLARATION.sub("", html, count=1))
+    except (ValueError, lxml.etree.ParserError):
+        return _parse_stdlib(html)
+    # Comments and processing instructions have non-string tags; drop them up front
+    for node in list(root.iter()):
+        if not isinstance(node.tag, str) and node.getparent() is not None:
+            node.drop_tree()
+    return root
+
+
+ENGINES: Dict[str, Callable[[str], object]] = {
+    "stdlib": _parse_stdlib,
+    "lxml": _parse_lxml,
+}
+
+
+def register_engine(name: str, parse: Callable[[str], object]):
+    """Add a parser engine; parse(html) must return an ElementTree-compatible root"""
+    ENGINES[name] = parse
+
+
+def default_engine() -> str:
+    if HTML_PARSER != "auto":
+        return HTML_PARSER
+    try:
+        import lxml.html  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "stdlib"
+
+
+# Tree helpers (work for both lxml and xml.etree elements)
+
+def _tag(node) -> str:
+    return node.tag.lower() if isinstance(node.tag, str) else ""
+
+
+def _collapse(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _node_text(node) -> str:
+    return _collapse("".join(node.itertext()))
+
+
+def _link_density(node, text_length: int) -> float:
+    if not text_length:
+        return 0.0
+    link_chars = sum(len(_node_text(link)) for link in node.iter() if _tag(link) == "a")
+    return min(link_chars / text_length, 1.0)
+
+
+def _remove(parent, child):
+    """Remove child but keep its tail text"""
+    if child.tail:
+        index = list(parent).index(child)
+        if index > 0:
+            previous = parent[index - 1]
+            previous.tail = (previous.tail or "") + child.tail
+        else:
+            parent.text = (parent.text or "") + child.tail
+    parent.remove(child)
+
+
+def _find_body(root):
+    for node in root.iter():
+        if _tag(node) == "body":
+            return node
+    return root
+
+
+def _strip_boilerplate(root):
+    for parent in list(root.iter()):
+        for child in list(parent):
+            tag = _tag(child)
+            if not tag:
+                _remove(parent, child)
+                continue
+            if tag in NEVER_REMOVED:
+                continue
+            if tag in BOILERPLATE_TAGS or child.get("hidden") is not None or child.get("aria-hidden") == "true":
+                _remove(parent, child)
+                continue
+            if child.get("role") in ("navigation", "banner", "contentinfo", "complementary"):
+                _remove(parent, child)
+                continue
+            marker = f"{child.get('class') or ''} {child.get('id') or ''}"
+            if marker.strip() and UNLIKELY_PATTERN.search(marker) and not LIKELY_PATTERN.search(marker):
+                _remove(parent, child)
+
+
+def _pick_main_node(body):
+    """<main>/<article> when present and substantial, else the best-scoring container"""
+    explicit = [
+        node for node in body.iter()
+        if _tag(node) in ("main", "article") or node.get("role") == "main"
+    ]
+    if explicit:
+        best = max(explicit, key=lambda node: len(_node_text(node)))
+        if len(_node_text(best)) >= MIN_MAIN_NODE_CHARS:
+            return best
+
+    parents = {child: parent for parent in body.iter() for child in parent}
+    scores: Dict[object, float] = {}
+    for node in body.iter():
+        if _tag(node) not in SCORED_TAGS:
+            continue
+        text = _node_text(node)
+        if len(text) < 25:
+            continue
+        score = 1 + text.count(",") + min(len(text) / 100, 3)
+        ancestor, weight = parents.get(node), 1.0
+        for _ in range(3):
+            if ancestor is None:
+                break
+            scores[ancestor] = scores.get(ancestor, 0.0) + score * weight
+            ancestor, weight = parents.get(ancestor), weight / 2
+
+    if not scores:
+        return body
+
+    def adjusted(node):
+        text_length = len(_node_text(node))
+        return scores[node] * (1 - _link_density(node, text_length))
+
+    return max(scores, key=adjusted)
+
+
+# Rendering
+
+def _render_list(node, lines: List[str], depth: int):
+    if _link_density(node, len(_node_text(node))) > MAX_LIST_LINK_DENSITY:
+        return
+    ordered = _tag(node) == "ol"
+    number = 0
+    for item in node:
+        if _tag(item) != "li":
+            continue
+        number += 1
+        own_text = [item.text or ""]
+        nested = []
+        for child in item:
+            if _tag(child) in LIST_TAGS:
+                nested.append(child)
+                own_text.append(child.tail or "")
+            else:
+                own_text.append("".join(child.itertext()) + (child.tail or ""))
+        text = _collapse("".join(own_text))
+        if text:
+            marker = f"{number}." if ordered else "-"
+            lines.append(f"{'  ' * depth}{marker} {text}")
+        for child in nested:
+            _render_list(child, lines, depth + 1)
+
+
+def _render_table(node, blocks: List[str]):
+    if _link_density(node, len(_node_text(node))) > MAX_LIST_LINK_DENSITY:
+        return
+    rows = []
+    for row in node.iter():
+        if _tag(row) != "tr":
+            continue
+        cells = [_node_text(cell) for cell in row if _tag(cell) in ("td", "th")]
+        if any(cells):
+            rows.append(" | ".join(cells))
+    if rows:
+        blocks.append("\n".join(rows))
+
+
+def _render(node, blocks: List[str], inline: List[str]):
+    """Append rendered blocks for the children of node; inline text is buffered until a block boundary"""
+
+    def flush():
+        text = _collapse("".join(inline))
+        if text:
+            blocks.append(text)
+        inline.clear()
+
+    if node.text:
+        inline.append(node.text)
+
+    for child in node:
+        tag = _tag(child)
+        if tag in INLINE_TAGS or not tag:
+            inline.append("".join(child.itertext()) if tag != "br" else " ")
+        else:
+            flush()
+            if tag in HEADING_TAGS:
+                text = _node_text(child)
+                if text:
+                    blocks.append(f"{'#' * HEADING_TAGS[tag]} {text}")
+            elif tag in PARAGRAPH_TAGS:
+                text = _node_text(child)
+                if text:
+                    blocks.append(text)
+            elif tag == "pre":
+                code = "".join(child.itertext()).strip("\n")
+                if code.strip():
+                    blocks.append(f"```\n{code}\n```")
+            elif tag in LIST_TAGS:
+                lines: List[str] = []
+                _render_list(child, lines, 0)
+                if lines:
+                    blocks.append("\n".join(lines))
+            elif tag == "table":
+                _render_table(child, blocks)
+            elif tag == "hr":
+                pass
+            else:
+                _render(child, blocks, inline)
+                flush()
+        if child.tail:
+            inline.append(child.tail)
+
+    flush()
+
+
+def _split_sections(text: str) -> List[Section]:
+    sections = []
+    heading_pattern = re.compile(r"^(#{1,6}) (.+)$", re.MULTILINE)
+    matches = list(heading_pattern.finditer(text))
+
+    if not matches or matches[0].start() > 0:
+        end = matches[0].start() if matches else len(text)
+        if text[:end].strip():
+            sections.append(Section(level=0, heading="", text=text[:end].strip(), offset=0))
+
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(text)
+        body = text[match.end():end].strip()
+        sections.append(Section(level=len(match.group(1)), heading=match.group(2), text=body, offset=match.start()))
+    return sections
+
+
+def extract_html(html: str, url: Optional[str] = None, engine: Optional[str] = None) -> ExtractedPage:
+    """Parse a page and return its main content with heading structure"""
+    if not html or not html.strip():
+        return ExtractedPage(title=url or "", text="")
+    root = ENGINES[engine or default_engine()](html)
+
+    title = ""
+    for node in root.iter():
+        if _tag(node) == "title":
+            title = _node_text(node)
+            break
+
+    links = []
+    for node in root.iter():
+        if _tag(node) == "a" and node.get("href"):
+            href = node.get("href").strip()
+            links.append(urljoin(url, href) if url else href)
+
+    body = _find_body(root)
+    _strip_boilerplate(body)
+    main_node = _pick_main_node(body)
+
+    blocks: List[str] = []
+    _render(main_node, blocks, [])
+
+    # Pages whose title is not repeated as a heading still get a top-level heading
+    if title and not any(block.startswith("# ") for block in blocks[:3]):
+        blocks.insert(0, f"# {title}")
+
+    text = "\n\n".join(blocks)
+    return ExtractedPage(title=title or (url or ""), text=text, sections=_split_sections(text), links=links)
+
+
+def html_to_text(html: str, url: Optional[str] = None) -> str:
+    """Main content of a page as text with markdown headings"""
+    return extract_html(html, url=url).text
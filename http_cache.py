@@ -0,0 +1,369 @@
+"""On-disk HTTP response cache and shared pooled clients for URL ingestion.
+
+Responses are stored under HTTP_CACHE_DIR keyed by the normalized URL and
+served according to Cache-Control / Expires. Stale entries with an ETag or
+Last-Modified are revalidated with a conditional request, so a 304 costs one
+round trip and no download. The cache has a size budget; the least recently
+used entries are evicted when it is exceeded.
+
+Every cache operation is blocking file I/O (eviction walks the whole cache
+directory), so async callers go through afetch / aget_fresh, which run it in
+a worker thread instead of on the event loop.
+"""
+
+import asyncio
+import email.utils
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urldefrag, urlencode, urlparse, urlunparse
+
+import httpx
+
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "data/http_cache")
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 10))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 20))
+# Lifetime for responses that carry no freshness information or validators at all
+HTTP_CACHE_DEFAULT_TTL = int(os.getenv("HTTP_CACHE_DEFAULT_TTL", 600))
+
+# Used when a response has validators but no explicit freshness lifetime
+HEURISTIC_FRACTION = 0.1
+HEURISTIC_MAX_SECONDS = 24 * 3600
+
+USER_AGENT = "Mozilla/5.0"
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid")
+STORED_HEADERS = ("content-type", "etag", "last-modified", "cache-control", "expires", "date")
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form used for cache keys and visited sets"""
+    url, _ = urldefrag(url.strip())
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower()
+    port = parsed.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+
+    path = re.sub(r"/{2,}", "/", parsed.path or "/")
+    if path != "/" and path.endswith("/"):
+        path = path[:-1]
+
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    ))
+    return urlunparse((scheme, host, path, "", query, ""))
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    status_code: int
+    headers: Dict[str, str]
+    content: bytes
+    from_cache: bool = False
+    stored_at: float = field(default_factory=time.time)
+    final_url: str = ""  # After redirects; resolve relative links against this, not the requested url
+
+    def __post_init__(self):
+        self.final_url = self.final_url or self.url
+
+    @property
+    def text(self) -> str:
+        match = re.search(r"charset=([\w-]+)", self.headers.get("content-type", ""))
+        encoding = match.group(1) if match else "utf-8"
+        try:
+            return self.content.decode(encoding, errors="replace")
+        except LookupError:
+            return self.content.decode("utf-8", errors="replace")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise httpx.HTTPStatusError(f"HTTP {self.status_code} for {self.url}", request=None, response=None)
+
+
+def _parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    directives = {}
+    for part in value.split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        name, _, arg = part.partition("=")
+        directives[name.strip()] = arg.strip().strip('"') or None
+    return directives
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers: Dict[str, str]) -> float:
+    """Seconds a stored response may be served without revalidation"""
+    directives = _parse_cache_control(headers.get("cache-control", ""))
+    if "no-cache" in directives:
+        return 0
+    for name in ("s-maxage", "max-age"):
+        if directives.get(name) is not None:
+            try:
+                return max(int(directives[name]), 0)
+            except ValueError:
+                return 0
+
+    expires = _parse_http_date(headers.get("expires"))
+    if expires is not None:
+        date = _parse_http_date(headers.get("date")) or time.time()
+        return max(expires - date, 0)
+
+    last_modified = _parse_http_date(headers.get("last-modified"))
+    if last_modified is not None:
+        date = _parse_http_date(headers.get("date")) or time.time()
+        return min(max(date - last_modified, 0) * HEURISTIC_FRACTION, HEURISTIC_MAX_SECONDS)
+
+    if headers.get("etag"):
+        return 0  # Cheap to revalidate, so always check
+    return HTTP_CACHE_DEFAULT_TTL
+
+
+def is_storable(status_code: int, headers: Dict[str, str]) -> bool:
+    directives = _parse_cache_control(headers.get("cache-control", ""))
+    if "no-store" in directives or "private" in directives:
+        return False
+    if headers.get("vary", "").strip() == "*":
+        return False
+    return status_code in (200, 203, 300, 301, 404, 410)
+
+
+class HttpCache:
+    """Disk-backed response store with an LRU size budget"""
+
+    def __init__(self, directory: str = HTTP_CACHE_DIR, max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key[:2], key)
+        return f"{base}.json", f"{base}.body"
+
+    def get(self, url: str) -> Optional[dict]:
+        """Return the stored entry ({"meta": ..., "content": bytes}) or None"""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                content = f.read()
+            os.utime(meta_path)  # LRU: mtime of the metadata file is the last access
+        except (OSError, ValueError):
+            return None  # Missing, half-written or evicted concurrently: a miss
+        return {"meta": meta, "content": content}
+
+    def is_fresh(self, entry: dict) -> bool:
+        meta = entry["meta"]
+        return time.time() - meta["stored_at"] < meta["lifetime"]
+
+    def conditional_headers(self, entry: dict) -> Dict[str, str]:
+        headers = {}
+        if entry["meta"]["headers"].get("etag"):
+            headers["If-None-Match"] = entry["meta"]["headers"]["etag"]
+        if entry["meta"]["headers"].get("last-modified"):
+            headers["If-Modified-Since"] = entry["meta"]["headers"]["last-modified"]
+        return headers
+
+    def put(self, url: str, status_code: int, headers: Dict[str, str], content: bytes,
+            final_url: Optional[str] = None):
+        if not is_storable(status_code, headers):
+            return
+        meta_path, body_path = self._paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        meta = {
+            "url": url,
+            "final_url": final_url or url,
+            "status_code": status_code,
+            "headers": headers,
+            "stored_at": time.time(),
+            "lifetime": freshness_lifetime(headers)
+        }
+
+        old_size = self._entry_size(meta_path, body_path)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(body_path + suffix, "wb") as f:
+            f.write(content)
+        os.replace(body_path + suffix, body_path)
+        with open(meta_path + suffix, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + suffix, meta_path)
+
+        self.stats["stores"] += 1
+        self._account(self._entry_size(meta_path, body_path) - old_size)
+
+    def refresh(self, url: str, entry: dict, headers: Dict[str, str]):
+        """Apply the headers of a 304 response to a stored entry"""
+        merged = dict(entry["meta"]["headers"])
+        merged.update({name: value for name, value in headers.items() if name in STORED_HEADERS})
+        self.put(url, entry["meta"]["status_code"], merged, entry["content"], entry["meta"].get("final_url"))
+
+    @staticmethod
+    def _entry_size(meta_path: str, body_path: str) -> int:
+        size = 0
+        for path in (meta_path, body_path):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
+    def _scan_total(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def _account(self, delta: int):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total()
+            else:
+                self._total_bytes += delta
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is at 90% of its budget"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    meta_path = os.path.join(root, name)
+                    body_path = meta_path[:-len(".json")] + ".body"
+                    try:
+                        entries.append((os.path.getmtime(meta_path), meta_path, body_path))
+                    except OSError:
+                        pass
+
+        target = int(self.max_bytes * 0.9)
+        for _, meta_path, body_path in sorted(entries):
+            if self._total_bytes <= target:
+                break
+            size = self._entry_size(meta_path, body_path)
+            for path in (meta_path, body_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._total_bytes -= size
+            self.stats["evictions"] += 1
+
+
+http_cache = HttpCache()
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.Client:
+    """Shared pooled client for sync code; keeps connections alive across requests"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                headers={"User-Agent": USER_AGENT},
+                timeout=HTTP_TIMEOUT,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS)
+            )
+        return _client
+
+
+def new_async_client(max_connections: int = HTTP_MAX_CONNECTIONS) -> httpx.AsyncClient:
+    """Pooled async client (bind one per event loop / crawl)"""
+    return httpx.AsyncClient(
+        headers={"User-Agent": USER_AGENT},
+        timeout=HTTP_TIMEOUT,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    )
+
+
+def _response_headers(response: httpx.Response) -> Dict[str, str]:
+    return {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+
+
+def _from_entry(url: str, entry: dict) -> CachedResponse:
+    meta = entry["meta"]
+    return CachedResponse(url=url, status_code=meta["status_code"], headers=meta["headers"],
+                          content=entry["content"], from_cache=True, stored_at=meta["stored_at"],
+                          final_url=meta.get("final_url", url))
+
+
+def _handle_response(url: str, entry: Optional[dict], response: httpx.Response) -> CachedResponse:
+    if response.status_code == 304 and entry is not None:
+        http_cache.stats["revalidated"] += 1
+        http_cache.refresh(url, entry, _response_headers(response))
+        return _from_entry(url, entry)
+
+    http_cache.stats["misses"] += 1
+    headers = _response_headers(response)
+    headers["vary"] = response.headers.get("vary", "")
+    final_url = str(response.url)
+    http_cache.put(url, response.status_code, headers, response.content, final_url)
+    return CachedResponse(url=url, status_code=response.status_code, headers=headers, content=response.content,
+                          final_url=final_url)
+
+
+def get_fresh(url: str) -> Optional[CachedResponse]:
+    """Cached response if it can be served without touching the network"""
+    entry = http_cache.get(url)
+    if entry is not None and http_cache.is_fresh(entry):
+        http_cache.stats["hits"] += 1
+        return _from_entry(url, entry)
+    return None
+
+
+def fetch(url: str, client: Optional[httpx.Client] = None) -> CachedResponse:
+    """GET through the disk cache (sync)"""
+    entry = http_cache.get(url)
+    if entry is not None and http_cache.is_fresh(entry):
+        http_cache.stats["hits"] += 1
+        return _from_entry(url, entry)
+
+    client = client or get_http_client()
+    request_headers = http_cache.conditional_headers(entry) if entry else {}
+    response = client.get(url, headers=request_headers)
+    return _handle_response(url, entry, response)
+
+
+async def aget_fresh(url: str) -> Optional[CachedResponse]:
+    """get_fresh without blocking the event loop on disk reads"""
+    return await asyncio.to_thread(get_fresh, url)
+
+
+async def afetch(url: str, client: httpx.AsyncClient) -> CachedResponse:
+    """GET through the disk cache (async); cache reads, stores and evictions run in a worker thread"""
+    entry = await asyncio.to_thread(http_cache.get, url)
+    if entry is not None and http_cache.is_fresh(entry):
+        http_cache.stats["hits"] += 1
+        return _from_entry(url, entry)
+
+    request_headers = http_cache.conditional_headers(entry) if entry else {}
+    response = await client.get(url, headers=request_headers)
+    return await asyncio.to_thread(_handle_response, url, entry, response)
@@ -0,0 +1,206 @@
+"""Streaming, staged ingestion pipeline.
+
+A pipeline is a source iterable followed by generator stages, e.g.
+
+    extract (pages/sections) -> chunk -> embed (batches) -> index
+
+Every stage runs in its own thread and hands items to the next one through a
+bounded queue, so stages overlap (pages are chunked while later pages are
+still being extracted, batches are embedded while the previous batch is being
+indexed) and a slow stage applies backpressure instead of letting work pile
+up in memory. Each stage is a plain generator function taking the upstream
+iterator, which keeps batching stages trivial to write.
+
+Per-stage counters (items in/out, busy and idle time, throughput) are kept in
+PipelineStats and can be read while the pipeline is running.
+"""
+
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 8))
+
+Stage = Callable[[Iterator[Any]], Iterable[Any]]
+
+_DONE = object()
+
+
+class PipelineCancelled(Exception):
+    pass
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+@dataclass
+class StageStats:
+    name: str
+    items_in: int = 0
+    items_out: int = 0
+    busy_seconds: float = 0.0  # Time spent inside the stage itself
+    wait_seconds: float = 0.0  # Time blocked on upstream (starved) or downstream (backpressure)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0
+        return {
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "wait_seconds": round(self.wait_seconds, 3),
+            "items_per_second": round(self.items_out / self.busy_seconds, 2) if self.busy_seconds else None,
+            "elapsed_seconds": round(elapsed, 3),
+            "running": self.started_at is not None and self.finished_at is None
+        }
+
+
+@dataclass
+class PipelineStats:
+    name: str
+    stages: List[StageStats] = field(default_factory=list)
+    error: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "error": self.error,
+            "stages": {stage.name: stage.as_dict() for stage in self.stages}
+        }
+
+
+class Pipeline:
+    """Run a source and a chain of generator stages, one thread per stage"""
+
+    def __init__(self, name: str, source: Iterable[Any], stages: List[Tuple[str, Stage]],
+                 queue_size: int = PIPELINE_QUEUE_SIZE, source_name: str = "source"):
+        self.name = name
+        self.source = source
+        self.stages = stages
+        self.queue_size = queue_size
+        self.stats = PipelineStats(name=name, stages=[StageStats(source_name)] + [StageStats(n) for n, _ in stages])
+        self._cancelled = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _put(self, out_queue: queue.Queue, item, stats: StageStats):
+        started = time.perf_counter()
+        while True:
+            if self._cancelled.is_set() and item is not _DONE and not isinstance(item, _Failure):
+                raise PipelineCancelled(self.name)
+            try:
+                out_queue.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        stats.wait_seconds += time.perf_counter() - started
+
+    def _iter_queue(self, in_queue: queue.Queue, stats: StageStats) -> Iterator[Any]:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = in_queue.get(timeout=0.1)
+            except queue.Empty:
+                stats.wait_seconds += time.perf_counter() - started
+                if self._cancelled.is_set():
+                    raise PipelineCancelled(self.name)
+                continue
+            stats.wait_seconds += time.perf_counter() - started
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            stats.items_in += 1
+            yield item
+
+    def _drive(self, iterable: Iterable[Any], stats: StageStats, out_queue: queue.Queue):
+        """Pull results from a stage and push them downstream, timing only the stage's own work"""
+        stats.started_at = time.time()
+        iterator = None
+        try:
+            iterator = iter(iterable)
+            while True:
+                if self._cancelled.is_set():
+                    raise PipelineCancelled(self.name)
+                started = time.perf_counter()
+                wait_before = stats.wait_seconds
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    stats.busy_seconds += time.perf_counter() - started - (stats.wait_seconds - wait_before)
+                    break
+                stats.busy_seconds += time.perf_counter() - started - (stats.wait_seconds - wait_before)
+                stats.items_out += 1
+                self._put(out_queue, item, stats)
+            self._put(out_queue, _DONE, stats)
+        except BaseException as e:
+            if self._error is None and not isinstance(e, PipelineCancelled):
+                self._error = e
+            self._cancelled.set()
+            try:
+                out_queue.put(_Failure(e), timeout=1)
+            except queue.Full:
+                pass  # Downstream notices the cancellation flag instead
+        finally:
+            # Release what the stage holds (open files, worker processes) without waiting for GC
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception:
+                    pass
+            stats.finished_at = time.time()
+
+    def run(self) -> PipelineStats:
+        """Run to completion in the calling thread; re-raises the first stage error"""
+        source_stats = self.stats.stages[0]
+        source_queue = queue.Queue(maxsize=self.queue_size)
+        threads = [threading.Thread(target=self._drive, args=(self.source, source_stats, source_queue),
+                                    name=f"{self.name}-source", daemon=True)]
+
+        in_queue = source_queue
+        for (stage_name, stage), stats in zip(self.stages, self.stats.stages[1:]):
+            out_queue = queue.Queue(maxsize=self.queue_size)
+            upstream = self._iter_queue(in_queue, stats)
+            threads.append(threading.Thread(target=self._drive, args=(stage(upstream), stats, out_queue),
+                                            name=f"{self.name}-{stage_name}", daemon=True))
+            in_queue = out_queue
+
+        for thread in threads:
+            thread.start()
+
+        # Drain the last queue here; the final stage's items are not needed by the caller
+        try:
+            for _ in self._iter_queue(in_queue, StageStats("sink")):
+                pass
+        except BaseException as e:
+            self._cancelled.set()
+            error = self._error or e
+            self.stats.error = str(error) or type(error).__name__
+            raise error
+        finally:
+            # Every blocking queue operation polls the cancel flag, so threads exit promptly
+            for thread in threads:
+                thread.join(timeout=1)
+
+        return self.stats
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Group an iterator into lists of at most size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
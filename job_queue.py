@@ -0,0 +1,423 @@
+"""Durable ingestion job queue backed by the application database.
+
+Jobs live in the ingestion_jobs table, so their status survives restarts and
+is visible to every uvicorn worker. Each process runs a fixed-size pool of
+INGEST_WORKERS threads that claim jobs with a conditional UPDATE (only one
+worker can move a job from "queued" to "running"), highest priority first.
+
+- Progress (done / total, e.g. pages) and a heartbeat are written while a job
+  runs; a job whose heartbeat is older than INGEST_JOB_LEASE_SECONDS is assumed
+  to belong to a dead worker and is re-queued.
+- Failures are retried with exponential backoff up to max_attempts;
+  PermanentJobError skips the retries.
+- Cancellation is a flag on the row: queued jobs are cancelled immediately,
+  running jobs are told through JobContext and stop at the next checkpoint.
+- Status changes and progress are pushed to "job:{job_id}" subscribers
+  (event_bus), so clients do not need to poll.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from database import IngestionJob, SessionLocal
+from event_bus import publish
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", 3))
+INGEST_RETRY_BASE_SECONDS = float(os.getenv("INGEST_RETRY_BASE_SECONDS", 10))
+INGEST_JOB_LEASE_SECONDS = int(os.getenv("INGEST_JOB_LEASE_SECONDS", 120))
+INGEST_POLL_INTERVAL = float(os.getenv("INGEST_POLL_INTERVAL", 1.0))
+HEARTBEAT_INTERVAL = 2.0
+
+FINISHED_STATES = ("completed", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class PermanentJobError(Exception):
+    """A failure that retrying cannot fix (e.g. the file has no text)"""
+
+
+def publish_job(job: Dict[str, Any]):
+    publish(f"job:{job['job_id']}", "job", job)
+
+
+def job_to_dict(job: IngestionJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "name": job.name,
+        "tenant": job.tenant,
+        "status": job.status,
+        "priority": job.priority,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "progress": {"done": job.progress_done, "total": job.progress_total},
+        "cancel_requested": job.cancel_requested,
+        "error": job.error,
+        "result": json.loads(job.result) if job.result else None,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "next_run_at": job.next_run_at.isoformat() if job.next_run_at and job.status == "queued" else None
+    }
+
+
+class JobContext:
+    """Handed to a job handler: job details, progress reporting and cancellation"""
+
+    def __init__(self, job: Dict[str, Any]):
+        self.job_id = job["job_id"]
+        self.kind = job["kind"]
+        self.name = job["name"]
+        self.source = job["source"]
+        self.tenant = job["tenant"]
+        self.attempt = job["attempts"]
+        self.progress_done = 0
+        self.progress_total: Optional[int] = None
+        self._cancelled = threading.Event()
+        self._cancel_callbacks: List[Callable[[], None]] = []
+        self._progress_source: Optional[Callable[[], tuple]] = None
+
+    def set_progress(self, done: int, total: Optional[int] = None):
+        self.progress_done = done
+        if total is not None:
+            self.progress_total = total
+        self.check_cancelled()
+
+    def track_progress(self, source: Callable[[], tuple]):
+        """Register a callable returning (done, total); it is sampled on every heartbeat"""
+        self._progress_source = source
+
+    def on_cancel(self, callback: Callable[[], None]):
+        self._cancel_callbacks.append(callback)
+        if self._cancelled.is_set():
+            callback()
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check_cancelled(self):
+        if self._cancelled.is_set():
+            raise JobCancelled(self.job_id)
+
+    def _sample_progress(self):
+        if self._progress_source is not None:
+            try:
+                done, total = self._progress_source()
+                self.progress_done = done
+                if total is not None:
+                    self.progress_total = total
+            except Exception:
+                pass
+
+    def _request_cancel(self):
+        if not self._cancelled.is_set():
+            self._cancelled.set()
+            for callback in self._cancel_callbacks:
+                try:
+                    callback()
+                except Exception:
+                    pass
+
+
+# Public API
+
+_handlers: Dict[str, Callable[[JobContext], Any]] = {}
+
+
+def register_handler(kind: str, handler: Callable[[JobContext], Any]):
+    """handler(context) runs the job; its return value is stored as the JSON result"""
+    _handlers[kind] = handler
+
+
+def enqueue_job(kind: str, source: str, name: str, priority: int = 0,
+                max_attempts: int = INGEST_MAX_ATTEMPTS, tenant: Optional[str] = None) -> Dict[str, Any]:
+    job_id = str(uuid.uuid4())
+    with SessionLocal() as db:
+        job = IngestionJob(
+            id=job_id, kind=kind, source=source, name=name, tenant=tenant, priority=priority,
+            max_attempts=max_attempts, status="queued", next_run_at=datetime.utcnow()
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        result = job_to_dict(job)
+    job_pool.wake()
+    return result
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    with SessionLocal() as db:
+        job = db.get(IngestionJob, job_id)
+        return job_to_dict(job) if job else None
+
+
+def find_latest_job(name: str, tenants: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+    """Most recent job for a filename / URL (used by the legacy status route), of the given tenants if any"""
+    with SessionLocal() as db:
+        query = db.query(IngestionJob).filter(IngestionJob.name == name)
+        if tenants is not None:
+            query = query.filter(IngestionJob.tenant.in_(list(tenants)))
+        job = query.order_by(IngestionJob.created_at.desc()).first()
+        return job_to_dict(job) if job else None
+
+
+def list_jobs(status: Optional[str] = None, limit: int = 50,
+              tenants: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    with SessionLocal() as db:
+        query = db.query(IngestionJob)
+        if status:
+            query = query.filter(IngestionJob.status == status)
+        if tenants is not None:
+            query = query.filter(IngestionJob.tenant.in_(list(tenants)))
+        jobs = query.order_by(IngestionJob.created_at.desc()).limit(limit).all()
+        return [job_to_dict(job) for job in jobs]
+
+
+def cancel_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Cancel a queued job now; ask a running one to stop at its next checkpoint"""
+    with SessionLocal() as db:
+        now = datetime.utcnow()
+        db.query(IngestionJob).filter(IngestionJob.id == job_id, IngestionJob.status == "queued").update(
+            {IngestionJob.status: "cancelled", IngestionJob.cancel_requested: True, IngestionJob.finished_at: now},
+            synchronize_session=False
+        )
+        db.query(IngestionJob).filter(IngestionJob.id == job_id, IngestionJob.status == "running").update(
+            {IngestionJob.cancel_requested: True},
+            synchronize_session=False
+        )
+        db.commit()
+        job = db.get(IngestionJob, job_id)
+        result = job_to_dict(job) if job else None
+    if result is not None and result["status"] == "cancelled":
+        publish_job(result)
+    return result
+
+
+# Worker pool
+
+class JobWorkerPool:
+    """Fixed number of worker threads per process, coordinated through the database"""
+
+    def __init__(self, size: int = INGEST_WORKERS):
+        self.size = size
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._threads: List[threading.Thread] = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._last_lease_check = 0.0
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping.clear()
+        for index in range(self.size):
+            thread = threading.Thread(target=self._worker_loop, args=(f"{self.worker_prefix}:{index}",),
+                                      name=f"ingest-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"✅ Ingestion job workers started ({self.size} threads)")
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _worker_loop(self, worker_id: str):
+        while not self._stopping.is_set():
+            try:
+                self._requeue_expired()
+                job = self._claim(worker_id)
+            except Exception as e:
+                print(f"❌ Job queue error: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.wait(INGEST_POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+
+            self._run(worker_id, job)
+
+    def _claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        with SessionLocal() as db:
+            for _ in range(3):  # Another worker may win the race for the same row
+                now = datetime.utcnow()
+                candidate = db.query(IngestionJob.id).filter(
+                    IngestionJob.status == "queued",
+                    IngestionJob.next_run_at <= now
+                ).order_by(IngestionJob.priority.desc(), IngestionJob.created_at).first()
+                if candidate is None:
+                    return None
+
+                claimed = db.query(IngestionJob).filter(
+                    IngestionJob.id == candidate.id,
+                    IngestionJob.status == "queued"
+                ).update({
+                    IngestionJob.status: "running",
+                    IngestionJob.locked_by: worker_id,
+                    IngestionJob.locked_at: now,
+                    IngestionJob.started_at: now,
+                    IngestionJob.attempts: IngestionJob.attempts + 1,
+                    IngestionJob.error: None
+                }, synchronize_session=False)
+                db.commit()
+
+                if claimed == 1:
+                    job = db.get(IngestionJob, candidate.id)
+                    db.refresh(job)
+                    data = job_to_dict(job)
+                    publish_job(data)
+                    data["source"] = job.source
+                    return data
+        return None
+
+    def _requeue_expired(self):
+        """Jobs whose worker stopped heartbeating go back to the queue (or fail when out of attempts)"""
+        if time.monotonic() - self._last_lease_check < INGEST_JOB_LEASE_SECONDS / 4:
+            return
+        self._last_lease_check = time.monotonic()
+
+        cutoff = datetime.utcnow() - timedelta(seconds=INGEST_JOB_LEASE_SECONDS)
+        with SessionLocal() as db:
+            expired = db.query(IngestionJob).filter(
+                IngestionJob.status == "running",
+                IngestionJob.locked_at < cutoff
+            ).all()
+            requeued = []
+            for job in expired:
+                exhausted = job.attempts >= job.max_attempts
+                updated = db.query(IngestionJob).filter(
+                    IngestionJob.id == job.id,
+                    IngestionJob.status == "running",
+                    IngestionJob.locked_at < cutoff
+                ).update({
+                    IngestionJob.status: "failed" if exhausted else "queued",
+                    IngestionJob.locked_by: None,
+                    IngestionJob.error: "Worker stopped responding",
+                    IngestionJob.finished_at: datetime.utcnow() if exhausted else None,
+                    IngestionJob.next_run_at: datetime.utcnow()
+                }, synchronize_session=False)
+                if updated:
+                    requeued.append(job.id)
+                    print(f"⚠️ Re-queued job {job.id} ({job.name}) from an unresponsive worker")
+            db.commit()
+            for job_id in requeued:
+                publish_job(job_to_dict(db.get(IngestionJob, job_id)))
+
+    def _heartbeat(self, worker_id: str, context: JobContext, done: threading.Event):
+        """Persist progress and lease, and pick up cancellation requests, while the job runs"""
+        published = (context.progress_done, context.progress_total)
+        while not done.wait(HEARTBEAT_INTERVAL):
+            context._sample_progress()
+            try:
+                with SessionLocal() as db:
+                    db.query(IngestionJob).filter(
+                        IngestionJob.id == context.job_id,
+                        IngestionJob.locked_by == worker_id
+                    ).update({
+                        IngestionJob.locked_at: datetime.utcnow(),
+                        IngestionJob.progress_done: context.progress_done,
+                        IngestionJob.progress_total: context.progress_total
+                    }, synchronize_session=False)
+                    db.commit()
+                    cancel_requested = db.query(IngestionJob.cancel_requested).filter(
+                        IngestionJob.id == context.job_id
+                    ).scalar()
+                    if (context.progress_done, context.progress_total) != published:
+                        published = (context.progress_done, context.progress_total)
+                        job = db.get(IngestionJob, context.job_id)
+                        if job is not None and job.status == "running":
+                            publish_job(job_to_dict(job))
+                if cancel_requested:
+                    context._request_cancel()
+            except Exception as e:
+                print(f"⚠️ Heartbeat failed for job {context.job_id}: {e}")
+
+    def _finish(self, worker_id: str, job_id: str, values: Dict[Any, Any]):
+        with SessionLocal() as db:
+            db.query(IngestionJob).filter(
+                IngestionJob.id == job_id,
+                IngestionJob.locked_by == worker_id
+            ).update(values, synchronize_session=False)
+            db.commit()
+            job = db.get(IngestionJob, job_id)
+            if job is not None:
+                publish_job(job_to_dict(job))
+
+    def _run(self, worker_id: str, job: Dict[str, Any]):
+        context = JobContext(job)
+        handler = _handlers.get(job["kind"])
+        print(f"⚙️ Job {job['job_id']} ({job['kind']}: {job['name']}) attempt {job['attempts']}/{job['max_attempts']}")
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(worker_id, context, done), daemon=True)
+        heartbeat.start()
+
+        try:
+            if handler is None:
+                raise PermanentJobError(f"No handler registered for job kind '{job['kind']}'")
+            if job["cancel_requested"]:
+                raise JobCancelled(job["job_id"])
+
+            result = handler(context)
+            context._sample_progress()
+            self._finish(worker_id, job["job_id"], {
+                IngestionJob.status: "completed",
+                IngestionJob.result: json.dumps(result) if result is not None else None,
+                IngestionJob.progress_done: context.progress_done,
+                IngestionJob.progress_total: context.progress_total,
+                IngestionJob.finished_at: datetime.utcnow(),
+                IngestionJob.locked_by: None
+            })
+            print(f"✅ Job {job['job_id']} completed")
+
+        except Exception as e:
+            now = datetime.utcnow()
+            if isinstance(e, JobCancelled) or context.is_cancelled():
+                values = {IngestionJob.status: "cancelled", IngestionJob.finished_at: now}
+                print(f"🛑 Job {job['job_id']} cancelled")
+            elif isinstance(e, PermanentJobError) or job["attempts"] >= job["max_attempts"]:
+                values = {IngestionJob.status: "failed", IngestionJob.error: str(e) or type(e).__name__,
+                          IngestionJob.finished_at: now}
+                print(f"❌ Job {job['job_id']} failed: {e}")
+            else:
+                delay = INGEST_RETRY_BASE_SECONDS * (2 ** (job["attempts"] - 1))
+                values = {IngestionJob.status: "queued", IngestionJob.error: str(e) or type(e).__name__,
+                          IngestionJob.next_run_at: now + timedelta(seconds=delay)}
+                print(f"⚠️ Job {job['job_id']} failed (attempt {job['attempts']}), retrying in {delay:.0f}s: {e}")
+                traceback.print_exc()
+
+            context._sample_progress()
+            values.update({
+                IngestionJob.progress_done: context.progress_done,
+                IngestionJob.progress_total: context.progress_total,
+                IngestionJob.locked_by: None
+            })
+            self._finish(worker_id, job["job_id"], values)
+
+        finally:
+            done.set()
+            heartbeat.join(timeout=HEARTBEAT_INTERVAL + 1)
+
+
+job_pool = JobWorkerPool()
+
+
+def start_job_workers():
+    job_pool.start()
@@ -17,6 +17,15 @@ from auth import (
     get_user_info_from_token
 )
 from cloudinary_config import upload_file_to_cloudinary, download_file_from_cloudinary
+from content_store import (
+    get_or_create_content,
+    release_content,
+    get_file_type,
+    get_cached_text,
+    store_cached_text,
+    get_cached_feature,
+    store_cached_feature
+)
 import json
 import os
 import secrets
@@ -30,7 +39,8 @@ from functions import (
     create_sticky_notes,
     generate_exam_questions,
     process_uploaded_file,
-    classify_question_importance
+    classify_question_importance,
+    generate_with_model
 )
 
 # Add YouTube functions import
@@ -45,6 +55,8 @@ from youtubefunctions import (
 
 # Add the import for document Q&A routes
 from doc_qna_routes import create_doc_qna_routes
+from event_bus import publish, event_stream_response
+from model_registry import registry
 
 app = FastAPI(title="Smart Study Tool", version="1.0.0")
 
@@ -423,13 +435,20 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "version": "1.0.0"}
 
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness check - 503 until background model warm-up has finished"""
+    readiness = registry.readiness()
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
+
 @app.get("/api/supported-formats")
 async def get_supported_formats():
     """Get list of supported file formats"""
     return {
         "supported_formats": [
             "pdf", "docx", "txt", "pptx", 
-            "md", "html", "csv", "json"
+            "md", "html", "csv", "json", "epub",
+            "mp3", "wav", "m4a", "ogg", "flac", "webm"
         ]
     }
 
@@ -695,38 +714,92 @@ async def upload_document(
         # Read file content
         file_content = await file.read()
         
-        # Upload to Cloudinary
-        upload_result = await upload_file_to_cloudinary(
-            file_content, file.filename, current_user.id
-        )
+        # Store once per unique file - identical uploads share the same blob
+        stored_content = await get_or_create_content(db, file_content, file.filename)
         
         # Save to database
         document = UserDocument(
             user_id=current_user.id,
             filename=file.filename,
             original_filename=file.filename,
-            cloudinary_url=upload_result["url"],
-            file_type=file.filename.split('.')[-1].lower() if '.' in file.filename else 'unknown'
+            cloudinary_url=stored_content.cloudinary_url,
+            file_type=get_file_type(file.filename),
+            content_id=stored_content.id
         )
         
         db.add(document)
         db.commit()
         db.refresh(document)
+        publish(f"user:{current_user.id}", "document_added", {"document_id": document.id, "filename": document.original_filename})
         
         return {
             "success": True,
             "document_id": document.id,
             "filename": document.original_filename,
-            "url": document.cloudinary_url
+            "url": document.cloudinary_url,
+            "deduplicated": stored_content.ref_count > 1
         }
         
     except Exception as e:
         print(f"Upload error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+@app.delete("/api/user/documents/{document_id}")
+async def delete_user_document(
+    document_id: int,
+    current_user: User = Depends(require_auth),
+    db: Session = Depends(get_db)
+):
+    """Delete a document from user's account"""
+    try:
+        document = db.query(UserDocument).filter(
+            UserDocument.id == document_id,
+            UserDocument.user_id == current_user.id
+        ).first()
+        
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
+        
+        content_id = document.content_id
+        db.query(GeneratedFeature).filter(GeneratedFeature.document_id == document.id).delete()
+        db.delete(document)
+        db.commit()
+        publish(f"user:{current_user.id}", "document_deleted", {"document_id": document_id})
+        
+        # Shared blob is only removed once no other document references it
+        release_content(db, content_id)
+        
+        return {"success": True, "document_id": document_id}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting document: {str(e)}")
+
 # Fix content extraction function
+async def generate_cached_feature(db: Session, document, feature_type: str, generator, load_content):
+    """Result already generated for identical content, or a new one.
+
+    Only model output for successfully extracted text is shared: fallback
+    results and results for placeholder text are returned but not cached.
+    """
+    result = get_cached_feature(db, document.content_id, feature_type)
+    if result is not None:
+        return result
+
+    content = await load_content(document)
+    result, from_model = await generate_with_model(generator, content)
+    if from_model and get_cached_text(document.content) is not None:
+        store_cached_feature(db, document.content_id, feature_type, result)
+    return result
+
 async def get_document_content(document: UserDocument) -> str:
     """Extract text content from document URL"""
+    # Identical files are extracted once and shared through their content record
+    cached_text = get_cached_text(document.content)
+    if cached_text:
+        return cached_text
+    
     try:
         import requests
         
@@ -743,24 +816,31 @@ async def get_document_content(document: UserDocument) -> str:
         if document.file_type.lower() == 'pdf':
             try:
                 from functions import extract_text_from_pdf
-                return extract_text_from_pdf(response.content)
+                return store_cached_text(document.content, extract_text_from_pdf(response.content))
             except Exception as pdf_error:
                 print(f"PDF extraction error: {pdf_error}")
                 return f"Could not extract PDF content from {document.original_filename}. Using sample content for demonstration: This is a sample educational document about {document.original_filename}. It contains important concepts, definitions, and key learning points that students should understand and remember for their studies."
+        elif document.file_type.lower() in ['pptx', 'epub']:
+            try:
+                from functions import extract_text_from_office
+                return store_cached_text(document.content, extract_text_from_office(response.content, document.file_type.lower()))
+            except Exception as doc_error:
+                print(f"{document.file_type.upper()} extraction error: {doc_error}")
+                return f"Could not extract document content from {document.original_filename}."
         elif document.file_type.lower() in ['docx', 'doc']:
             try:
                 from functions import extract_text_from_docx
-                return extract_text_from_docx(response.content)
+                return store_cached_text(document.content, extract_text_from_docx(response.content))
             except Exception as doc_error:
                 print(f"DOC extraction error: {doc_error}")
                 return f"Could not extract document content from {document.original_filename}. Using sample content for demonstration: This is a sample educational document about {document.original_filename}. It contains important concepts, definitions, and key learning points that students should understand and remember for their studies."
         else:
             # For text files, decode content
             try:
-                return response.content.decode('utf-8')
+                return store_cached_text(document.content, response.content.decode('utf-8'))
             except UnicodeDecodeError:
                 try:
-                    return response.content.decode('latin-1')
+                    return store_cached_text(document.content, response.content.decode('latin-1'))
                 except:
                     return response.text
                     
@@ -1015,6 +1095,7 @@ async def join_group(
         )
         db.add(membership)
         db.commit()
+        publish(f"group:{group.id}", "member_joined", {"user_id": current_user.id, "name": current_user.name})
         
         return {
             "success": True,
@@ -1155,24 +1236,33 @@ async def upload_group_document(
         # Read file content
         file_content = await file.read()
         
-        # Upload to Cloudinary
-        upload_result = await upload_file_to_cloudinary(
-            file_content, file.filename, current_user.id
-        )
+        # Store once per unique file - identical uploads share the same blob
+        stored_content = await get_or_create_content(db, file_content, file.filename)
         
         # Save to database
         document = GroupDocument(
             group_id=group_id,
             uploaded_by=current_user.id,
             filename=file.filename,
-            cloudinary_url=upload_result["url"],
-            file_type=file.filename.split('.')[-1].lower() if '.' in file.filename else 'unknown'
+            cloudinary_url=stored_content.cloudinary_url,
+            file_type=get_file_type(file.filename),
+            content_id=stored_content.id
         )
         
         db.add(document)
         db.commit()
         db.refresh(document)
         
+        document_data = {
+            "id": document.id,
+            "filename": document.filename,
+            "file_type": document.file_type,
+            "uploaded_by": current_user.name,
+            "uploaded_at": document.uploaded_at.isoformat(),
+            "features": {}
+        }
+        publish(f"group:{group_id}", "document_added", {"document": document_data})
+        
         return {
             "success": True,
             "document": {
@@ -1243,6 +1333,50 @@ async def get_group_documents(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching documents: {str(e)}")
 
+@app.delete("/api/groups/{group_id}/documents/{document_id}")
+async def delete_group_document(
+    group_id: int,
+    document_id: int,
+    current_user: User = Depends(require_auth),
+    db: Session = Depends(get_db)
+):
+    """Delete a group document (uploader or group admin only)"""
+    try:
+        # Check if user is a member
+        membership = db.query(GroupMembership).filter(
+            GroupMembership.user_id == current_user.id,
+            GroupMembership.group_id == group_id
+        ).first()
+        
+        if not membership:
+            raise HTTPException(status_code=403, detail="Not a member of this group")
+        
+        document = db.query(GroupDocument).filter(
+            GroupDocument.id == document_id,
+            GroupDocument.group_id == group_id
+        ).first()
+        
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
+        
+        if document.uploaded_by != current_user.id and membership.role != "admin":
+            raise HTTPException(status_code=403, detail="Only the uploader or a group admin can delete this document")
+        
+        content_id = document.content_id
+        db.delete(document)
+        db.commit()
+        publish(f"group:{group_id}", "document_deleted", {"document_id": document_id})
+        
+        # Shared blob is only removed once no other document references it
+        release_content(db, content_id)
+        
+        return {"success": True, "document_id": document_id}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting document: {str(e)}")
+
 @app.post("/api/groups/{group_id}/generate/{feature_type}")
 async def generate_group_feature(
     group_id: int,
@@ -1271,25 +1405,21 @@ async def generate_group_feature(
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        # Extract content
-        content = await get_group_document_content(document)
-        
-        # Generate feature based on type
-        if feature_type == "flashcards":
-            result = await generate_flashcards(content)
-        elif feature_type == "mcqs":
-            result = await generate_mcqs(content)
-        elif feature_type == "mindmap":
-            result = await create_mind_map(content)
-        elif feature_type == "learning-path":
-            result = await generate_learning_path(content)
-        elif feature_type == "sticky-notes":
-            result = await create_sticky_notes(content)
-        elif feature_type == "exam-questions":
-            result = await generate_exam_questions(content)
-        else:
+        generators = {
+            "flashcards": generate_flashcards,
+            "mcqs": generate_mcqs,
+            "mindmap": create_mind_map,
+            "learning-path": generate_learning_path,
+            "sticky-notes": create_sticky_notes,
+            "exam-questions": generate_exam_questions
+        }
+        if feature_type not in generators:
             raise HTTPException(status_code=400, detail="Invalid feature type")
         
+        # Reuse results already generated for identical content
+        result = await generate_cached_feature(db, document, feature_type, generators[feature_type],
+                                               get_group_document_content)
+        
         # Save feature
         existing_feature = db.query(GroupFeature).filter(
             GroupFeature.group_document_id == document_id,
@@ -1300,6 +1430,7 @@ async def generate_group_feature(
             existing_feature.content = json.dumps(result)
             existing_feature.created_at = datetime.utcnow()
             existing_feature.created_by = current_user.id
+            feature = existing_feature
         else:
             feature = GroupFeature(
                 group_document_id=document_id,
@@ -1310,6 +1441,12 @@ async def generate_group_feature(
             db.add(feature)
         
         db.commit()
+        publish(f"group:{group_id}", "feature_generated", {
+            "document_id": document_id,
+            "feature_type": feature_type,
+            "feature": {"id": feature.id, "created_at": feature.created_at.isoformat()},
+            "created_by": current_user.name
+        })
         return result
         
     except HTTPException:
@@ -1317,6 +1454,30 @@ async def generate_group_feature(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating feature: {str(e)}")
 
+@app.get("/api/events")
+async def stream_events(
+    request: Request,
+    groups: Optional[str] = None,
+    current_user: User = Depends(require_auth),
+    db: Session = Depends(get_db)
+):
+    """Server-Sent Events for the user's documents/features and their groups (all, or a comma-separated subset)"""
+    memberships = db.query(GroupMembership.group_id).filter(GroupMembership.user_id == current_user.id).all()
+    member_of = {membership.group_id for membership in memberships}
+    
+    if groups:
+        try:
+            requested = {int(group_id) for group_id in groups.split(",") if group_id}
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid group id")
+        if not requested <= member_of:
+            raise HTTPException(status_code=403, detail="Not a member of this group")
+        member_of = requested
+    
+    topics = [f"user:{current_user.id}"] + [f"group:{group_id}" for group_id in member_of]
+    db.close()  # The stream can stay open for hours; do not hold a pooled connection for it
+    return event_stream_response(topics, last_event_id=request.headers.get("last-event-id"))
+
 @app.get("/api/groups/{group_id}/info")
 async def get_group_info(
     group_id: int,
@@ -1420,6 +1581,11 @@ async def get_group_feature(
 
 async def get_group_document_content(document: GroupDocument) -> str:
     """Extract text content from group document URL with better error handling"""
+    # Identical files are extracted once and shared through their content record
+    cached_text = get_cached_text(document.content)
+    if cached_text:
+        return cached_text
+    
     try:
         import requests
         
@@ -1443,23 +1609,30 @@ async def get_group_document_content(document: GroupDocument) -> str:
         if document.file_type.lower() == 'pdf':
             try:
                 from functions import extract_text_from_pdf
-                return extract_text_from_pdf(response.content)
+                return store_cached_text(document.content, extract_text_from_pdf(response.content))
             except Exception as pdf_error:
                 print(f"PDF extraction error: {pdf_error}")
                 return get_fallback_content(document.filename)
+        elif document.file_type.lower() in ['pptx', 'epub']:
+            try:
+                from functions import extract_text_from_office
+                return store_cached_text(document.content, extract_text_from_office(response.content, document.file_type.lower()))
+            except Exception as doc_error:
+                print(f"{document.file_type.upper()} extraction error: {doc_error}")
+                return get_fallback_content(document.filename)
         elif document.file_type.lower() in ['docx', 'doc']:
             try:
                 from functions import extract_text_from_docx
-                return extract_text_from_docx(response.content)
+                return store_cached_text(document.content, extract_text_from_docx(response.content))
             except Exception as doc_error:
                 print(f"DOC extraction error: {doc_error}")
                 return get_fallback_content(document.filename)
         else:
             try:
-                return response.content.decode('utf-8')
+                return store_cached_text(document.content, response.content.decode('utf-8'))
             except UnicodeDecodeError:
                 try:
-                    return response.content.decode('latin-1')
+                    return store_cached_text(document.content, response.content.decode('latin-1'))
                 except:
                     return response.text
                 
@@ -1591,11 +1764,8 @@ async def generate_flashcards_auth(
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        # Extract content
-        content = await get_document_content(document)
-        
-        # Generate flashcards
-        flashcards = await generate_flashcards(content)
+        # Reuse results already generated for identical content
+        flashcards = await generate_cached_feature(db, document, "flashcards", generate_flashcards, get_document_content)
         
         # Save feature
         existing_feature = db.query(GeneratedFeature).filter(
@@ -1615,6 +1785,7 @@ async def generate_flashcards_auth(
             db.add(feature)
         
         db.commit()
+        publish(f"user:{current_user.id}", "feature_generated", {"document_id": document_id, "feature_type": "flashcards"})
         return flashcards
         
     except Exception as e:
@@ -1636,8 +1807,7 @@ async def generate_mcqs_auth(
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        content = await get_document_content(document)
-        mcqs = await generate_mcqs(content)
+        mcqs = await generate_cached_feature(db, document, "mcqs", generate_mcqs, get_document_content)
         
         existing_feature = db.query(GeneratedFeature).filter(
             GeneratedFeature.document_id == document_id,
@@ -1656,6 +1826,7 @@ async def generate_mcqs_auth(
             db.add(feature)
         
         db.commit()
+        publish(f"user:{current_user.id}", "feature_generated", {"document_id": document_id, "feature_type": "mcqs"})
         return mcqs
         
     except Exception as e:
@@ -1677,8 +1848,7 @@ async def generate_mindmap_auth(
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        content = await get_document_content(document)
-        mindmap = await create_mind_map(content)
+        mindmap = await generate_cached_feature(db, document, "mindmap", create_mind_map, get_document_content)
         
         existing_feature = db.query(GeneratedFeature).filter(
             GeneratedFeature.document_id == document_id,
@@ -1697,6 +1867,7 @@ async def generate_mindmap_auth(
             db.add(feature)
         
         db.commit()
+        publish(f"user:{current_user.id}", "feature_generated", {"document_id": document_id, "feature_type": "mindmap"})
         return mindmap
         
     except Exception as e:
@@ -1718,8 +1889,7 @@ async def generate_learning_path_auth(
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        content = await get_document_content(document)
-        learning_path = await generate_learning_path(content)
+        learning_path = await generate_cached_feature(db, document, "learning-path", generate_learning_path, get_document_content)
         
         existing_feature = db.query(GeneratedFeature).filter(
             GeneratedFeature.document_id == document_id,
@@ -1738,6 +1908,7 @@ async def generate_learning_path_auth(
             db.add(feature)
         
         db.commit()
+        publish(f"user:{current_user.id}", "feature_generated", {"document_id": document_id, "feature_type": "learning-path"})
         return learning_path
         
     except Exception as e:
@@ -1759,8 +1930,7 @@ async def generate_sticky_notes_auth(
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        content = await get_document_content(document)
-        sticky_notes = await create_sticky_notes(content)
+        sticky_notes = await generate_cached_feature(db, document, "sticky-notes", create_sticky_notes, get_document_content)
         
         existing_feature = db.query(GeneratedFeature).filter(
             GeneratedFeature.document_id == document_id,
@@ -1779,6 +1949,7 @@ async def generate_sticky_notes_auth(
             db.add(feature)
         
         db.commit()
+        publish(f"user:{current_user.id}", "feature_generated", {"document_id": document_id, "feature_type": "sticky-notes"})
         return sticky_notes
         
     except Exception as e:
@@ -1800,8 +1971,7 @@ async def generate_exam_questions_auth(
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        content = await get_document_content(document)
-        exam_questions = await generate_exam_questions(content)
+        exam_questions = await generate_cached_feature(db, document, "exam-questions", generate_exam_questions, get_document_content)
         
         existing_feature = db.query(GeneratedFeature).filter(
             GeneratedFeature.document_id == document_id,
@@ -1820,6 +1990,7 @@ async def generate_exam_questions_auth(
             db.add(feature)
         
         db.commit()
+        publish(f"user:{current_user.id}", "feature_generated", {"document_id": document_id, "feature_type": "exam-questions"})
         return exam_questions
         
     except Exception as e:
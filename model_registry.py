@@ -0,0 +1,155 @@
+"""Central registry for heavy models.
+
+Nothing is loaded at import time: each model is built by its factory on first
+use (or by an optional background warm-up after startup), exactly once per
+process. The registry records load state and timings so /api/ready can report
+what is available.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+MODEL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_cache")
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+LLM_MODEL_NAME = "gemini-2.0-flash"
+WHISPER_MODEL_NAME = os.getenv("WHISPER_MODEL", "medium")
+
+# Background warm-up after startup; WARM_MODELS is a comma-separated list of names
+WARM_ON_STARTUP = os.getenv("WARM_MODELS_ON_STARTUP", "true").lower() == "true"
+WARM_MODELS = [name for name in os.getenv("WARM_MODELS", "embeddings,llm").split(",") if name]
+
+
+class ModelRegistry:
+    """Lazily builds and caches named models, one lock per model"""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """Register a zero-argument factory that builds the model"""
+        with self._lock:
+            self._factories[name] = factory
+            self._locks.setdefault(name, threading.Lock())
+            self._status.setdefault(name, {"state": "cold", "load_seconds": None, "error": None})
+
+    def get(self, name: str) -> Any:
+        """Return the model, building it on first use"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        if name not in self._factories:
+            raise KeyError(f"Unknown model: {name}")
+
+        with self._locks[name]:
+            # Another thread may have finished loading while we waited
+            model = self._models.get(name)
+            if model is not None:
+                return model
+
+            self._status[name].update(state="loading", error=None)
+            print(f"⏳ Loading model '{name}'...")
+            started = time.perf_counter()
+            try:
+                model = self._factories[name]()
+            except Exception as e:
+                self._status[name].update(state="failed", error=str(e))
+                print(f"❌ Failed to load model '{name}': {e}")
+                raise
+
+            elapsed = time.perf_counter() - started
+            self._models[name] = model
+            self._status[name].update(state="ready", load_seconds=round(elapsed, 2))
+            print(f"✅ Model '{name}' ready in {elapsed:.1f}s")
+            return model
+
+    def is_ready(self, name: str) -> bool:
+        return name in self._models
+
+    def warm_up(self, names: Optional[Iterable[str]] = None, background: bool = True):
+        """Load the given models (default: WARM_MODELS), optionally in a background thread"""
+        names = list(names) if names is not None else list(WARM_MODELS)
+
+        def _load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    pass  # Recorded in status; requests will retry on demand
+
+        if background:
+            threading.Thread(target=_load_all, name="model-warmup", daemon=True).start()
+        else:
+            _load_all()
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshot of load state per registered model"""
+        with self._lock:
+            return {name: dict(info) for name, info in self._status.items()}
+
+    def readiness(self) -> Dict[str, Any]:
+        """Ready once every warm-up model has loaded (always ready when warm-up is off)"""
+        required = WARM_MODELS if WARM_ON_STARTUP else []
+        return {
+            "ready": all(self.is_ready(name) for name in required),
+            "required": required,
+            "models": self.status()
+        }
+
+
+registry = ModelRegistry()
+
+
+def get_model(name: str) -> Any:
+    """Return a model from the shared registry"""
+    return registry.get(name)
+
+
+# Default factories - imports stay inside so importing this module is cheap
+
+def _build_embeddings():
+    from embedding_engine import EmbeddingEngine
+
+    os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+    # Batched encoding, optional int8/ONNX backend and worker processes (embedding_engine.py)
+    embeddings = EmbeddingEngine(EMBEDDING_MODEL_NAME, cache_folder=MODEL_CACHE_DIR)
+
+    from embedding_cache import EMBEDDING_CACHE, CachedEmbeddings
+
+    # Identical chunk texts and repeated queries are embedded once (embedding_cache.py)
+    return CachedEmbeddings(embeddings, embeddings.model_id) if EMBEDDING_CACHE else embeddings
+
+
+def _build_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(model=LLM_MODEL_NAME, google_api_key=os.getenv("GEMINI_API_KEY"))
+
+
+def _build_whisper():
+    # Whisper models live in the transcription pool's worker processes, not here
+    from transcribe_pool import get_transcribe_executor, warm_transcribe_workers
+
+    executor = get_transcribe_executor()
+    warm_transcribe_workers()
+    return executor
+
+
+def _build_ocr():
+    from ocr_pool import get_ocr_executor, warm_ocr_workers
+
+    executor = get_ocr_executor()
+    warm_ocr_workers()
+    return executor
+
+
+registry.register("embeddings", _build_embeddings)
+registry.register("llm", _build_llm)
+registry.register("whisper", _build_whisper)
+registry.register("ocr", _build_ocr)
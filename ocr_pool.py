@@ -0,0 +1,227 @@
+"""OCR subsystem for scanned PDF pages and image uploads.
+
+OCR runs in a pool of worker processes, each holding its own EasyOCR reader
+(the reader is not safe to share between threads). Pages are rasterised
+inside the workers, downscaled and cropped to the inked region before
+recognition, and processed in batches so a PDF is opened once per batch.
+Results are cached on disk keyed by the hash of the preprocessed page image,
+so re-uploading the same scan skips recognition entirely.
+
+An extraction sandbox worker (extract_sandbox.py) installs a delegate with
+set_ocr_delegate(): its OCR requests go back to the app process and run on
+this shared pool, instead of serially in the sandbox or in a nested pool that
+a kill would leave orphaned. OCR_IN_PROCESS=true runs OCR in the calling
+process (e.g. when debugging).
+"""
+
+import concurrent.futures
+import hashlib
+import multiprocessing
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+OCR_LANGUAGES = os.getenv("OCR_LANGUAGES", "en").split(",")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+OCR_DPI = int(os.getenv("OCR_DPI", 200))  # Enough for body text; higher mostly costs time
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", 2200))
+OCR_BATCH_SIZE = int(os.getenv("OCR_BATCH_SIZE", 4))
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "data/ocr_cache")
+OCR_IN_PROCESS = os.getenv("OCR_IN_PROCESS", "false").lower() == "true"
+
+# Pixels darker than this count as ink when looking for the text region
+INK_THRESHOLD = 200
+CROP_MARGIN = 12
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Per-process reader, created by the pool initializer
+_reader = None
+
+# When set, called as delegate(name, *args) for "ocr_pdf_pages" / "ocr_image" instead of running OCR here
+_delegate: Optional[Callable[..., Any]] = None
+
+
+def set_ocr_delegate(delegate: Optional[Callable[..., Any]]):
+    global _delegate
+    _delegate = delegate
+
+
+def _init_worker(languages: List[str]):
+    """Load one EasyOCR reader per worker process"""
+    global _reader
+    import easyocr
+
+    _reader = easyocr.Reader(languages, gpu=False, verbose=False)
+
+
+def get_ocr_executor() -> concurrent.futures.ProcessPoolExecutor:
+    """Return the shared OCR process pool, creating it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn avoids forking a parent that already holds torch/thread state
+            _executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=OCR_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(OCR_LANGUAGES,)
+            )
+            print(f"✅ OCR pool started with {OCR_WORKERS} workers")
+        return _executor
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def warm_ocr_workers():
+    """Start every worker now so readers are loaded before the first scan arrives"""
+    executor = get_ocr_executor()
+    futures = [executor.submit(_ping) for _ in range(OCR_WORKERS)]
+    for future in futures:
+        future.result()
+
+
+def shutdown_ocr_executor():
+    """Stop the OCR worker processes"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def preprocess_image(img):
+    """Convert to grayscale, crop to the inked region and downscale large pages"""
+    import numpy as np
+    from PIL import Image
+
+    img = img.convert("L")
+    pixels = np.asarray(img)
+
+    # Crop away blank margins so the detector scans less empty paper
+    ink_rows = np.where((pixels < INK_THRESHOLD).any(axis=1))[0]
+    ink_cols = np.where((pixels < INK_THRESHOLD).any(axis=0))[0]
+    if ink_rows.size == 0 or ink_cols.size == 0:
+        return None
+
+    top = max(int(ink_rows[0]) - CROP_MARGIN, 0)
+    bottom = min(int(ink_rows[-1]) + CROP_MARGIN, pixels.shape[0])
+    left = max(int(ink_cols[0]) - CROP_MARGIN, 0)
+    right = min(int(ink_cols[-1]) + CROP_MARGIN, pixels.shape[1])
+    img = img.crop((left, top, right, bottom))
+
+    longest = max(img.size)
+    if longest > OCR_MAX_SIDE:
+        scale = OCR_MAX_SIDE / longest
+        img = img.resize((int(img.width * scale), int(img.height * scale)), Image.LANCZOS)
+
+    return img
+
+
+def image_hash(img) -> str:
+    """Hash of the preprocessed image, used as the OCR cache key"""
+    digest = hashlib.sha256()
+    digest.update(f"{img.width}x{img.height}:{','.join(OCR_LANGUAGES)}".encode())
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(OCR_CACHE_DIR, key[:2], f"{key}.txt")
+
+
+def read_cached_text(key: str) -> Optional[str]:
+    """Return cached OCR text for an image hash, if present"""
+    path = _cache_path(key)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    return None
+
+
+def write_cached_text(key: str, text: str):
+    """Store OCR text for an image hash (atomic rename, safe across workers)"""
+    path = _cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _recognize(img) -> str:
+    """OCR a preprocessed image, consulting the page cache first"""
+    import numpy as np
+
+    key = image_hash(img)
+    cached = read_cached_text(key)
+    if cached is not None:
+        return cached
+
+    results = _reader.readtext(np.asarray(img), detail=0, paragraph=True)
+    text = "\n".join(results).strip()
+    write_cached_text(key, text)
+    return text
+
+
+def _ocr_pdf_batch(file_path: str, page_numbers: List[int]) -> Dict[int, str]:
+    """Worker task: rasterise and OCR a batch of PDF pages (0-based numbers)"""
+    import pdfplumber
+
+    texts = {}
+    with pdfplumber.open(file_path) as pdf:
+        for page_num in page_numbers:
+            try:
+                page_image = pdf.pages[page_num].to_image(resolution=OCR_DPI).original
+                img = preprocess_image(page_image)
+                texts[page_num] = _recognize(img) if img is not None else ""
+            except Exception as e:
+                print(f"❗ OCR failed for page {page_num + 1}: {e}")
+                texts[page_num] = ""
+    return texts
+
+
+def _ocr_image_file(file_path: str) -> str:
+    """Worker task: OCR a single image file"""
+    from PIL import Image
+
+    with Image.open(file_path) as img:
+        img = preprocess_image(img)
+        return _recognize(img) if img is not None else ""
+
+
+def ocr_pdf_pages(file_path: str, page_numbers: List[int]) -> Dict[int, str]:
+    """OCR the given PDF pages in parallel batches; returns {page_num: text}"""
+    if not page_numbers:
+        return {}
+
+    if _delegate is not None:
+        return _delegate("ocr_pdf_pages", file_path, page_numbers)
+    if OCR_IN_PROCESS:
+        if _reader is None:
+            _init_worker(OCR_LANGUAGES)
+        return _ocr_pdf_batch(file_path, page_numbers)
+
+    executor = get_ocr_executor()
+    batches = [page_numbers[i:i + OCR_BATCH_SIZE] for i in range(0, len(page_numbers), OCR_BATCH_SIZE)]
+    print(f"🔍 OCR for {len(page_numbers)} pages in {len(batches)} batches")
+
+    texts = {}
+    futures = [executor.submit(_ocr_pdf_batch, file_path, batch) for batch in batches]
+    for future in concurrent.futures.as_completed(futures):
+        texts.update(future.result())
+    return texts
+
+
+def ocr_image(file_path: str) -> str:
+    """OCR an image file in the worker pool"""
+    if _delegate is not None:
+        return _delegate("ocr_image", file_path)
+    if OCR_IN_PROCESS:
+        if _reader is None:
+            _init_worker(OCR_LANGUAGES)
+        return _ocr_image_file(file_path)
+    return get_ocr_executor().submit(_ocr_image_file, file_path).result()
@@ -0,0 +1,368 @@
+"""Streaming text extraction for DOCX, PPTX and EPUB.
+
+All three formats are zip archives of XML. Instead of building a full object
+model (python-docx) the relevant parts are streamed with ElementTree.iterparse
+and every element is cleared as soon as its text has been taken, so memory
+follows the largest paragraph / table / slide rather than the document.
+
+Covered: body paragraphs (headings become markdown "#" lines), tables (one
+" | "-joined line per row), slide text and speaker notes, and EPUB chapters in
+spine order. Each extractor also returns sections with character offsets into
+the text, so callers can map chunks back to a heading, slide or chapter.
+"""
+
+import posixpath
+import re
+import zipfile
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
+from xml.etree import ElementTree
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+A_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+OPF_NS = "http://www.idpf.org/2007/opf"
+CONTAINER_NS = "urn:oasis:names:tc:opendocument:xmlns:container"
+
+OFFICE_EXTENSIONS = ("docx", "pptx", "epub")
+
+Source = Union[str, bytes, BinaryIO]
+
+
+@dataclass
+class Section:
+    kind: str  # heading | slide | notes | chapter
+    title: str
+    start: int  # Character offsets into ExtractedDocument.text
+    end: int
+
+
+@dataclass
+class ExtractedDocument:
+    text: str
+    sections: List[Section] = field(default_factory=list)
+
+
+class _TextBuilder:
+    """Accumulates blocks and section offsets without repeated string concatenation"""
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.length = 0
+        self.sections: List[Section] = []
+
+    def add(self, block: str):
+        block = block.strip()
+        if not block:
+            return
+        if self.parts:
+            self.parts.append("\n\n")
+            self.length += 2
+        self.parts.append(block)
+        self.length += len(block)
+
+    def start_section(self, kind: str, title: str):
+        self.close_section()
+        offset = self.length + (2 if self.parts else 0)
+        self.sections.append(Section(kind=kind, title=title, start=offset, end=offset))
+
+    def close_section(self):
+        if self.sections:
+            self.sections[-1].end = max(self.length, self.sections[-1].start)
+
+    def build(self) -> ExtractedDocument:
+        self.close_section()
+        return ExtractedDocument(text="".join(self.parts), sections=self.sections)
+
+
+def _open_zip(source: Source) -> zipfile.ZipFile:
+    if isinstance(source, bytes):
+        from io import BytesIO
+        source = BytesIO(source)
+    return zipfile.ZipFile(source)
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def _collapse(text: str) -> str:
+    return re.sub(r"[ \t\r\f\v]+", " ", text).strip()
+
+
+def _read_relationships(archive: zipfile.ZipFile, part: str) -> dict:
+    """Relationship id -> (type, absolute part name) for an OOXML part"""
+    directory, name = posixpath.split(part)
+    rels_path = posixpath.join(directory, "_rels", f"{name}.rels")
+    if rels_path not in archive.namelist():
+        return {}
+    relationships = {}
+    with archive.open(rels_path) as f:
+        for rel in ElementTree.parse(f).getroot():
+            target = rel.get("Target", "")
+            if rel.get("TargetMode") == "External":
+                continue
+            resolved = posixpath.normpath(posixpath.join(directory, target)) if not target.startswith("/") else target[1:]
+            relationships[rel.get("Id")] = (rel.get("Type", ""), resolved)
+    return relationships
+
+
+# DOCX
+
+def _docx_paragraph(element) -> Tuple[str, Optional[int]]:
+    """Text of a w:p and its heading level (None for body text)"""
+    pieces = []
+    level = None
+    for node in element.iter():
+        tag = _local(node.tag)
+        if tag == "t":
+            pieces.append(node.text or "")
+        elif tag == "tab":
+            pieces.append("\t")
+        elif tag in ("br", "cr"):
+            pieces.append("\n")
+        elif tag == "pStyle":
+            style = node.get(f"{{{W_NS}}}val", "")
+            match = re.match(r"(?i)heading\s*(\d)", style)
+            if match:
+                level = int(match.group(1))
+            elif style.lower() == "title":
+                level = 1
+        elif tag == "outlineLvl" and level is None:
+            level = int(node.get(f"{{{W_NS}}}val", "0")) + 1
+    return _collapse("".join(pieces)), level
+
+
+def _docx_table(element) -> str:
+    rows = []
+    for row in element.iter(f"{{{W_NS}}}tr"):
+        cells = []
+        for cell in row.iter(f"{{{W_NS}}}tc"):
+            cell_text = " ".join(
+                text for text, _ in (_docx_paragraph(p) for p in cell.iter(f"{{{W_NS}}}p")) if text
+            )
+            cells.append(cell_text)
+        if any(cells):
+            rows.append(" | ".join(cells))
+    return "\n".join(rows)
+
+
+def extract_docx(source: Source) -> ExtractedDocument:
+    """Body paragraphs, headings and tables of a .docx, in document order"""
+    builder = _TextBuilder()
+    with _open_zip(source) as archive, archive.open("word/document.xml") as f:
+        body = None
+        depth = 0  # Tables and text boxes being parsed: only top-level p/tbl are emitted
+        for event, element in ElementTree.iterparse(f, events=("start", "end")):
+            tag = _local(element.tag)
+            if event == "start":
+                if tag == "body":
+                    body = element
+                elif tag in ("tbl", "txbxContent"):
+                    depth += 1
+                continue
+
+            if tag == "txbxContent":
+                depth -= 1  # Text box content is emitted with its enclosing paragraph
+            elif tag == "tbl":
+                depth -= 1
+                if depth == 0 and body is not None:
+                    builder.add(_docx_table(element))
+                    body.clear()
+            elif tag == "p" and depth == 0 and body is not None:
+                text, level = _docx_paragraph(element)
+                if level and text:
+                    builder.start_section("heading", text)
+                    builder.add(f"{'#' * min(level, 6)} {text}")
+                else:
+                    builder.add(text)
+                # Everything parsed so far has been emitted; drop it to keep memory flat
+                body.clear()
+    return builder.build()
+
+
+# PPTX
+
+def _slide_parts(archive: zipfile.ZipFile) -> List[str]:
+    """Slide part names in presentation order"""
+    relationships = _read_relationships(archive, "ppt/presentation.xml")
+    order = []
+    with archive.open("ppt/presentation.xml") as f:
+        for _, element in ElementTree.iterparse(f):
+            if _local(element.tag) == "sldId":
+                rel_id = element.get(f"{{{R_NS}}}id")
+                if rel_id in relationships:
+                    order.append(relationships[rel_id][1])
+    if order:
+        return order
+    slides = [name for name in archive.namelist() if re.match(r"ppt/slides/slide\d+\.xml$", name)]
+    return sorted(slides, key=lambda name: int(re.search(r"(\d+)", name.rsplit("/", 1)[-1]).group(1)))
+
+
+def _iter_shapes(archive: zipfile.ZipFile, part: str) -> Iterator[Tuple[str, str]]:
+    """Yield (placeholder type, text) per shape or table in a slide/notes part"""
+    with archive.open(part) as f:
+        placeholder = ""
+        paragraphs: List[str] = []
+        pieces: List[str] = []
+        in_table = 0
+        for event, element in ElementTree.iterparse(f, events=("start", "end")):
+            tag = _local(element.tag)
+            if event == "start":
+                if tag == "sp":
+                    placeholder, paragraphs = "", []
+                elif tag == "tbl":
+                    in_table += 1
+                elif tag == "ph":
+                    placeholder = element.get("type", "body")
+                continue
+
+            if tag == "t":
+                pieces.append(element.text or "")
+            elif tag == "br":
+                pieces.append("\n")
+            elif tag == "p" and element.tag == f"{{{A_NS}}}p":
+                if in_table:
+                    pieces.append(" ")
+                else:
+                    paragraphs.append(_collapse("".join(pieces)))
+                    pieces = []
+            elif tag == "tc":
+                pieces.append(" | ")
+            elif tag == "tr":
+                row = _collapse("".join(pieces)).strip(" |")
+                if row:
+                    paragraphs.append(row)
+                pieces = []
+            elif tag == "tbl":
+                in_table -= 1
+            elif tag in ("sp", "graphicFrame"):
+                text = "\n".join(p for p in paragraphs if p)
+                if text:
+                    yield placeholder, text
+                placeholder, paragraphs, pieces = "", [], []
+                element.clear()
+
+
+def extract_pptx(source: Source) -> ExtractedDocument:
+    """Slide titles, body text, tables and speaker notes of a .pptx"""
+    builder = _TextBuilder()
+    with _open_zip(source) as archive:
+        for number, part in enumerate(_slide_parts(archive), start=1):
+            title = ""
+            body = []
+            for placeholder, text in _iter_shapes(archive, part):
+                if placeholder in ("title", "ctrTitle") and not title:
+                    title = " ".join(text.split())
+                elif placeholder not in ("sldNum", "dt", "ftr"):
+                    body.append(text)
+
+            heading = f"## Slide {number}: {title}" if title else f"## Slide {number}"
+            builder.start_section("slide", title or f"Slide {number}")
+            builder.add(heading)
+            for text in body:
+                builder.add(text)
+
+            notes_parts = [target for rel_type, target in _read_relationships(archive, part).values()
+                           if rel_type.endswith("/notesSlide")]
+            notes = [text for notes_part in notes_parts
+                     for placeholder, text in _iter_shapes(archive, notes_part)
+                     if placeholder not in ("sldImg", "sldNum", "hdr", "ftr", "dt")]
+            if notes:
+                builder.start_section("notes", f"Notes for slide {number}")
+                builder.add("Notes: " + "\n".join(notes))
+    return builder.build()
+
+
+# EPUB
+
+XHTML_HEADINGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+XHTML_BLOCKS = {"p", "li", "blockquote", "pre", "dt", "dd", "figcaption", "caption", "tr"}
+
+
+def _epub_spine(archive: zipfile.ZipFile) -> List[str]:
+    """Content document paths in reading order"""
+    with archive.open("META-INF/container.xml") as f:
+        rootfile = ElementTree.parse(f).getroot().find(f".//{{{CONTAINER_NS}}}rootfile")
+    opf_path = rootfile.get("full-path")
+    opf_dir = posixpath.dirname(opf_path)
+
+    with archive.open(opf_path) as f:
+        package = ElementTree.parse(f).getroot()
+    manifest = {
+        item.get("id"): posixpath.normpath(posixpath.join(opf_dir, item.get("href", "")))
+        for item in package.iter(f"{{{OPF_NS}}}item")
+    }
+    return [manifest[ref.get("idref")] for ref in package.iter(f"{{{OPF_NS}}}itemref") if ref.get("idref") in manifest]
+
+
+def _epub_chapter_blocks(archive: zipfile.ZipFile, part: str) -> List[str]:
+    """Rendered blocks of one XHTML content document"""
+    blocks = []
+    depth = 0  # Depth inside an emitted block; nested blocks are part of the outer one
+    try:
+        with archive.open(part) as f:
+            for event, element in ElementTree.iterparse(f, events=("start", "end")):
+                tag = _local(element.tag).lower()
+                if tag not in XHTML_HEADINGS and tag not in XHTML_BLOCKS and tag != "table":
+                    continue
+                if event == "start":
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth > 0:
+                    continue
+                if tag in XHTML_HEADINGS:
+                    text = _collapse("".join(element.itertext()))
+                    if text:
+                        blocks.append(f"{'#' * XHTML_HEADINGS[tag]} {text}")
+                elif tag == "table":
+                    rows = [" | ".join(_collapse("".join(cell.itertext())) for cell in row
+                                       if _local(cell.tag).lower() in ("td", "th"))
+                            for row in element.iter() if _local(row.tag).lower() == "tr"]
+                    blocks.append("\n".join(row for row in rows if row.strip(" |")))
+                elif tag == "pre":
+                    blocks.append("".join(element.itertext()).strip("\n"))
+                else:
+                    prefix = "- " if tag == "li" else ""
+                    text = _collapse("".join(element.itertext()))
+                    if text:
+                        blocks.append(prefix + text)
+                element.clear()
+    except ElementTree.ParseError:
+        # Not well-formed XHTML: fall back to the tolerant HTML extractor for this chapter
+        from html_extract import html_to_text
+
+        with archive.open(part) as raw:
+            blocks = [html_to_text(raw.read().decode("utf-8", errors="replace"))]
+    return blocks
+
+
+def extract_epub(source: Source) -> ExtractedDocument:
+    """Chapters of an .epub in spine order"""
+    builder = _TextBuilder()
+    with _open_zip(source) as archive:
+        for number, part in enumerate(_epub_spine(archive), start=1):
+            if part not in archive.namelist():
+                continue
+            builder.start_section("chapter", f"Chapter {number}")
+            for block in _epub_chapter_blocks(archive, part):
+                if block.startswith("#") and builder.sections[-1].title == f"Chapter {number}":
+                    builder.sections[-1].title = block.lstrip("# ")
+                builder.add(block)
+    return builder.build()
+
+
+EXTRACTORS = {
+    "docx": extract_docx,
+    "pptx": extract_pptx,
+    "epub": extract_epub,
+}
+
+
+def extract_office_document(source: Source, extension: str) -> ExtractedDocument:
+    """Dispatch on the file extension (without the dot)"""
+    extension = extension.lower().lstrip(".")
+    if extension not in EXTRACTORS:
+        raise ValueError(f"Unsupported file format: {extension}")
+    return EXTRACTORS[extension](source)
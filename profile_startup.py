@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Import-time profile report for the application.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and
+summarises where startup time goes, then (optionally) times each model in the
+registry so lazy-load costs are visible too.
+
+Usage:
+    python profile_startup.py                 # import profile only
+    python profile_startup.py --top 40        # show more modules
+    python profile_startup.py --models        # also time model loads
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+
+def run_importtime(module: str):
+    """Import the module in a fresh interpreter and return parsed -X importtime rows"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    wall_seconds = time.perf_counter() - started
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # Header line
+        self_us, cumulative_us, name = parts
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+
+    return rows, wall_seconds, result
+
+
+def print_import_report(module: str, top: int):
+    rows, wall_seconds, result = run_importtime(module)
+
+    print("=" * 60)
+    print(f"📊 Import profile for '{module}' (wall {wall_seconds:.2f}s)")
+    print("=" * 60)
+
+    if result.returncode != 0:
+        # Still useful: the profile shows everything imported before the failure
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        print(f"⚠️ Import failed (exit {result.returncode}): {errors[-1] if errors else 'unknown error'}")
+
+    if not rows:
+        print("No import timings captured.")
+        return
+
+    print(f"\nTop {top} modules by cumulative time:")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda r: r[1], reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {name.strip()}")
+
+    print(f"\nTop {top} modules by self time:")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda r: r[0], reverse=True)[:top]:
+        print(f"  {self_us / 1000:9.1f} ms  {name.strip()}")
+
+    # Group self time by top-level package to show which dependency dominates
+    packages = {}
+    for self_us, _, name in rows:
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+
+    print(f"\nSelf time by package (top {top}):")
+    for package, total_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {total_us / 1000:9.1f} ms  {package}")
+
+    total_ms = sum(r[0] for r in rows) / 1000
+    print(f"\nTotal import time: {total_ms:.1f} ms across {len(rows)} modules")
+
+
+def print_model_report():
+    from model_registry import registry
+
+    print("\n" + "=" * 60)
+    print("⏳ Model load times (lazy registry)")
+    print("=" * 60)
+    for name in registry.status():
+        try:
+            registry.get(name)
+        except Exception as e:
+            print(f"  {name:12s} failed: {e}")
+    for name, info in registry.status().items():
+        if info["state"] == "ready":
+            print(f"  {name:12s} {info['load_seconds']:7.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show where application startup time goes")
+    parser.add_argument("--module", default="main", help="Module to import (default: main)")
+    parser.add_argument("--top", type=int, default=25, help="Rows per section")
+    parser.add_argument("--models", action="store_true", help="Also load and time every registered model")
+    args = parser.parse_args()
+
+    print_import_report(args.module, args.top)
+    if args.models:
+        print_model_report()
+
+
+if __name__ == "__main__":
+    main()
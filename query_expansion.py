@@ -0,0 +1,168 @@
+"""Query expansion that stays off the retrieval critical path.
+
+hybrid_search used to ask Gemini to "expand this search query" before doing
+any retrieval. That put a full LLM round trip in front of every chat message,
+and the verbose answer was then embedded and used as the BM25 query in place
+of what the user actually typed. Now retrieval always runs on the raw query,
+and expansion only adds an extra BM25 list that is fused with a lower weight
+(EXPANSION_WEIGHT). QUERY_EXPANSION picks the expander:
+
+- "prf" (default): pseudo-relevance feedback. The PRF_TERMS most
+  characteristic terms (frequency x idf) of the top PRF_DOCS BM25 hits for
+  the raw query are added to it. This runs locally in well under a millisecond
+  on top of the BM25 search that already happened.
+- "llm": the LLM proposes related keywords. Answers are kept in an LRU cache
+  of QUERY_EXPANSION_CACHE_SIZE queries. On a miss the call runs in the
+  background while retrieval proceeds, and is used only if it arrives within
+  QUERY_EXPANSION_WAIT_SECONDS (default 0: it only helps the next time the
+  question is asked).
+- "none": raw query only.
+"""
+
+import math
+import os
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from bm25_index import SegmentedBM25Index, tokenize
+
+QUERY_EXPANSION = os.getenv("QUERY_EXPANSION", "prf").lower()
+EXPANSION_WEIGHT = float(os.getenv("EXPANSION_WEIGHT", 0.2))
+PRF_DOCS = int(os.getenv("PRF_DOCS", 5))
+PRF_TERMS = int(os.getenv("PRF_TERMS", 8))
+QUERY_EXPANSION_WAIT_SECONDS = float(os.getenv("QUERY_EXPANSION_WAIT_SECONDS", 0))
+QUERY_EXPANSION_CACHE_SIZE = int(os.getenv("QUERY_EXPANSION_CACHE_SIZE", 512))
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her here
+hers him his how i if in into is it its itself just me more most my no nor not now of off on once only or other
+our ours out over own same she should so some such than that the their them then there these they this those
+through to too under until up very was we were what when where which while who whom why will with would you
+your yours
+""".split())
+
+# Feedback terms must appear in at least this many of the feedback documents
+PRF_MIN_DOCS = 2
+
+
+def prf_terms(query: str, feedback_texts: Sequence[str], index: SegmentedBM25Index,
+              limit: int = PRF_TERMS) -> List[str]:
+    """Terms that characterize the top-ranked documents for a query, excluding the query's own terms"""
+    query_terms = set(tokenize(query))
+    frequencies: Counter = Counter()
+    documents: Counter = Counter()
+    for text in feedback_texts:
+        tokens = [token for token in tokenize(text)
+                  if token not in query_terms and token not in STOPWORDS and len(token) > 2 and not token.isdigit()]
+        frequencies.update(tokens)
+        documents.update(set(tokens))
+
+    needed = min(PRF_MIN_DOCS, len(feedback_texts))
+    candidates = [term for term, count in documents.items() if count >= needed]
+    df = index.document_frequencies(candidates)
+    corpus_size = max(index.corpus_size, 1)
+    weights = {term: frequencies[term] * math.log(1 + corpus_size / (df.get(term, 0) + 1)) for term in candidates}
+    return sorted(weights, key=weights.get, reverse=True)[:limit]
+
+
+class ExpansionCache:
+    """LRU cache of LLM keyword expansions, filled by background calls"""
+
+    def __init__(self, size: int = QUERY_EXPANSION_CACHE_SIZE):
+        self.size = size
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="query-expansion")
+        self.stats = {"hits": 0, "misses": 0, "errors": 0}
+
+    @staticmethod
+    def _key(query: str) -> str:
+        return " ".join(tokenize(query))
+
+    def get_or_start(self, query: str) -> Tuple[Optional[str], Optional[Future]]:
+        """(cached expansion, None) on a hit; (None, future of the background call) on a miss"""
+        key = self._key(query)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._entries[key], None
+            self.stats["misses"] += 1
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = self._executor.submit(self._expand, key, query)
+            return None, future
+
+    def _expand(self, key: str, query: str) -> str:
+        from model_registry import get_model
+
+        try:
+            response = get_model("llm").invoke(
+                f"List up to {PRF_TERMS} search keywords or synonyms related to this question, "
+                f"comma-separated, no explanations: '{query}'"
+            )
+            text = response.content if hasattr(response, "content") else str(response)
+            expansion = " ".join(term.strip() for term in text.replace("\n", ",").split(",") if term.strip())
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"⚠️ Query expansion failed: {e}")
+            with self._lock:
+                self._pending.pop(key, None)  # Not cached, so the next lookup retries
+            return ""
+        with self._lock:
+            self._pending.pop(key, None)
+            self._entries[key] = expansion
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return expansion
+
+
+_llm_cache: Optional[ExpansionCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_expansion_cache() -> ExpansionCache:
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = ExpansionCache()
+        return _llm_cache
+
+
+class PendingExpansion:
+    """Expansion for one query, started before retrieval and collected after it"""
+
+    def __init__(self, query: str, mode: str = QUERY_EXPANSION):
+        self.query = query
+        self.mode = mode
+        self._cached: Optional[str] = None
+        self._future: Optional[Future] = None
+        if mode == "llm":
+            self._cached, self._future = get_expansion_cache().get_or_start(query)
+
+    def terms(self, bm25_hits: Sequence[Tuple[str, float]], text_for: Callable[[str], Optional[str]],
+              index: SegmentedBM25Index) -> Optional[str]:
+        """Expansion terms to add to the raw query, or None"""
+        if self.mode == "prf":
+            texts = [text for text in (text_for(doc_id) for doc_id, _ in bm25_hits[:PRF_DOCS]) if text]
+            expansion = prf_terms(self.query, texts, index) if texts else []
+            return " ".join(expansion) or None
+        if self.mode == "llm":
+            if self._cached is not None:
+                return self._cached or None
+            if self._future is not None and QUERY_EXPANSION_WAIT_SECONDS > 0:
+                try:
+                    return self._future.result(timeout=QUERY_EXPANSION_WAIT_SECONDS) or None
+                except FutureTimeout:
+                    return None
+        return None
+
+
+def start_expansion(query: str) -> PendingExpansion:
+    return PendingExpansion(query)
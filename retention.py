@@ -0,0 +1,261 @@
+"""Per-document retention of the tenant shards: TTL, storage budgets and last access.
+
+clear_vector_store slept for an hour and then deleted every index and reset
+the globals: users lost their corpus mid-session, and the next upload paid the
+full cold start. Instead, every source (file or URL) indexed into a tenant
+shard has a row in indexed_documents with its size, when it was indexed and
+when an answer last used it. A background sweeper evicts documents:
+
+- not used for DOC_TTL_HOURS (counted from indexing if never used)
+- least recently used first, while a tenant holds more than TENANT_STORAGE_MB
+- least recently used first across tenants, while all shards together hold
+  more than TOTAL_STORAGE_MB
+
+A limit of 0 disables it. touch() records access in memory; the sweeper
+writes it every RETENTION_INTERVAL_SECONDS, so chat requests do not wait on
+the database.
+
+Evicting a document tombstones its chunks in the shard's vector index (chunk
+id -> row map, deleted.txt) and BM25 index, as undoing a failed ingestion
+does. Marking ids only holds the shard's locks briefly, so searches keep
+running. The rows themselves are dropped by vector compaction and BM25
+segment merges in their own threads. A sweep evicts at most RETENTION_BATCH
+documents before it looks again. Every app worker sweeps: a worker claims a
+document by deleting its row only if its last access has not changed.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from database import IndexedDocument, SessionLocal
+from tenant_shards import tenant_shards
+
+DOC_TTL_HOURS = float(os.getenv("DOC_TTL_HOURS", 72))
+TENANT_STORAGE_MB = int(os.getenv("TENANT_STORAGE_MB", 500))
+TOTAL_STORAGE_MB = int(os.getenv("TOTAL_STORAGE_MB", 0))
+RETENTION_INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", 60))
+RETENTION_BATCH = int(os.getenv("RETENTION_BATCH", 50))
+
+# (tenant, source) -> last access not yet written to indexed_documents
+_touched: Dict[Tuple[str, str], datetime] = {}
+_touched_lock = threading.Lock()
+
+stats = {"sweeps": 0, "evicted_documents": 0, "evicted_chunks": 0, "evicted_bytes": 0}
+
+
+def _row(document: IndexedDocument, reason: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "id": document.id,
+        "tenant": document.tenant,
+        "source": document.source,
+        "chunks": document.chunks,
+        "size_bytes": document.size_bytes,
+        "indexed_at": document.indexed_at,
+        "last_accessed_at": document.last_accessed_at,
+        "reason": reason
+    }
+
+
+def record_indexed(tenant: str, source: str, chunks: int, size_bytes: int):
+    """Count a source's newly indexed chunks towards its tenant (after they are committed)"""
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        for _ in range(2):
+            updated = db.query(IndexedDocument).filter(
+                IndexedDocument.tenant == tenant,
+                IndexedDocument.source == source
+            ).update({
+                IndexedDocument.chunks: IndexedDocument.chunks + chunks,
+                IndexedDocument.size_bytes: IndexedDocument.size_bytes + size_bytes,
+                IndexedDocument.indexed_at: now,
+                IndexedDocument.last_accessed_at: now
+            }, synchronize_session=False)
+            if updated:
+                db.commit()
+                return
+            db.add(IndexedDocument(tenant=tenant, source=source, chunks=chunks, size_bytes=size_bytes,
+                                   indexed_at=now, last_accessed_at=now))
+            try:
+                db.commit()
+                return
+            except IntegrityError:
+                # Another worker recorded the same source first - add to its row instead
+                db.rollback()
+
+
+def touch(tenants: Iterable[str], sources: Iterable[str]):
+    """Note that an answer used these sources (looked up in each of the searched tenants)"""
+    now = datetime.utcnow()
+    sources = set(sources)
+    with _touched_lock:
+        for tenant in tenants:
+            for source in sources:
+                _touched[(tenant, source)] = now
+
+
+def flush_touches() -> int:
+    global _touched
+    with _touched_lock:
+        touched, _touched = _touched, {}
+    if not touched:
+        return 0
+    with SessionLocal() as db:
+        for (tenant, source), accessed_at in touched.items():
+            db.query(IndexedDocument).filter(
+                IndexedDocument.tenant == tenant,
+                IndexedDocument.source == source,
+                IndexedDocument.last_accessed_at < accessed_at
+            ).update({IndexedDocument.last_accessed_at: accessed_at}, synchronize_session=False)
+        db.commit()
+    return len(touched)
+
+
+def eviction_candidates(limit: int = RETENTION_BATCH) -> List[Dict[str, Any]]:
+    """Up to limit documents to evict now: expired ones, then the least recently used of budgets that are exceeded"""
+    chosen: Dict[int, Dict[str, Any]] = {}
+
+    def take(query, reason: str, excess: float = float("inf")):
+        for document in query.order_by(IndexedDocument.last_accessed_at).yield_per(100):
+            if excess <= 0 or len(chosen) >= limit:
+                return
+            if document.id not in chosen:
+                chosen[document.id] = _row(document, reason)
+                excess -= document.size_bytes
+
+    def chosen_bytes(tenant: Optional[str] = None) -> int:
+        return sum(row["size_bytes"] for row in chosen.values() if tenant is None or row["tenant"] == tenant)
+
+    with SessionLocal() as db:
+        if DOC_TTL_HOURS > 0:
+            cutoff = datetime.utcnow() - timedelta(hours=DOC_TTL_HOURS)
+            take(db.query(IndexedDocument).filter(IndexedDocument.last_accessed_at < cutoff), "expired")
+
+        if TENANT_STORAGE_MB > 0:
+            budget = TENANT_STORAGE_MB * 2 ** 20
+            over = db.query(IndexedDocument.tenant, func.sum(IndexedDocument.size_bytes)) \
+                .group_by(IndexedDocument.tenant).having(func.sum(IndexedDocument.size_bytes) > budget).all()
+            for tenant, total in over:
+                take(db.query(IndexedDocument).filter(IndexedDocument.tenant == tenant), "tenant_budget",
+                     total - budget - chosen_bytes(tenant))
+
+        if TOTAL_STORAGE_MB > 0:
+            budget = TOTAL_STORAGE_MB * 2 ** 20
+            total = db.query(func.sum(IndexedDocument.size_bytes)).scalar() or 0
+            if total > budget:
+                take(db.query(IndexedDocument), "total_budget", total - budget - chosen_bytes())
+
+    return list(chosen.values())
+
+
+def _claim(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The documents whose rows this worker deleted (none touched or claimed by another worker meanwhile)"""
+    claimed = []
+    with SessionLocal() as db:
+        for document in documents:
+            deleted = db.query(IndexedDocument).filter(
+                IndexedDocument.id == document["id"],
+                IndexedDocument.last_accessed_at == document["last_accessed_at"]
+            ).delete(synchronize_session=False)
+            db.commit()
+            if deleted == 1:
+                claimed.append(document)
+    return claimed
+
+
+def evict(documents: List[Dict[str, Any]]) -> int:
+    """Remove the documents' chunks from their tenants' shards; returns how many documents were evicted"""
+    by_tenant: Dict[str, List[Dict[str, Any]]] = {}
+    for document in _claim(documents):
+        by_tenant.setdefault(document["tenant"], []).append(document)
+
+    for tenant, evicted in by_tenant.items():
+        # Chunks of the same source indexed after the row was last updated belong to a newer upload
+        cutoffs = {document["source"]: document["indexed_at"].replace(tzinfo=timezone.utc).timestamp()
+                   for document in evicted}
+        try:
+            with tenant_shards.use([tenant]) as (shard,):
+                ids = [doc_id for doc_id, doc in list(shard.documents.items())
+                       if doc.metadata.get("source") in cutoffs
+                       and doc.metadata.get("timestamp", 0) <= cutoffs[doc.metadata["source"]]]
+                removed = shard.delete(ids)
+                with shard.lock:
+                    shard.commit()
+        except Exception as e:
+            # Keep the rows so the chunks are not left behind untracked; they are evicted on a later sweep
+            print(f"⚠️ Could not evict documents from {tenant}: {e}")
+            for document in evicted:
+                record_indexed(tenant, document["source"], document["chunks"], document["size_bytes"])
+            evicted.clear()
+            continue
+
+        size = sum(document["size_bytes"] for document in evicted)
+        stats["evicted_documents"] += len(evicted)
+        stats["evicted_chunks"] += removed
+        stats["evicted_bytes"] += size
+        reasons = sorted({document["reason"] for document in evicted})
+        print(f"🗑️ Evicted {len(evicted)} documents ({removed} chunks, {size / 2 ** 20:.1f} MB) from {tenant} "
+              f"({', '.join(reasons)})")
+    return sum(len(evicted) for evicted in by_tenant.values())
+
+
+def sweep() -> int:
+    """Write pending access times, then evict until nothing is expired or over budget; returns documents evicted"""
+    flush_touches()
+    total = 0
+    while True:
+        candidates = eviction_candidates()
+        if not candidates:
+            break
+        evicted = evict(candidates)
+        total += evicted
+        if not evicted:
+            break  # Everything was claimed or touched by another worker; look again next sweep
+    stats["sweeps"] += 1
+    return total
+
+
+def _sweep_loop():
+    while True:
+        time.sleep(RETENTION_INTERVAL_SECONDS)
+        try:
+            sweep()
+        except Exception as e:
+            print(f"⚠️ Retention sweep failed: {e}")
+
+
+def start_retention():
+    threading.Thread(target=_sweep_loop, name="retention-sweeper", daemon=True).start()
+    limits = [f"TTL {DOC_TTL_HOURS:g}h" if DOC_TTL_HOURS > 0 else None,
+              f"{TENANT_STORAGE_MB} MB per tenant" if TENANT_STORAGE_MB > 0 else None,
+              f"{TOTAL_STORAGE_MB} MB in total" if TOTAL_STORAGE_MB > 0 else None]
+    print(f"✅ Document retention started ({', '.join(limit for limit in limits if limit) or 'no limits'})")
+
+
+def describe(tenants: Iterable[str]) -> Dict[str, Any]:
+    """Retention settings and counters, and the given tenants' documents with their expiry"""
+    with SessionLocal() as db:
+        documents = db.query(IndexedDocument).filter(IndexedDocument.tenant.in_(list(tenants))) \
+            .order_by(IndexedDocument.last_accessed_at.desc()).all()
+        rows = [_row(document) for document in documents]
+    ttl = timedelta(hours=DOC_TTL_HOURS) if DOC_TTL_HOURS > 0 else None
+    return dict(
+        stats,
+        ttl_hours=DOC_TTL_HOURS or None,
+        tenant_storage_mb=TENANT_STORAGE_MB or None,
+        total_storage_mb=TOTAL_STORAGE_MB or None,
+        documents=[{
+            "tenant": row["tenant"],
+            "source": row["source"],
+            "chunks": row["chunks"],
+            "size_bytes": row["size_bytes"],
+            "indexed_at": row["indexed_at"].isoformat(),
+            "last_accessed_at": row["last_accessed_at"].isoformat(),
+            "expires_at": (row["last_accessed_at"] + ttl).isoformat() if ttl else None
+        } for row in rows]
+    )
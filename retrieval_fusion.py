@@ -0,0 +1,147 @@
+"""Fusion of vector and BM25 results into one ranked, deduplicated context.
+
+hybrid_search used to append the vector hits, then the BM25 hits, and cut the
+list at top_n. With top_n equal to the vector k, the BM25 hits never made it
+into the answer, a chunk found by both retrievers could appear twice, and the
+chat route then passed only the first three chunks to the LLM, whatever their
+length.
+
+fuse() merges the ranked lists of each retriever by chunk id:
+
+- "rrf" (default): reciprocal-rank fusion, sum of weight / (RRF_K + rank).
+  Only ranks are used, so L2 distances and BM25 scores need no calibration.
+- "weighted": each list's scores are min-max normalized to [0, 1] and
+  combined with VECTOR_WEIGHT / BM25_WEIGHT.
+
+Both retrievers weigh 1.0 by default. With a lighter BM25 weight, a chunk
+only BM25 finds scores below even the last vector candidate and can never
+reach top_n, so BM25 would only re-order vector hits. `python
+retrieval_fusion.py` checks that a BM25-only top hit survives.
+
+A chunk found by both retrievers is ranked higher instead of appearing twice.
+select_documents() then drops chunks whose text repeats an earlier one (the
+same file uploaded twice, overlapping crawls), and build_context() packs the
+best chunks into CONTEXT_TOKEN_BUDGET tokens instead of a fixed three.
+"""
+
+import hashlib
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+FUSION_METHOD = os.getenv("FUSION_METHOD", "rrf").lower()
+VECTOR_WEIGHT = float(os.getenv("VECTOR_WEIGHT", 1.0))
+BM25_WEIGHT = float(os.getenv("BM25_WEIGHT", 1.0))
+RRF_K = int(os.getenv("RRF_K", 60))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 1000))
+
+# Rough size of a token for English text; good enough to budget a prompt
+CHARS_PER_TOKEN = 4
+
+DEFAULT_WEIGHTS = {"vector": VECTOR_WEIGHT, "bm25": BM25_WEIGHT}
+
+
+@dataclass
+class FusedHit:
+    doc_id: str
+    score: float
+    ranks: Dict[str, int] = field(default_factory=dict)  # Retriever -> 1-based rank
+
+
+def _normalized(hits: Sequence[Tuple[str, float]]) -> Dict[str, float]:
+    """Min-max normalize scores (higher is better) to [0, 1]"""
+    if not hits:
+        return {}
+    scores = [score for _, score in hits]
+    low, high = min(scores), max(scores)
+    if high == low:
+        return {doc_id: 1.0 for doc_id, _ in hits}
+    return {doc_id: (score - low) / (high - low) for doc_id, score in hits}
+
+
+def fuse(ranked: Mapping[str, Sequence[Tuple[str, float]]], weights: Optional[Mapping[str, float]] = None,
+         method: str = FUSION_METHOD) -> List[FusedHit]:
+    """Merge per-retriever (doc id, score) lists, best first, into one list with one entry per doc id.
+
+    Scores must be "higher is better" (pass negated distances); "rrf" only uses their order.
+    """
+    weights = weights or DEFAULT_WEIGHTS
+    fused: Dict[str, FusedHit] = {}
+
+    for retriever, hits in ranked.items():
+        weight = weights.get(retriever, 1.0)
+        normalized = _normalized(hits) if method == "weighted" else None
+        for rank, (doc_id, _) in enumerate(hits, start=1):
+            hit = fused.get(doc_id)
+            if hit is None:
+                hit = fused[doc_id] = FusedHit(doc_id, 0.0)
+            if retriever in hit.ranks:
+                continue  # A retriever listing the same chunk twice counts once
+            hit.ranks[retriever] = rank
+            if normalized is not None:
+                hit.score += weight * normalized[doc_id]
+            else:
+                hit.score += weight / (RRF_K + rank)
+
+    return sorted(fused.values(), key=lambda hit: (-hit.score, min(hit.ranks.values())))
+
+
+def _content_key(text: str) -> str:
+    return hashlib.sha1(re.sub(r"\s+", " ", text).strip().lower().encode("utf-8")).hexdigest()
+
+
+def select_documents(hits: Sequence[FusedHit], documents: Mapping[str, Any], top_n: int) -> List[Any]:
+    """Documents for the best fused hits, skipping missing ids and repeated text"""
+    selected, seen = [], set()
+    for hit in hits:
+        doc = documents.get(hit.doc_id)
+        if doc is None:
+            continue
+        key = _content_key(doc.page_content)
+        if key in seen:
+            continue
+        seen.add(key)
+        selected.append(doc)
+        if len(selected) >= top_n:
+            break
+    return selected
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def build_context(documents: Sequence[Any], token_budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """Number and join the documents in order until the token budget is spent.
+
+    The first document is always included (cut to the budget if needed); a later one that
+    does not fit is skipped so a shorter one after it can still be used.
+    """
+    parts, used = [], 0
+    for doc in documents:
+        text = doc.page_content if hasattr(doc, "page_content") else str(doc)
+        header = f"Document {len(parts) + 1}:\n"
+        cost = estimate_tokens(header + text)
+        if used + cost > token_budget:
+            if parts:
+                continue
+            text = text[:max(token_budget * CHARS_PER_TOKEN - len(header), 0)]
+            cost = token_budget
+        parts.append(f"{header}{text}\n\n")
+        used += cost
+    return "".join(parts)
+
+
+if __name__ == "__main__":
+    # Disjoint lists of at least the candidates the chat route fetches per retriever (top_n x 3):
+    # the best chunk only BM25 finds must still be in the top_n
+    candidates, top_n = 30, 8
+    vector = [(f"v{i}", -float(i)) for i in range(candidates)]
+    bm25 = [(f"b{i}", float(candidates - i)) for i in range(candidates)]
+    for method in ("rrf", "weighted"):
+        top = [hit.doc_id for hit in fuse({"vector": vector, "bm25:user:1": bm25},
+                                                 {"vector": VECTOR_WEIGHT, "bm25:user:1": BM25_WEIGHT}, method)[:top_n]]
+        print(f"{method}: {top}")
+        assert "b0" in top, f"{method}: a BM25-only rank-1 hit does not reach the top {top_n}"
+    print("✅ BM25-only hits reach the fused top results")
@@ -0,0 +1,205 @@
+"""Per-tenant vector and BM25 shards, kept in a memory-budgeted LRU.
+
+doc_qna_routes kept one global vector store, document list and BM25 index for
+everybody. A question searched every user's uploads, its cost grew with the
+whole platform's corpus, and one user's chunks could end up in another
+user's answer. Retrieval is now sharded by tenant:
+
+- "user:<id>": the documents a user uploaded for themselves
+- "group:<id>": documents uploaded to a study group, searched by its members
+
+Each shard is a SegmentedVectorIndex and a SegmentedBM25Index in
+TENANT_INDEX_DIR/<kind>-<id>/. doc_qna_routes decides which shards a request
+may use; only those are loaded and searched, so a query costs what the
+caller's own corpora cost.
+
+Shards are loaded from disk on first use and kept in least-recently-used
+order. When the loaded shards together hold more than SHARD_CACHE_MB
+(Shard.nbytes: chunk text, the in-memory vector delta, BM25 postings and
+vocabulary; memory-mapped index files are not counted), the least recently
+used ones are committed and closed. A shard is pinned while a request or an
+ingestion job uses it (ShardCache.use) and is not evicted until released.
+Evicting a shard only unloads it; retention.py deletes documents from disk.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from bm25_index import SegmentedBM25Index
+from vector_index import SegmentedVectorIndex
+
+TENANT_INDEX_DIR = os.getenv("TENANT_INDEX_DIR", "data/tenants")
+SHARD_CACHE_MB = int(os.getenv("SHARD_CACHE_MB", 1024))
+
+TENANT_PATTERN = re.compile(r"^(user|group):(\d+)$")
+
+# Rough memory per BM25 vocabulary term (dict entry and string), for Shard.nbytes
+TERM_BYTES = 100
+
+
+def user_tenant(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def group_tenant(group_id: int) -> str:
+    return f"group:{group_id}"
+
+
+def tenant_directory(tenant: str, root: str = TENANT_INDEX_DIR) -> str:
+    match = TENANT_PATTERN.match(tenant)
+    if not match:
+        raise ValueError(f"Invalid tenant {tenant!r} (expected user:<id> or group:<id>)")
+    return os.path.join(root, f"{match.group(1)}-{match.group(2)}")
+
+
+class Shard:
+    """One tenant's chunks: a vector index and a BM25 index over the same chunk ids"""
+
+    def __init__(self, tenant: str, directory: str):
+        self.tenant = tenant
+        self.directory = directory
+        self.vectors = SegmentedVectorIndex(os.path.join(directory, "vectors"))
+        self.keywords = SegmentedBM25Index(os.path.join(directory, "bm25"))
+        self.lock = threading.Lock()  # Held while adding, removing, committing and reloading
+        self.pins = 0
+        self.last_used = time.time()
+
+    @property
+    def documents(self) -> Dict[str, Any]:
+        """Live chunks by id"""
+        return self.vectors.documents
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + self.keywords.nbytes + TERM_BYTES * len(self.keywords.vocabulary)
+
+    def refresh(self):
+        """Load on first use, or reload what another worker has committed since"""
+        with self.lock:
+            if self.vectors.refresh():
+                self.keywords.refresh({doc_id: doc.page_content for doc_id, doc in self.documents.items()})
+
+    def delete(self, ids: Sequence[str]) -> int:
+        """Tombstone chunks in both indexes; compaction and segment merges drop them later"""
+        if not ids:
+            return 0
+        with self.lock:
+            removed = self.vectors.delete(ids)
+            self.keywords.delete(ids)
+        return removed
+
+    def commit(self):
+        self.vectors.commit()
+        self.keywords.commit()
+
+    def close(self):
+        self.vectors.close()
+        self.keywords.close()
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "tenant": self.tenant,
+            "chunks": len(self.documents),
+            "bm25_segments": self.keywords.segment_count,
+            "nbytes": self.nbytes,
+            "pinned": self.pins > 0,
+            "idle_seconds": round(time.time() - self.last_used, 1)
+        }
+
+
+class ShardCache:
+    """Loaded shards in least-recently-used order, evicted above a memory budget"""
+
+    def __init__(self, root: str = TENANT_INDEX_DIR, budget_mb: int = SHARD_CACHE_MB):
+        self.root = root
+        self.budget = budget_mb * 1024 * 1024
+        self._shards: "OrderedDict[str, Shard]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "loads": 0, "evictions": 0}
+
+    def _acquire(self, tenant: str) -> Shard:
+        with self._lock:
+            shard = self._shards.get(tenant)
+            if shard is None:
+                shard = self._shards[tenant] = Shard(tenant, tenant_directory(tenant, self.root))
+                self.stats["loads"] += 1
+            else:
+                self._shards.move_to_end(tenant)
+                self.stats["hits"] += 1
+            shard.pins += 1
+            shard.last_used = time.time()
+        try:
+            shard.refresh()
+        except BaseException:
+            self._release(shard)
+            raise
+        return shard
+
+    def _release(self, shard: Shard):
+        with self._lock:
+            shard.pins -= 1
+        self.evict()
+
+    @contextmanager
+    def use(self, tenants: Sequence[str]) -> Iterator[List[Shard]]:
+        """The tenants' shards, loaded (or refreshed) and pinned for the duration of the block"""
+        shards: List[Shard] = []
+        try:
+            for tenant in dict.fromkeys(tenants):
+                shards.append(self._acquire(tenant))
+            yield shards
+        finally:
+            for shard in shards:
+                self._release(shard)
+
+    def peek(self, tenant: str) -> Optional[Shard]:
+        """The tenant's shard if it is loaded, without loading it or changing its LRU position"""
+        with self._lock:
+            return self._shards.get(tenant)
+
+    def evict(self) -> int:
+        """Close least recently used, unpinned shards until the loaded ones fit the budget"""
+        evicted = []
+        with self._lock:
+            sizes = {tenant: shard.nbytes for tenant, shard in self._shards.items()}
+            total = sum(sizes.values())
+            for tenant, shard in list(self._shards.items()):
+                if total <= self.budget:
+                    break
+                if shard.pins:
+                    continue
+                del self._shards[tenant]
+                total -= sizes[tenant]
+                evicted.append(shard)
+            self.stats["evictions"] += len(evicted)
+        for shard in evicted:
+            shard.close()
+        if evicted:
+            freed = sum(sizes[shard.tenant] for shard in evicted)
+            print(f"📤 Evicted {len(evicted)} shards ({', '.join(shard.tenant for shard in evicted)}, "
+                  f"{freed / 2 ** 20:.1f} MB); {total / 2 ** 20:.1f} MB still loaded")
+        return len(evicted)
+
+    def describe(self, tenants: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Budget, counters and loaded shards; with tenants, only those tenants' shards and no global figures"""
+        with self._lock:
+            shards = list(self._shards.values())
+        if tenants is not None:
+            shards = [shard for shard in shards if shard.tenant in tenants]
+        loaded = [shard.describe() for shard in reversed(shards)]  # Most recently used first
+        report = {
+            "budget_mb": self.budget // 2 ** 20,
+            "loaded_mb": round(sum(shard["nbytes"] for shard in loaded) / 2 ** 20, 1),
+            "loaded": loaded
+        }
+        if tenants is None:
+            report.update(self.stats, directory=self.root)
+        return report
+
+
+tenant_shards = ShardCache()
@@ -0,0 +1,183 @@
+"""Speech-to-text for audio uploads and YouTube videos without captions.
+
+Transcription runs in a pool of worker processes, each holding one loaded
+Whisper model (WHISPER_MODEL, default "medium"), so the app process never
+loads it and concurrent jobs share TRANSCRIBE_WORKERS models instead of one
+per caller.
+
+A recording is cut into windows of TRANSCRIBE_WINDOW_SECONDS. Each window is
+decoded by ffmpeg straight from the file (seeking to its start) and
+transcribed as a separate task; windows come back in order as soon as they
+finish, so ingestion chunks and indexes the first minutes of a lecture while
+the rest is still being transcribed, and job progress moves once per window.
+Only a few windows per recording are queued at a time so one long recording
+does not hold every worker while other jobs wait.
+"""
+
+import concurrent.futures
+import multiprocessing
+import os
+import subprocess
+import threading
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from model_registry import WHISPER_MODEL_NAME
+
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", 1))
+TRANSCRIBE_WINDOW_SECONDS = float(os.getenv("TRANSCRIBE_WINDOW_SECONDS", 120))
+TRANSCRIBE_LANGUAGE = os.getenv("TRANSCRIBE_LANGUAGE") or None  # None lets Whisper detect it per window
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.m4a', '.ogg', '.flac', '.webm')
+SAMPLE_RATE = 16000  # What Whisper expects
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Per-process model, created by the pool initializer
+_model = None
+
+
+def is_audio_file(file_path: str) -> bool:
+    return os.path.splitext(file_path)[-1].lower() in AUDIO_EXTENSIONS
+
+
+def _init_worker(model_name: str):
+    """Load one Whisper model per worker process"""
+    global _model
+    import whisper
+
+    _model = whisper.load_model(model_name)
+
+
+def get_transcribe_executor() -> concurrent.futures.ProcessPoolExecutor:
+    """Return the shared transcription process pool, creating it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=TRANSCRIBE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(WHISPER_MODEL_NAME,)
+            )
+            print(f"✅ Transcription pool started with {TRANSCRIBE_WORKERS} workers ({WHISPER_MODEL_NAME})")
+        return _executor
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def warm_transcribe_workers():
+    """Start every worker now so models are loaded before the first recording arrives"""
+    executor = get_transcribe_executor()
+    futures = [executor.submit(_ping) for _ in range(TRANSCRIBE_WORKERS)]
+    for future in futures:
+        future.result()
+
+
+def shutdown_transcribe_executor():
+    """Stop the transcription worker processes"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def audio_duration(file_path: str) -> Optional[float]:
+    """Length of a recording in seconds (ffprobe), or None if it cannot be read"""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", file_path],
+            capture_output=True, text=True, check=True
+        )
+        return float(result.stdout.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def audio_windows(file_path: str, window_seconds: float = TRANSCRIBE_WINDOW_SECONDS) -> List[Tuple[float, Optional[float]]]:
+    """(start, length) of each window; a single open-ended window when the duration is unknown"""
+    duration = audio_duration(file_path)
+    if not duration:
+        return [(0.0, None)]
+    windows = []
+    start = 0.0
+    while start < duration:
+        windows.append((start, min(window_seconds, duration - start)))
+        start += window_seconds
+    return windows
+
+
+def load_audio_window(file_path: str, start: float, length: Optional[float]):
+    """Decode one window to 16 kHz mono float32, the way whisper.load_audio does for a whole file"""
+    import numpy as np
+
+    command = ["ffmpeg", "-nostdin", "-threads", "0", "-ss", f"{start:.3f}"]
+    if length is not None:
+        command += ["-t", f"{length:.3f}"]
+    command += ["-i", file_path, "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-"]
+    try:
+        output = subprocess.run(command, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode audio: {e.stderr.decode(errors='replace')[-300:]}") from e
+    return np.frombuffer(output, np.int16).flatten().astype(np.float32) / 32768.0
+
+
+def _transcribe_window(file_path: str, start: float, length: Optional[float]) -> List[Dict[str, Any]]:
+    """Worker task: transcribe one window; segment times are relative to the whole recording"""
+    audio = load_audio_window(file_path, start, length)
+    if audio.size == 0:
+        return []
+    result = _model.transcribe(audio, language=TRANSCRIBE_LANGUAGE, fp16=_model.device.type == "cuda")
+    return [
+        {"start": start + segment["start"], "end": start + segment["end"], "text": segment["text"].strip()}
+        for segment in result["segments"] if segment["text"].strip()
+    ]
+
+
+def iter_transcribed_windows(file_path: str, windows: Optional[List[Tuple[float, Optional[float]]]] = None
+                             ) -> Iterator[Tuple[float, float, List[Dict[str, Any]]]]:
+    """Yield (start, end, segments) per window in order while later windows are still being transcribed"""
+    if windows is None:
+        windows = audio_windows(file_path)
+    executor = get_transcribe_executor()
+    lookahead = TRANSCRIBE_WORKERS + 1
+    pending = deque()
+    upcoming = iter(windows)
+
+    def submit_next():
+        window = next(upcoming, None)
+        if window is not None:
+            start, length = window
+            pending.append((start, length, executor.submit(_transcribe_window, file_path, start, length)))
+
+    try:
+        for _ in range(lookahead):
+            submit_next()
+        while pending:
+            start, length, future = pending.popleft()
+            try:
+                segments = future.result()
+            except BrokenProcessPool:
+                # A worker died (usually out of memory); the next job gets a fresh pool
+                shutdown_transcribe_executor()
+                raise RuntimeError("Transcription worker crashed")
+            submit_next()
+            end = start + length if length is not None else (segments[-1]["end"] if segments else start)
+            yield start, end, segments
+    finally:
+        # Consumer gone (cancelled job, failed indexing): drop windows that have not started
+        for _, _, future in pending:
+            future.cancel()
+
+
+def transcribe_file(file_path: str) -> str:
+    """Full transcript of a recording, transcribed window by window in the pool"""
+    return " ".join(
+        segment["text"] for _, _, segments in iter_transcribed_windows(file_path) for segment in segments
+    ).strip()
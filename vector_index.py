@@ -0,0 +1,593 @@
+"""Vector index persisted as append-only segments and loaded memory-mapped.
+
+add_to_vector_store used to call FAISS.save_local() after every upload, which
+rewrote the whole index and a pickled docstore. get_vector_store() then
+unpickled both (allow_dangerous_deserialization=True) into each worker's
+memory. SegmentedVectorIndex keeps everything in VECTOR_DB_PATH instead:
+
+- Segments: commit() writes the chunks added since the last commit as
+  <name>.npy (float32 vectors) and <name>.jsonl (id, text and metadata, one
+  row per line). Segments are never modified. Row numbers run through the
+  segments in manifest order.
+- deleted.txt: append-only ids of deleted chunks (tombstones).
+- index-<generation>.faiss: the ANN index (ann_index.py) over the first
+  index rows. It is opened read-only with faiss' mmap flag, so a worker does
+  not copy it into its own memory, and workers share its pages through the
+  OS cache. Flat codes are mapped (the flat index, HNSW storage); IVF lists
+  are read.
+- manifest.json: dimension, generation, index file and row count, segment
+  list, and how many bytes of deleted.txt are committed. It is replaced
+  atomically, so a crash during a commit leaves the previous state.
+
+Rows after the index file are kept in a small in-memory flat index (the
+delta) and searched exactly along with it. A background thread compacts:
+
+- merge: once the delta holds VECTOR_DELTA_MAX committed rows, or more than
+  VECTOR_MAX_SEGMENTS segments are outside the index file, those segments are
+  concatenated into one and their rows are added to a copy of the index,
+  written as the next index file.
+- rebuild: when ann_index.rebuild_kind() asks for it (index type threshold,
+  IVF retraining, deleted rows), or more than ANN_MAX_DELETED_RATIO of the
+  rows are deleted before there is an index file, the live rows are
+  rewritten as one segment.
+  A fresh index is built from their exact vectors and the tombstones are
+  dropped.
+
+Chunks are stored as JSON, and loading never runs code from the files. A
+pickled store (index.pkl) left by an older version is not loaded. Commits
+and compaction take an flock on the directory. A process that finds the
+manifest changed by another worker reloads (refresh()). Each tenant shard
+(tenant_shards.py) has its own index directory.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+import ann_index
+from embedding_cache import FileLock
+
+VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH", "data/vector_db")
+VECTOR_DELTA_MAX = int(os.getenv("VECTOR_DELTA_MAX", 10000))
+VECTOR_MAX_SEGMENTS = int(os.getenv("VECTOR_MAX_SEGMENTS", 64))
+
+MANIFEST_NAME = "manifest.json"
+DELETED_NAME = "deleted.txt"
+# IO_FLAG_MMAP_IFC (faiss >= 1.9) maps flat codes; older versions only map IVF lists
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+# Rough per-chunk memory besides its text (Document, metadata dict, id strings), for nbytes
+CHUNK_OVERHEAD_BYTES = 400
+ROW_ID_BYTES = 90
+
+
+def _write_atomic(path: str, write):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+class SegmentedVectorIndex:
+    """Chunks and their vectors: append-only segments on disk, a memory-mapped index and an in-memory delta"""
+
+    def __init__(self, directory: str = VECTOR_DB_PATH):
+        self.directory = directory
+        self.documents: Dict[str, Document] = {}  # Live chunks by id
+        self._lock = threading.RLock()
+        self._commit_lock = threading.Lock()
+        self._file_lock: Optional[FileLock] = None
+        self._reset()
+        self._stamp: Any = "unloaded"
+        self._compact_wanted = threading.Event()
+        self._compactor: Optional[threading.Thread] = None
+        self._closed = False
+        self.stats = {"commits": 0, "merges": 0, "rebuilds": 0, "reloads": 0}
+
+    def _reset(self):
+        self.documents = {}
+        self._dimension: Optional[int] = None
+        self._row_ids: List[str] = []  # Row number -> chunk id, deleted rows included
+        self._segments: List[Dict[str, Any]] = []  # Committed segments: {"name", "rows"}
+        self._base: Any = None  # Read-only index over rows [0, _base_rows)
+        self._base_file: Optional[str] = None
+        self._base_rows = 0
+        self._delta: Any = None  # Flat index over rows [_base_rows, len(_row_ids))
+        self._committed_rows = 0
+        self._pending_deletes: List[str] = []
+        self._generation = 0
+        self._deleted_bytes = 0
+        self._text_bytes = 0  # Length of the live chunks' text
+
+    # Statistics
+
+    @property
+    def rows(self) -> int:
+        return len(self._row_ids)
+
+    @property
+    def dead_rows(self) -> int:
+        """Rows whose chunk has been deleted; skipped by search until the next rebuild"""
+        return len(self._row_ids) - len(self.documents)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory this process holds for the index: chunks, row ids, the delta, and the
+        index file when it is not a flat index (only flat codes are memory-mapped)"""
+        with self._lock:
+            size = self._text_bytes + CHUNK_OVERHEAD_BYTES * len(self.documents) + ROW_ID_BYTES * self.rows
+            if self._delta is not None:
+                size += self._delta.ntotal * self._delta.d * 4
+            index_path = self._path(self._base_file) if self._base is not None else None
+            if index_path and ann_index.kind_of(self._base) != "flat" and os.path.exists(index_path):
+                size += os.path.getsize(index_path)
+        return size
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            report = ann_index.describe(self._base) if self._base is not None else {"type": None}
+            report.update(
+                vectors=len(self.documents),
+                deleted_rows=self.dead_rows,
+                index_rows=self._base_rows,
+                delta_rows=self.rows - self._base_rows,
+                uncommitted_rows=self.rows - self._committed_rows,
+                segments=len(self._segments),
+                generation=self._generation,
+                index_file=self._base_file,
+                directory=self.directory,
+                **self.stats
+            )
+        return report
+
+    # Updates
+
+    def add(self, documents: Sequence[Document], vectors: Sequence[Sequence[float]]) -> List[str]:
+        """Add chunks with their embeddings; returns their new ids. Searchable at once, persisted by commit()"""
+        if not documents:
+            return []
+        values = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self._dimension is None:
+                self._dimension = values.shape[1]
+            elif values.shape[1] != self._dimension:
+                raise ValueError(f"Embedding dimension {values.shape[1]} does not match "
+                                 f"the index ({self._dimension})")
+            if self._delta is None:
+                self._delta = faiss.IndexFlatL2(self._dimension)
+            ids = [str(uuid.uuid4()) for _ in documents]
+            self._delta.add(values)
+            self._row_ids.extend(ids)
+            for doc_id, doc in zip(ids, documents):
+                self.documents[doc_id] = doc
+                self._text_bytes += len(doc.page_content)
+        return ids
+
+    def delete(self, ids: Sequence[str]) -> int:
+        """Tombstone chunks; returns how many were found"""
+        with self._lock:
+            removed = []
+            for doc_id in ids:
+                doc = self.documents.pop(doc_id, None)
+                if doc is not None:
+                    removed.append(doc_id)
+                    self._text_bytes -= len(doc.page_content)
+            self._pending_deletes.extend(removed)
+        return len(removed)
+
+    def clear(self):
+        with self._commit_lock, self._lock:
+            self._reset()
+            if os.path.exists(self.directory):
+                shutil.rmtree(self.directory)
+            self._file_lock = None
+            self._stamp = None
+
+    # Search
+
+    def search(self, vector: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """(chunk id, L2 distance) of the k nearest live chunks, nearest first"""
+        query = np.ascontiguousarray(vector, dtype=np.float32).reshape(1, -1)
+        with self._lock:
+            base, base_rows, row_ids = self._base, self._base_rows, self._row_ids
+            # Deleted rows are still in the index, so fetch extra to make up for them
+            fetch = k + min(self.dead_rows, k)
+            candidates: List[Tuple[float, int]] = []
+            if self._delta is not None and self._delta.ntotal:
+                distances, positions = self._delta.search(query, min(fetch, self._delta.ntotal))
+                candidates.extend((float(distance), base_rows + int(position))
+                                  for distance, position in zip(distances[0], positions[0]) if position >= 0)
+        if base is not None and base.ntotal:
+            distances, positions = ann_index.search(base, query, min(fetch, base.ntotal))
+            candidates.extend((float(distance), int(position))
+                              for distance, position in zip(distances[0], positions[0]) if position >= 0)
+
+        hits = []
+        for distance, row in sorted(candidates):
+            doc_id = row_ids[row]
+            if doc_id in self.documents:
+                hits.append((doc_id, distance))
+                if len(hits) == k:
+                    break
+        return hits
+
+    # Persistence
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _lock_directory(self) -> FileLock:
+        os.makedirs(self.directory, exist_ok=True)  # Also after another process cleared it
+        if self._file_lock is None:
+            self._file_lock = FileLock(self._path(".lock"))
+        return self._file_lock
+
+    def _manifest_stamp(self) -> Any:
+        try:
+            stat = os.stat(self._path(MANIFEST_NAME))
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(MANIFEST_NAME), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        _write_atomic(self._path(MANIFEST_NAME), lambda f: f.write(json.dumps(manifest).encode("utf-8")))
+        self._stamp = self._manifest_stamp()
+
+    def _manifest(self, segments: List[Dict[str, Any]], index_file: Optional[str], index_rows: int,
+                  deleted_bytes: int, generation: int) -> Dict[str, Any]:
+        return {
+            "dimension": self._dimension,
+            "generation": generation,
+            "index": {"file": index_file, "rows": index_rows} if index_file else None,
+            "segments": segments,
+            "deleted_bytes": deleted_bytes
+        }
+
+    def _write_segment(self, vectors: np.ndarray, lines: Sequence[bytes]) -> Dict[str, Any]:
+        name = f"seg-{uuid.uuid4().hex[:12]}"
+        _write_atomic(self._path(f"{name}.npy"), lambda f: np.save(f, vectors))
+        _write_atomic(self._path(f"{name}.jsonl"), lambda f: f.writelines(lines))
+        return {"name": name, "rows": len(lines)}
+
+    def _segment_vectors(self, segment: Dict[str, Any]) -> np.ndarray:
+        return np.load(self._path(f"{segment['name']}.npy"), mmap_mode="r")
+
+    def _segment_lines(self, segment: Dict[str, Any]) -> List[bytes]:
+        with open(self._path(f"{segment['name']}.jsonl"), "rb") as f:
+            return f.readlines()
+
+    def commit(self):
+        """Write the rows and deletes since the last commit as a new segment and tombstones"""
+        with self._commit_lock, self._lock_directory():
+            disk = self._read_manifest()
+            with self._lock:
+                start, end = self._committed_rows, self.rows
+                deletes, self._pending_deletes = self._pending_deletes, []
+                if start == end and not deletes:
+                    return
+                ids = self._row_ids[start:end]
+                vectors = self._delta.reconstruct_n(start - self._base_rows, end - start) if end > start else None
+                # A row deleted before its first commit is written empty; its id is in deletes
+                lines = [json.dumps({"id": doc_id, "text": doc.page_content, "metadata": doc.metadata}, default=str)
+                         .encode("utf-8") + b"\n"
+                         for doc_id, doc in ((doc_id, self.documents.get(doc_id, Document(page_content="")))
+                                             for doc_id in ids)]
+            foreign = (disk["generation"] if disk else 0) != self._generation
+            base = disk or self._manifest([], None, 0, 0, 0)
+
+            segments = list(base["segments"])
+            if vectors is not None:
+                segments.append(self._write_segment(vectors, lines))
+            deleted_bytes = base["deleted_bytes"]
+            if deletes:
+                with open(self._path(DELETED_NAME), "ab") as f:
+                    f.truncate(deleted_bytes)  # Drop ids appended by a commit that did not finish
+                    data = "".join(f"{doc_id}\n" for doc_id in deletes).encode("utf-8")
+                    f.write(data)
+                deleted_bytes += len(data)
+            generation = base["generation"] + 1
+            index = base["index"] or {}
+            self._write_manifest(self._manifest(segments, index.get("file"), index.get("rows", 0), deleted_bytes,
+                                                generation))
+            self.stats["commits"] += 1
+
+            if foreign:
+                # Another process committed since this one loaded: take the directory as it is now
+                self._load_locked()
+            else:
+                with self._lock:
+                    self._segments = segments
+                    self._committed_rows = end
+                    self._deleted_bytes = deleted_bytes
+                    self._generation = generation
+        self._request_compaction()
+
+    def _dirty(self) -> bool:
+        """Rows or deletes not committed yet (call with _lock held)"""
+        return self._committed_rows != self.rows or bool(self._pending_deletes)
+
+    def _load_locked(self, only_if_clean: bool = False) -> bool:
+        """Replace the in-memory state with the committed one; with only_if_clean, not if anything is uncommitted"""
+        manifest = self._read_manifest()
+        if manifest is None:
+            if os.path.exists(self._path("index.pkl")):
+                print(f"⚠️ {self.directory} holds a pickled FAISS store from an older version; it is not loaded. "
+                      "Re-upload the documents to index them again.")
+            with self._lock:
+                if only_if_clean and self._dirty():
+                    return False
+                self._reset()
+            self._stamp = None
+            return False
+
+        documents: Dict[str, Document] = {}
+        row_ids: List[str] = []
+        for segment in manifest["segments"]:
+            for line in self._segment_lines(segment)[:segment["rows"]]:
+                row = json.loads(line)
+                row_ids.append(row["id"])
+                documents[row["id"]] = Document(page_content=row["text"], metadata=row["metadata"])
+        if manifest["deleted_bytes"]:
+            with open(self._path(DELETED_NAME), "rb") as f:
+                for doc_id in f.read(manifest["deleted_bytes"]).decode("utf-8").split():
+                    documents.pop(doc_id, None)
+
+        dimension = manifest["dimension"]
+        index = manifest["index"]
+        base = faiss.read_index(self._path(index["file"]), MMAP_FLAGS) if index else None
+        base_rows = index["rows"] if index else 0
+        delta = faiss.IndexFlatL2(dimension) if dimension else None
+        offset = 0
+        for segment in manifest["segments"]:
+            if offset + segment["rows"] > base_rows:
+                vectors = self._segment_vectors(segment)[max(base_rows - offset, 0):]
+                delta.add(np.ascontiguousarray(vectors, dtype=np.float32))
+            offset += segment["rows"]
+
+        with self._lock:
+            # Rows added while the segments were read would be lost with the old state
+            if only_if_clean and self._dirty():
+                return False
+            self.documents = documents
+            self._dimension = dimension
+            self._row_ids = row_ids
+            self._segments = list(manifest["segments"])
+            self._base, self._base_file, self._base_rows = base, index["file"] if index else None, base_rows
+            self._delta = delta
+            self._committed_rows = len(row_ids)
+            self._pending_deletes = []
+            self._generation = manifest["generation"]
+            self._deleted_bytes = manifest["deleted_bytes"]
+            self._text_bytes = sum(len(doc.page_content) for doc in documents.values())
+        self._stamp = self._manifest_stamp()
+        self.stats["reloads"] += 1
+        print(f"✅ Vector index loaded: {len(documents)} chunks, {base_rows} rows memory-mapped, "
+              f"{len(row_ids) - base_rows} in memory, {len(manifest['segments'])} segments")
+        self._request_compaction()
+        return True
+
+    def load(self) -> bool:
+        """Load the committed state from disk; False if there is none"""
+        with self._commit_lock, self._lock_directory():
+            for attempt in range(2):
+                try:
+                    return self._load_locked()
+                except FileNotFoundError:
+                    continue  # Another process compacted between reading the manifest and its files
+                except Exception as e:
+                    print(f"⚠️ Could not load vector index: {e}")
+                    break
+            with self._lock:
+                self._reset()
+            self._stamp = None
+            return False
+
+    def refresh(self) -> bool:
+        """Load if never loaded or another process has committed since; returns whether it (re)loaded.
+
+        Uncommitted changes are kept: then nothing is loaded, and the next
+        commit picks up the other process's changes as well.
+        """
+        if self._manifest_stamp() == self._stamp:
+            return False
+        with self._commit_lock, self._lock_directory():
+            for attempt in range(2):
+                try:
+                    self._load_locked(only_if_clean=True)
+                    break
+                except FileNotFoundError:
+                    continue  # Another process compacted between reading the manifest and its files
+                except Exception as e:
+                    print(f"⚠️ Could not load vector index: {e}")
+                    return False
+            return self._stamp == self._manifest_stamp()
+
+    def close(self):
+        """Commit anything pending and stop the compaction thread (the index is not used afterwards)"""
+        with self._lock:
+            dirty = self._dirty()
+        if dirty:
+            self.commit()
+        self._closed = True
+        self._compact_wanted.set()
+
+    # Compaction
+
+    def _request_compaction(self):
+        self._compact_wanted.set()
+        if self._closed:
+            return
+        if self._compactor is None or not self._compactor.is_alive():
+            self._compactor = threading.Thread(target=self._compact_loop, name="vector-compactor", daemon=True)
+            self._compactor.start()
+
+    def _compact_loop(self):
+        while not self._closed:
+            self._compact_wanted.wait()
+            self._compact_wanted.clear()
+            if self._closed:
+                break
+            try:
+                while self.maybe_compact():
+                    pass
+            except Exception as e:
+                print(f"⚠️ Vector index compaction failed: {e}")
+
+    def maybe_compact(self) -> bool:
+        """Merge or rebuild if the policy asks for it; returns whether it did"""
+        with self._commit_lock, self._lock_directory():
+            disk = self._read_manifest()
+            with self._lock:
+                if disk is None or disk["generation"] != self._generation:
+                    return False  # Nothing committed, or stale until refreshed
+                rows = self._committed_rows
+                live_mask = np.fromiter((doc_id in self.documents for doc_id in self._row_ids[:rows]),
+                                        dtype=bool, count=rows)
+                base, base_rows = self._base, self._base_rows
+            live = int(live_mask.sum())
+            if base is not None:
+                kind = ann_index.rebuild_kind(base, live, rows)
+            else:
+                # Small corpora have no index file yet; deleted rows are still dropped from the segments
+                kind = ann_index.target_kind(live) if rows - live > ann_index.ANN_MAX_DELETED_RATIO * rows else None
+            outside = sum(1 for _ in self._segments_after(base_rows))
+            if kind is not None:
+                self._rebuild(kind, live_mask, disk)
+            elif rows - base_rows >= VECTOR_DELTA_MAX or outside > VECTOR_MAX_SEGMENTS:
+                self._merge(rows, disk)
+            else:
+                return False
+            # Still under both locks, so no commit can be between writing a segment and its manifest
+            self._remove_unreferenced(self._read_manifest())
+        return True
+
+    def _segments_after(self, row: int):
+        offset = 0
+        for segment in self._segments:
+            if offset >= row:
+                yield segment
+            offset += segment["rows"]
+
+    def _concatenate(self, parts: List[Tuple[Dict[str, Any], np.ndarray]]) -> Dict[str, Any]:
+        """One new segment with the rows of parts [(segment, row mask)] in order, streamed to disk"""
+        total = int(sum(mask.sum() for _, mask in parts))
+        name = f"seg-{uuid.uuid4().hex[:12]}"
+        vectors_path = self._path(f"{name}.npy")
+        output = np.lib.format.open_memmap(f"{vectors_path}.tmp", mode="w+", dtype=np.float32,
+                                           shape=(total, self._dimension))
+        position = 0
+        with open(self._path(f"{name}.jsonl.tmp"), "wb") as f:
+            for segment, mask in parts:
+                selected = np.flatnonzero(mask)
+                output[position:position + selected.size] = self._segment_vectors(segment)[selected]
+                position += selected.size
+                lines = self._segment_lines(segment)
+                f.writelines(lines[i] for i in selected)
+        output.flush()
+        del output
+        os.replace(f"{vectors_path}.tmp", vectors_path)
+        os.replace(self._path(f"{name}.jsonl.tmp"), self._path(f"{name}.jsonl"))
+        return {"name": name, "rows": total}
+
+    def _write_index(self, index: Any, generation: int) -> str:
+        file_name = f"index-{generation:06d}.faiss"
+        faiss.write_index(index, self._path(f"{file_name}.tmp"))
+        os.replace(self._path(f"{file_name}.tmp"), self._path(file_name))
+        return file_name
+
+    def _merge(self, rows: int, disk: Dict[str, Any]):
+        """Fold the committed rows outside the index file into the next index file"""
+        started = time.perf_counter()
+        base_rows = self._base_rows
+        tail = list(self._segments_after(base_rows))
+        head = self._segments[:len(self._segments) - len(tail)]
+        merged = tail[0] if len(tail) == 1 else self._concatenate(
+            [(segment, np.ones(segment["rows"], dtype=bool)) for segment in tail])
+        vectors = self._segment_vectors(merged)
+
+        if self._base is None:
+            index = ann_index.build_index(ann_index.target_kind(len(self.documents)), vectors)
+        else:
+            index = faiss.read_index(self._path(self._base_file))  # A writable copy of the mapped index
+            for start in range(0, len(vectors), ann_index.ADD_BATCH):
+                index.add(np.ascontiguousarray(vectors[start:start + ann_index.ADD_BATCH], dtype=np.float32))
+        generation = disk["generation"] + 1
+        file_name = self._write_index(index, generation)
+        del index
+        segments = head + [merged]
+        self._write_manifest(self._manifest(segments, file_name, rows, disk["deleted_bytes"], generation))
+        self._swap(faiss.read_index(self._path(file_name), MMAP_FLAGS), file_name, rows, rows, segments, None,
+                   disk["deleted_bytes"], generation)
+        self.stats["merges"] += 1
+        print(f"🔧 Merged {rows - base_rows} vectors from {len(tail)} segments into {file_name} "
+              f"({rows} rows) in {time.perf_counter() - started:.1f}s")
+
+    def _rebuild(self, kind: str, live_mask: np.ndarray, disk: Dict[str, Any]):
+        """Rewrite the live committed rows as one segment and build a fresh index over them"""
+        started = time.perf_counter()
+        rows = live_mask.size
+        parts, offset = [], 0
+        for segment in self._segments:
+            parts.append((segment, live_mask[offset:offset + segment["rows"]]))
+            offset += segment["rows"]
+        merged = self._concatenate(parts)
+        index = ann_index.build_index(kind, self._segment_vectors(merged))
+        generation = disk["generation"] + 1
+        file_name = self._write_index(index, generation)
+        del index
+        self._write_manifest(self._manifest([merged], file_name, merged["rows"], 0, generation))
+        # Tombstones of the dropped rows are no longer needed. Only after the manifest that no longer
+        # counts them: emptied first, a crash would leave the old segments with their deletes undone
+        _write_atomic(self._path(DELETED_NAME), lambda f: None)
+        self._swap(faiss.read_index(self._path(file_name), MMAP_FLAGS), file_name, rows, merged["rows"], [merged],
+                   live_mask, 0, generation)
+        self.stats["rebuilds"] += 1
+        print(f"🧭 Rebuilt vector index as {kind}: {merged['rows']} vectors, {rows - merged['rows']} deleted rows "
+              f"dropped, in {time.perf_counter() - started:.1f}s")
+
+    def _swap(self, base: Any, file_name: str, rows: int, new_rows: int, segments: List[Dict[str, Any]],
+              live_mask: Optional[np.ndarray], deleted_bytes: int, generation: int):
+        """Install a new index file over the first rows committed rows (renumbered to new_rows after a rebuild)"""
+        with self._lock:
+            # Rows added while compacting stay in the delta, after the new index rows
+            delta = faiss.IndexFlatL2(self._dimension)
+            if self.rows > rows:
+                delta.add(self._delta.reconstruct_n(rows - self._base_rows, self.rows - rows))
+            if live_mask is not None:
+                kept = [doc_id for doc_id, live in zip(self._row_ids[:rows], live_mask) if live]
+                self._row_ids = kept + self._row_ids[rows:]
+            self._base, self._base_file, self._base_rows = base, file_name, new_rows
+            self._delta = delta
+            self._segments = segments
+            self._committed_rows = new_rows
+            self._deleted_bytes = deleted_bytes
+            self._generation = generation
+
+    def _remove_unreferenced(self, manifest: Dict[str, Any]):
+        """Delete segment and index files the manifest on disk does not refer to (call with both locks held;
+        mapped copies stay valid until unmapped). Temporary files belong to writes in progress and are kept."""
+        keep = {f"{segment['name']}{suffix}" for segment in manifest["segments"] for suffix in (".npy", ".jsonl")}
+        if manifest["index"]:
+            keep.add(manifest["index"]["file"])
+        for file_name in os.listdir(self.directory):
+            if file_name.startswith(("seg-", "index-")) and not file_name.endswith(".tmp") and file_name not in keep:
+                try:
+                    os.remove(self._path(file_name))
+                except FileNotFoundError:
+                    pass
+
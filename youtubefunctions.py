@@ -4,6 +4,7 @@ import tempfile
 import google.generativeai as genai
 from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled
 from dotenv import load_dotenv
+from transcribe_pool import transcribe_file
 
 # Load environment variables from .env file
 load_dotenv()
@@ -17,19 +18,9 @@ genai.configure(api_key=GOOGLE_API_KEY)
 model = genai.GenerativeModel("gemini-1.5-flash")
 
 # Lazy load heavy dependencies
-_whisper_model = None
 _yt_dlp = None
 
 
-def get_whisper_model():
-    global _whisper_model
-    if _whisper_model is None:
-        import whisper
-
-        _whisper_model = whisper.load_model("medium")  # Use base model for faster processing
-    return _whisper_model
-
-
 def get_yt_dlp():
     global _yt_dlp
     if _yt_dlp is None:
@@ -95,10 +86,9 @@ def download_audio(video_url: str) -> str:
 
 
 def transcribe_audio(audio_path: str) -> str:
-    """Transcribe MP3 audio using Whisper."""
+    """Transcribe MP3 audio using Whisper (in the shared transcription pool)."""
     try:
-        whisper_model = get_whisper_model()
-        result = whisper_model.transcribe(audio_path)
+        text = transcribe_file(audio_path)
 
         # Clean up the temporary file
         try:
@@ -111,7 +101,7 @@ def transcribe_audio(audio_path: str) -> str:
         except:
             pass  # Ignore cleanup errors
 
-        return result["text"]
+        return text
     except Exception as e:
         raise Exception(f"Failed to transcribe audio: {str(e)}")
 